@@ -0,0 +1,254 @@
+"""Offline painting: turns recorded videos into painted videos.
+
+Hand tracking is the slow part, so the video is cut into chunks that a
+pool of worker processes tracks in parallel. A worker seeks `overlap`
+frames before its chunk and runs the tracker over them to reseed
+MediaPipe's hand tracking, then logs the landmarks of its own frames.
+The parent takes the chunk results in order as they come back and
+streams the video through a generator pipeline - decode, mirror,
+stroke, composite, encode - with the same PaintingBoard the virtual
+painter uses, so strokes carry over chunk boundaries exactly as live.
+
+With --landmarks the tracked hands of every frame are also written to
+a landmark log (landmarkLog, .hlog) with the video times, in the
+coordinates of the painted (mirrored) frames. landmarkLog.py and
+menu.py --replay play it back without the model.
+
+Example:
+    python batchPaint.py lecture.mp4 -o painted.mp4 --landmarks --workers 8
+"""
+import argparse
+import multiprocessing as mp
+import os
+import time
+
+import cv2
+import numpy as np
+
+from landmarkLog import HANDEDNESS, LandmarkRecorder
+from paintingBoard import PaintingBoard
+
+# Tracker of this worker process, created once by _init_worker
+_detector = None
+
+
+def read_frames(cap, count=None, mirror=True):
+    """Yields up to count frames from an open capture."""
+    n = 0
+    while count is None or n < count:
+        success, img = cap.read()
+        if not success:
+            return
+        yield cv2.flip(img, 1) if mirror else img  # Mirror image, as the live app does
+        n += 1
+
+
+def plan_chunks(total, chunk):
+    """[start, stop) frame ranges covering the video."""
+    return [(start, min(start + chunk, total)) for start in range(0, total, chunk)]
+
+
+def count_frames(path):
+    cap = cv2.VideoCapture(path)
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    if total <= 0:
+        # Some containers do not store the frame count
+        total = 0
+        while cap.grab():
+            total += 1
+    cap.release()
+    return total
+
+
+def _init_worker(detector_options):
+    global _detector
+    # Imported here so the parent never pays for loading MediaPipe
+    from handTrackingModule import handDetector
+    from perfMetrics import Metrics
+
+    # Every frame must be tracked; the adaptive rate is for live cameras
+    options = dict(detector_options, adaptiveRate=False)
+    _detector = handDetector(**options, metrics=Metrics(window=8))
+
+
+def track_chunk(task):
+    """Landmark log of one chunk: (start, landmarks, handedness, seconds)."""
+    path, start, stop, overlap, mirror, max_hands = task
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise IOError("cannot open video: %s" % path)
+    first = max(start - overlap, 0)
+    if first:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, first)
+    _detector.reset()
+
+    landmarks = np.full((stop - start, max_hands, 21, 3), np.nan, np.float32)
+    handedness = np.full((stop - start, max_hands), -1, np.int8)
+    started = time.perf_counter()
+    for n, img in enumerate(read_frames(cap, stop - first, mirror)):
+        _detector.findHands(img, draw=False)
+        i = first + n - start
+        if i < 0:
+            # Overlap frame: only reseeds the tracker
+            continue
+        hands, labels, _ = _detector.findLandmarks(img)
+        hands = hands[:max_hands]
+        landmarks[i, :len(hands)] = hands
+        handedness[i, :len(hands)] = [HANDEDNESS.index(label) for label in labels[:len(hands)]]
+    cap.release()
+    return start, landmarks, handedness, time.perf_counter() - started
+
+
+def tracked_chunks(path, total, chunk=300, overlap=15, workers=None, detector_options=None,
+                   mirror=True, max_hands=2):
+    """Yields track_chunk results in video order while later chunks are still tracking."""
+    detector_options = detector_options or {}
+    tasks = [(path, start, stop, overlap, mirror, max_hands) for start, stop in plan_chunks(total, chunk)]
+    workers = workers or max(1, (os.cpu_count() or 2) - 1)
+    if workers == 1:
+        _init_worker(detector_options)
+        yield from map(track_chunk, tasks)
+        return
+    ctx = mp.get_context("spawn")
+    with ctx.Pool(min(workers, len(tasks)), _init_worker, (detector_options,)) as pool:
+        yield from pool.imap(track_chunk, tasks)
+
+
+def tracked_frames(frames, chunks, log=None):
+    """Pairs decoded frames with their rows of the chunk landmark logs.
+
+    Yields (frame_no, img, landmarks, handedness). Chunks are appended to
+    log (if given) as they are used.
+    """
+    chunks = iter(chunks)
+    start, landmarks, handedness = 0, np.empty((0, 0, 21, 3), np.float32), None
+    for frame_no, img in enumerate(frames):
+        while frame_no >= start + len(landmarks):
+            chunk = next(chunks, None)
+            if chunk is None:
+                return
+            start, landmarks, handedness, _ = chunk
+            if log is not None:
+                log.append(chunk)
+        i = frame_no - start
+        yield frame_no, img, landmarks[i], handedness[i]
+
+
+def paint(tracked, board, mode="cam", fps=30.0, multi_hand=False):
+    """Yields painted frames; strokes use the video time, not the wall clock."""
+    tracked = iter(tracked)
+    item = next(tracked, None)
+    while item is not None:
+        frame_no, img, landmarks, handedness = item
+        # One frame of lookahead, to know which frame is the last
+        item = next(tracked, None)
+        t = frame_no / fps
+        found = handedness >= 0
+        hands = landmarks[found]
+        target = img if mode == "cam" else None
+        if multi_hand:
+            board.stroke_hands(hands, [HANDEDNESS[h] for h in handedness[found]], target, t=t)
+        else:
+            board.stroke(hands[0, 8, :2] if len(hands) else None, target, t=t)
+        if item is None:
+            # The video ends: draw what the stroke splines still hold back
+            board.finish_splines()
+        yield board.compose_cam(img) if mode == "cam" else board.compose_board()
+
+
+def save_landmarks(path, chunks, fps, size):
+    """Writes the chunk results as a landmark log, one record per frame at its video time."""
+    recorder = LandmarkRecorder(path, size[0], size[1], max_hands=chunks[0][1].shape[1])
+    try:
+        for start, landmarks, handedness, _ in chunks:
+            for i in range(len(landmarks)):
+                found = handedness[i] >= 0
+                recorder.write(landmarks[i][found], [HANDEDNESS[h] for h in handedness[i][found]],
+                               (start + i) / fps, start + i)
+    finally:
+        recorder.close()
+
+
+def fourcc_for(path):
+    ext = os.path.splitext(path)[1].lower()
+    return cv2.VideoWriter_fourcc(*("MJPG" if ext == ".avi" else "mp4v"))
+
+
+def paint_video(path, output, landmarks_path=None, mode="cam", workers=None, chunk=300, overlap=15,
+                detector_options=None, multi_hand=False, mirror=True, spline=False):
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise IOError("cannot open video: %s" % path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+    total = count_frames(path)
+
+    started = time.perf_counter()
+    max_hands = (detector_options or {}).get("maxHands", 2)
+    chunks = tracked_chunks(path, total, chunk, overlap, workers, detector_options, mirror, max_hands)
+    log = []
+    board = PaintingBoard(size[0], size[1], spline=spline)
+    writer = cv2.VideoWriter(output, fourcc_for(output), fps, size)
+    frames = 0
+    try:
+        tracked = tracked_frames(read_frames(cap, total, mirror), chunks, log)
+        for img in paint(tracked, board, mode, fps, multi_hand):
+            writer.write(img)
+            frames += 1
+    finally:
+        writer.release()
+        cap.release()
+        chunks.close()  # shuts the pool down if painting stopped early
+
+    elapsed = time.perf_counter() - started
+    if landmarks_path and log:
+        save_landmarks(landmarks_path, log, fps, size)
+    return {
+        "video": path,
+        "output": output,
+        "frames": frames,
+        "chunks": len(log),
+        "seconds": elapsed,
+        "fps": frames / elapsed if elapsed > 0 else 0.0,
+        "realtime": frames / fps / elapsed if elapsed > 0 else 0.0,
+        "tracking_seconds": sum(c[3] for c in log),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Paint recorded videos offline")
+    parser.add_argument("videos", nargs="+", help="video files to paint")
+    parser.add_argument("-o", "--output", help="output video (one input) or directory (several)")
+    parser.add_argument("--landmarks", action="store_true",
+                        help="also write <output>.hlog landmark logs (see landmarkLog.py)")
+    parser.add_argument("--mode", choices=["cam", "board"], default="cam",
+                        help="cam = strokes over the video, board = strokes on white")
+    parser.add_argument("--workers", type=int, default=None, help="tracking processes (default: cores - 1)")
+    parser.add_argument("--chunk", type=int, default=300, help="frames per chunk")
+    parser.add_argument("--overlap", type=int, default=15,
+                        help="frames tracked before each chunk to reseed the tracker")
+    parser.add_argument("--multi-hand", action="store_true", help="every detected hand paints with its own pen")
+    parser.add_argument("--no-mirror", action="store_true", help="keep the video unmirrored")
+    parser.add_argument("--spline", action="store_true", help="curve strokes through the fingertip samples")
+    parser.add_argument("--model-complexity", type=int, default=1, choices=[0, 1])
+    parser.add_argument("--backend", help="hand backend (handBackends), e.g. mediapipe-lite or tasks")
+    args = parser.parse_args()
+
+    for path in args.videos:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        if args.output and len(args.videos) == 1 and not os.path.isdir(args.output):
+            output = args.output
+        else:
+            output = os.path.join(args.output or os.path.dirname(path), stem + "_painted.mp4")
+        landmarks = os.path.splitext(output)[0] + ".hlog" if args.landmarks else None
+        result = paint_video(path, output, landmarks, args.mode, args.workers, args.chunk, args.overlap,
+                             {"modelComplexity": args.model_complexity, "backend": args.backend},
+                             args.multi_hand,
+                             not args.no_mirror, args.spline)
+        print("%s -> %s: %d frames in %d chunks, %.1f s, %.1f fps (%.1fx real time), tracking %.1f s" % (
+            result["video"], result["output"], result["frames"], result["chunks"], result["seconds"],
+            result["fps"], result["realtime"], result["tracking_seconds"]))
+
+
+if __name__ == "__main__":
+    main()
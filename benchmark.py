@@ -0,0 +1,164 @@
+"""Headless benchmark: runs recorded videos through the tracking and painting path.
+
+Example:
+    python benchmark.py clip1.mp4 clip2.mp4 --mode cam --json results.json
+"""
+import argparse
+import json
+import platform
+import time
+
+import cv2
+import numpy as np
+
+from handTrackingModule import handDetector
+from paintingBoard import PaintingBoard
+from tkDisplay import TkDisplay
+
+STAGES = ["capture", "color", "inference", "landmarks", "composite", "resize"]
+
+
+def parse_size(text):
+    w, h = text.lower().split("x")
+    return int(w), int(h)
+
+
+def summarize(samples):
+    """Latency summary in milliseconds for one stage."""
+    if not samples:
+        return {"mean": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+    ms = np.asarray(samples) * 1000.0
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {"mean": float(ms.mean()), "p50": float(p50), "p95": float(p95),
+            "p99": float(p99), "max": float(ms.max())}
+
+
+def run_video(path, detector, mode="cam", display=(1280, 720), max_frames=0, warmup=5):
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise IOError("cannot open video: %s" % path)
+
+    times = {name: [] for name in STAGES}
+    board = None
+    # Resize and convert the way the app does, into reused buffers
+    screen = TkDisplay(None, display)
+    frames = 0
+    detected = 0
+    started = None
+
+    while True:
+        t0 = time.perf_counter()
+        success, img = cap.read()
+        if not success:
+            break
+        img = cv2.flip(img, 1)  # Mirror image, as the live app does
+        t1 = time.perf_counter()
+
+        if board is None:
+            h, w = img.shape[:2]
+            board = PaintingBoard(w, h, smooth=not detector.adaptiveRate)
+
+        img = detector.findHands(img)
+        t2 = time.perf_counter()
+        landmarks, _, _ = detector.findLandmarks(img)
+        tip = landmarks[0, 8, :2] if len(landmarks) else None
+        t3 = time.perf_counter()
+
+        if mode == "cam":
+            board.stroke(tip, img)
+            out = board.compose_cam(img)
+        else:
+            board.stroke(tip)
+            out = board.compose_board()
+        t4 = time.perf_counter()
+
+        out = screen.convert(out)
+        t5 = time.perf_counter()
+
+        frames += 1
+        if frames <= warmup:
+            # Model warm-up frames are not representative
+            continue
+        if started is None:
+            started = t0
+        detected += tip is not None
+        times["capture"].append(t1 - t0)
+        times["color"].append(detector.stageTimes["color"])
+        times["inference"].append(detector.stageTimes["inference"])
+        times["landmarks"].append(t3 - t2)
+        times["composite"].append(t4 - t3)
+        times["resize"].append(t5 - t4)
+        if max_frames and frames - warmup >= max_frames:
+            break
+
+    cap.release()
+    measured = max(frames - warmup, 0)
+    elapsed = time.perf_counter() - started if started is not None else 0.0
+    return {
+        "video": path,
+        "mode": mode,
+        "frames": measured,
+        "fps": measured / elapsed if elapsed > 0 else 0.0,
+        "detection_rate": detected / measured if measured else 0.0,
+        "stages": {name: summarize(times[name]) for name in STAGES},
+    }
+
+
+def print_result(result):
+    print("%s: %d frames, %.1f fps, hand in %.0f%% of frames" % (
+        result["video"], result["frames"], result["fps"], 100 * result["detection_rate"]))
+    print("  %-10s %8s %8s %8s %8s" % ("stage", "mean", "p50", "p95", "p99"))
+    for name in STAGES:
+        s = result["stages"][name]
+        print("  %-10s %8.2f %8.2f %8.2f %8.2f" % (name, s["mean"], s["p50"], s["p95"], s["p99"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark hand tracking and painting on recorded videos")
+    parser.add_argument("videos", nargs="+", help="video files to feed through the pipeline")
+    parser.add_argument("--mode", choices=["cam", "board"], default="cam",
+                        help="cam = strokes over the live feed, board = strokes on white")
+    parser.add_argument("--display", type=parse_size, default=(1280, 720),
+                        help="display size the frame is resized to, WxH")
+    parser.add_argument("--max-frames", type=int, default=0, help="stop after N measured frames per video")
+    parser.add_argument("--warmup", type=int, default=5, help="frames excluded from the statistics")
+    parser.add_argument("--model-complexity", type=int, default=1, choices=[0, 1])
+    parser.add_argument("--backend", help="hand backend (handBackends), e.g. mediapipe-lite, tasks or auto")
+    parser.add_argument("--inference-budget", type=float, default=30.0,
+                        help="per-frame budget in ms that --backend auto picks for")
+    parser.add_argument("--roi-tracking", action="store_true",
+                        help="crop inference to the previous frame's hand box")
+    parser.add_argument("--adaptive-rate", action="store_true",
+                        help="run inference every few frames and predict landmarks in between")
+    parser.add_argument("--json", help="write machine-readable results to this file")
+    args = parser.parse_args()
+
+    results = []
+    for path in args.videos:
+        # Fresh detector per video so tracking state does not leak between clips
+        detector = handDetector(modelComplexity=args.model_complexity, roiTracking=args.roi_tracking,
+                                adaptiveRate=args.adaptive_rate, backend=args.backend,
+                                backendBudget=args.inference_budget / 1000.0)
+        result = run_video(path, detector, args.mode, args.display, args.max_frames, args.warmup)
+        print_result(result)
+        results.append(result)
+
+    if args.json:
+        report = {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "machine": platform.platform(),
+            "python": platform.python_version(),
+            "opencv": cv2.__version__,
+            "settings": {"mode": args.mode, "display": list(args.display),
+                         "warmup": args.warmup, "model_complexity": args.model_complexity,
+                         "backend": detector.backend,
+                         "roi_tracking": args.roi_tracking, "adaptive_rate": args.adaptive_rate},
+            "results": results,
+        }
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print("results written to", args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import cv2
+import numpy as np
+
+
+class BoardCompositor:
+    """Incremental compositing of the painting canvas.
+
+    Keeps a cached composite of the strokes on white and only re-blends the
+    rectangles touched since the last frame. For the camera overlay it
+    remembers, per band of `tile` rows, the horizontal span that has ever
+    been inked, so the add only runs where ink can be. All buffers are
+    allocated once.
+
+    With alpha=True the canvas is premultiplied color and ink is coverage
+    (0..255), as the brush engine paints them; the board is then
+    white * (1 - ink) + canvas instead of a hard copy.
+    """
+
+    def __init__(self, width, height, tile=32, alpha=False):
+        self.width = width
+        self.height = height
+        self.tile = tile
+        self.alpha = alpha
+        self.board = np.full((height, width, 3), 255, np.uint8)
+        self.dirty = []
+        rows = (height + tile - 1) // tile
+        self.span_x0 = np.full(rows, width, np.int32)
+        self.span_x1 = np.zeros(rows, np.int32)
+
+    def mark(self, x0, y0, x1, y1, thickness, ink=True):
+        """Record a line from (x0, y0) to (x1, y1); ink=False for eraser strokes."""
+        r = thickness // 2 + 2
+        self.mark_rect(min(x0, x1) - r, min(y0, y1) - r, max(x0, x1) + r + 1, max(y0, y1) + r + 1, ink)
+
+    def mark_rect(self, x0, y0, x1, y1, ink=True):
+        """Record a changed rectangle of the canvas."""
+        rx0, rx1 = max(x0, 0), min(x1, self.width)
+        ry0, ry1 = max(y0, 0), min(y1, self.height)
+        if rx0 >= rx1 or ry0 >= ry1:
+            return
+        self.dirty.append((rx0, ry0, rx1, ry1))
+        if len(self.dirty) > 64:
+            # Board composite not requested for a while (camera mode); merge
+            # into one bounding rectangle instead of growing the list
+            xs0, ys0, xs1, ys1 = zip(*self.dirty)
+            self.dirty = [(min(xs0), min(ys0), max(xs1), max(ys1))]
+        if ink:
+            # Erasing never grows the inked area, so spans stay a safe superset
+            b0, b1 = ry0 // self.tile, (ry1 - 1) // self.tile + 1
+            np.minimum(self.span_x0[b0:b1], rx0, out=self.span_x0[b0:b1])
+            np.maximum(self.span_x1[b0:b1], rx1, out=self.span_x1[b0:b1])
+
+    def compose_board(self, canvas, ink):
+        """Strokes on a white background. Returns the cached buffer."""
+        for x0, y0, x1, y1 in self.dirty:
+            out = self.board[y0:y1, x0:x1]
+            if self.alpha:
+                cv2.cvtColor(cv2.bitwise_not(ink[y0:y1, x0:x1]), cv2.COLOR_GRAY2BGR, dst=out)
+                cv2.add(out, canvas[y0:y1, x0:x1], dst=out)
+                continue
+            out[:] = 255
+            np.copyto(out, canvas[y0:y1, x0:x1], where=ink[y0:y1, x0:x1, None].view(bool))
+        self.dirty.clear()
+        return self.board
+
+    def compose_cam(self, img, canvas):
+        """Adds the canvas onto img in place, only over the inked spans."""
+        t = self.tile
+        for band in np.flatnonzero(self.span_x1 > self.span_x0):
+            y0, y1 = band * t, min((band + 1) * t, self.height)
+            x0, x1 = self.span_x0[band], self.span_x1[band]
+            roi = img[y0:y1, x0:x1]
+            cv2.add(roi, canvas[y0:y1, x0:x1], dst=roi)
+        return img
+
+    def reset(self):
+        self.board[:] = 255
+        self.dirty.clear()
+        self.span_x0[:] = self.width
+        self.span_x1[:] = 0
@@ -0,0 +1,206 @@
+"""Anti-aliased brush for the painting board.
+
+A segment is drawn as a row of round dabs. Each dab is a cached stamp: an
+anti-aliased disc for one radius (quarter-pixel steps) and one sub-pixel
+offset, so a dab costs one np.maximum over the stamp and nothing else.
+The dabs of a segment are max-combined into a small coverage patch, which
+is then composited into the board once.
+
+The board layers hold premultiplied color (canvas) and coverage (ink,
+0..255), so the camera overlay stays a plain cv2.add and the white board
+is 255 - ink + canvas. Coverage of the stroke being drawn is kept per pen;
+a segment only adds the coverage its stroke did not have yet, so dabs and
+segment joints never darken the soft edge.
+
+The width follows the fingertip depth MediaPipe reports (z, negative
+towards the camera): pressing towards the camera paints wider.
+
+Benchmark against the cv2.line path (canvas, ink mask and live frame):
+    python brushEngine.py --radius 25
+"""
+import argparse
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+
+class BrushEngine:
+    def __init__(self, spacing=0.25, phases=4, cache_size=512, depth_range=(0.0, 0.12),
+                 width_range=(0.6, 1.5), smoothing=0.5):
+        self.spacing = spacing  # dab distance as a fraction of the radius
+        self.phases = phases  # sub-pixel stamp offsets per axis
+        self.cache_size = cache_size
+        self.stamps = OrderedDict()
+        self.depth_range = depth_range  # fingertip depth (z / frame width) mapped to...
+        self.width_range = width_range  # ...this factor of the nominal width
+        self.smoothing = smoothing
+        self.radii = {}  # pen -> last radius, for smoothing
+        self.strokes = {}  # pen -> [coverage of its current stroke, touched box]
+
+    # --- stamps ---------------------------------------------------------------
+
+    def stamp(self, radius, fx=0, fy=0):
+        """Anti-aliased disc of radius centered fx/phases, fy/phases right/below the middle pixel."""
+        key = (int(round(radius * 4)), fx, fy)
+        alpha = self.stamps.get(key)
+        if alpha is not None:
+            self.stamps.move_to_end(key)
+            return alpha
+        r = key[0] / 4.0
+        h = int(np.ceil(r)) + 1
+        yy, xx = np.mgrid[-h:h + 1, -h:h + 1].astype(np.float32)
+        dist = np.hypot(xx - fx / self.phases, yy - fy / self.phases)
+        alpha = np.rint(np.clip(r + 0.5 - dist, 0.0, 1.0) * 255).astype(np.uint8)
+        self.stamps[key] = alpha
+        if len(self.stamps) > self.cache_size:
+            self.stamps.popitem(last=False)
+        return alpha
+
+    def radius_for(self, depth, nominal, key=None):
+        """Brush radius for a fingertip depth (-z / frame width), smoothed per pen.
+
+        Without a depth (None) the radius is the nominal one.
+        """
+        if depth is None:
+            return nominal
+        lo, hi = self.depth_range
+        press = min(max((depth - lo) / (hi - lo), 0.0), 1.0)
+        radius = nominal * (self.width_range[0] + press * (self.width_range[1] - self.width_range[0]))
+        if key is not None:
+            last = self.radii.get(key)
+            if last is not None:
+                radius = self.smoothing * last + (1.0 - self.smoothing) * radius
+            self.radii[key] = radius
+        return radius
+
+    # --- strokes ----------------------------------------------------------------
+
+    def end_stroke(self, key):
+        """The pen lifted: its next segment starts a new stroke."""
+        stroke = self.strokes.get(key)
+        if stroke is not None and stroke[1] is not None:
+            x0, y0, x1, y1 = stroke[1]
+            stroke[0][y0:y1, x0:x1] = 0
+            stroke[1] = None
+        self.radii.pop(key, None)
+
+    def segment(self, canvas, ink, key, x0, y0, x1, y1, r0, r1, color, eraser=False):
+        """Draw a segment whose radius goes from r0 to r1; returns the touched rect or None."""
+        # The patch holds every dab whole, even off the board, so the dab
+        # loop needs no clipping; it is cropped to the board afterwards
+        pad = int(np.ceil(max(r0, r1))) + 2
+        ux0, uy0 = int(np.floor(min(x0, x1))) - pad, int(np.floor(min(y0, y1))) - pad
+        ux1, uy1 = int(np.floor(max(x0, x1))) + pad + 1, int(np.floor(max(y0, y1))) + pad + 1
+        height, width = ink.shape
+        bx0, by0, bx1, by1 = max(ux0, 0), max(uy0, 0), min(ux1, width), min(uy1, height)
+        if bx0 >= bx1 or by0 >= by1:
+            return None
+        patch = np.zeros((uy1 - uy0, ux1 - ux0), np.uint8)
+
+        length = float(np.hypot(x1 - x0, y1 - y0))
+        step = max(min(r0, r1) * self.spacing, 0.5)
+        n = max(int(np.ceil(length / step)), 1)
+        p = self.phases
+        t = np.linspace(0.0, 1.0, n + 1)
+        # Dab centers in 1/phases pixel units, split into pixel and sub-pixel offset
+        qx = np.rint((x0 + (x1 - x0) * t) * p).astype(int)
+        qy = np.rint((y0 + (y1 - y0) * t) * p).astype(int)
+        radii = r0 + (r1 - r0) * t
+        ix, fx = divmod(qx - ux0 * p, p)
+        iy, fy = divmod(qy - uy0 * p, p)
+        for sx, fx, sy, fy, r in zip(ix.tolist(), fx.tolist(), iy.tolist(), fy.tolist(), radii.tolist()):
+            alpha = self.stamp(r, fx, fy)
+            h = alpha.shape[0] // 2
+            dst = patch[sy - h:sy + h + 1, sx - h:sx + h + 1]
+            cv2.max(dst, alpha, dst=dst)
+
+        patch = patch[by0 - uy0:by1 - uy0, bx0 - ux0:bx1 - ux0]
+        self._composite(canvas, ink, key, (bx0, by0, bx1, by1), patch, color, eraser)
+        return bx0, by0, bx1, by1
+
+    def _composite(self, canvas, ink, key, rect, patch, color, eraser):
+        bx0, by0, bx1, by1 = rect
+        stroke = self.strokes.get(key)
+        if stroke is None or stroke[0].shape != ink.shape:
+            stroke = self.strokes[key] = [np.zeros(ink.shape, np.uint8), None]
+        coverage = stroke[0][by0:by1, bx0:bx1]
+        # Coverage this segment adds to its stroke, as a fraction of what was
+        # left; compositing it on top is the same as compositing the whole
+        # stroke once. uint8 cv2 arithmetic throughout, it is the hot path.
+        grown = cv2.max(coverage, patch)
+        k = cv2.divide(cv2.subtract(grown, coverage), cv2.subtract(255, coverage), scale=255)
+        coverage[:] = grown
+        k3 = cv2.cvtColor(k, cv2.COLOR_GRAY2BGR)
+        a = ink[by0:by1, bx0:bx1]
+        c = canvas[by0:by1, bx0:bx1]
+        cv2.subtract(a, cv2.multiply(a, k, scale=1 / 255), dst=a)
+        cv2.subtract(c, cv2.multiply(c, k3, scale=1 / 255), dst=c)
+        if not eraser:
+            cv2.add(a, k, dst=a)
+            cv2.add(c, cv2.multiply(k3, tuple(color) + (0,), scale=1 / 255), dst=c)
+        box = stroke[1]
+        stroke[1] = rect if box is None else (min(box[0], bx0), min(box[1], by0),
+                                              max(box[2], bx1), max(box[3], by1))
+
+    def polyline(self, canvas, ink, points, radii, color, eraser=False):
+        """Draw a whole recorded stroke (redraw after undo); radii per point.
+
+        canvas and ink may be any size (scratch areas), the stroke coverage
+        is kept for just this call.
+        """
+        key = "redraw"
+        if len(points) == 1:
+            self.segment(canvas, ink, key, points[0][0], points[0][1], points[0][0], points[0][1],
+                         radii[0], radii[0], color, eraser)
+        for i in range(1, len(points)):
+            self.segment(canvas, ink, key, points[i - 1][0], points[i - 1][1], points[i][0], points[i][1],
+                         radii[i - 1], radii[i], color, eraser)
+        self.strokes.pop(key, None)
+
+
+def benchmark(radius=25, segments=2000, length=40, size=(640, 480)):
+    """Microseconds per segment: cv2.line into canvas, ink and live frame (as
+    PaintingBoard draws without the brush, plain and anti-aliased) vs the brush."""
+    w, h = size
+    rng = np.random.default_rng(0)
+    starts = rng.uniform((radius, radius), (w - radius - length, h - radius - length), (segments, 2))
+    angles = rng.uniform(0, 2 * np.pi, segments)
+    ends = starts + length * np.stack([np.cos(angles), np.sin(angles)], axis=1)
+    canvas = np.zeros((h, w, 3), np.uint8)
+    ink = np.zeros((h, w), np.uint8)
+    frame = np.zeros((h, w, 3), np.uint8)
+    color = (0, 0, 255)
+    thickness = int(round(2 * radius))
+
+    result = {}
+    for name, line_type in (("cv2.line x3", cv2.LINE_8), ("cv2.line x3 AA", cv2.LINE_AA)):
+        started = time.perf_counter()
+        for (x0, y0), (x1, y1) in zip(starts.astype(int), ends.astype(int)):
+            cv2.line(canvas, (x0, y0), (x1, y1), color, thickness, line_type)
+            cv2.line(ink, (x0, y0), (x1, y1), 1, thickness, line_type)
+            cv2.line(frame, (x0, y0), (x1, y1), color, thickness, line_type)
+        result[name] = (time.perf_counter() - started) / segments * 1e6
+
+    engine = BrushEngine()
+    canvas[:] = 0
+    ink[:] = 0
+    started = time.perf_counter()
+    for i, ((x0, y0), (x1, y1)) in enumerate(zip(starts, ends)):
+        if i % 20 == 0:
+            engine.end_stroke(0)
+        engine.segment(canvas, ink, 0, x0, y0, x1, y1, radius, radius, color)
+    result["brush"] = (time.perf_counter() - started) / segments * 1e6
+    result["stamps cached"] = len(engine.stamps)
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the brush against cv2.line")
+    parser.add_argument("--radius", type=float, default=25, help="brush radius (the eraser is 25)")
+    parser.add_argument("--length", type=float, default=40, help="segment length in pixels")
+    parser.add_argument("--segments", type=int, default=2000)
+    args = parser.parse_args()
+    for name, value in benchmark(args.radius, args.segments, args.length).items():
+        print("%-14s %8.1f" % (name, value) + (" us/segment" if name != "stamps cached" else ""))
@@ -0,0 +1,202 @@
+"""Autosaved painting sessions.
+
+A session is a directory:
+
+    canvas.npy   (H, W, 3) uint8, memory mapped
+    ink.npy      (H, W)    uint8 coverage mask, memory mapped
+    tiles.npy    (rows, cols) bool, which tiles hold ink
+    strokes.npz  StrokeStore.state(), for undo and re-rendering
+
+The painting thread only marks changed tiles and, every `interval`
+seconds, copies those tiles out; a writer thread puts them into the
+memory maps and flushes. The .npy files are created sparse, so empty
+regions of a large whiteboard cost no disk space, and loading copies
+only the tiles that hold ink - nothing is decoded and untouched pages of
+the map are never read.
+"""
+import json
+import os
+import queue
+import threading
+import time
+import zipfile
+
+import numpy as np
+
+from strokeStore import StrokeStore
+
+
+class CanvasStore:
+    def __init__(self, path, width, height, tile=64, interval=5.0):
+        self.path = path
+        self.width = width
+        self.height = height
+        self.tile = tile
+        self.interval = interval
+        self.rows = (height + tile - 1) // tile
+        self.cols = (width + tile - 1) // tile
+        # Tiles changed since the last snapshot (painting thread only)
+        self.dirty = np.zeros((self.rows, self.cols), np.bool_)
+        self.saved_revision = None
+        self.last_save = time.perf_counter()
+        self.writes = queue.Queue()
+        self.writer = None
+        self.canvas_map = None
+        self.ink_map = None
+        self.tiles = None
+
+    # --- opening / loading --------------------------------------------------
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def open(self):
+        """Map the session files, creating an empty session if there is none.
+
+        Returns True when an existing session of the same size was found.
+        """
+        os.makedirs(self.path, exist_ok=True)
+        found = False
+        try:
+            with open(self._file("meta.json")) as f:
+                meta = json.load(f)
+            found = (meta["width"], meta["height"], meta["tile"]) == (self.width, self.height, self.tile)
+            if not found:
+                print("session %s is %dx%d, starting a new one" % (self.path, meta["width"], meta["height"]))
+        except (OSError, ValueError, KeyError):
+            pass
+
+        mode = "r+" if found else "w+"
+        shapes = {"canvas": (self.height, self.width, 3), "ink": (self.height, self.width),
+                  "tiles": (self.rows, self.cols)}
+        try:
+            self.canvas_map = np.lib.format.open_memmap(self._file("canvas.npy"), mode, np.uint8, shapes["canvas"])
+            self.ink_map = np.lib.format.open_memmap(self._file("ink.npy"), mode, np.uint8, shapes["ink"])
+            self.tiles = np.lib.format.open_memmap(self._file("tiles.npy"), mode, np.bool_, shapes["tiles"])
+        except (OSError, ValueError):
+            if not found:
+                raise
+            # Damaged session: start over
+            return self.open_new()
+        if not found:
+            with open(self._file("meta.json"), "w") as f:
+                json.dump({"width": self.width, "height": self.height, "tile": self.tile}, f)
+            self._remove("strokes.npz")
+
+        self.writer = threading.Thread(target=self._write_loop, name="canvas-autosave", daemon=True)
+        self.writer.start()
+        return found
+
+    def open_new(self):
+        self._remove("meta.json")
+        return self.open()
+
+    def load(self, canvas, ink):
+        """Copy the saved ink into canvas/ink and return the saved StrokeStore (or None)."""
+        t = self.tile
+        for r, c in np.argwhere(self.tiles):
+            y0, x0 = r * t, c * t
+            canvas[y0:y0 + t, x0:x0 + t] = self.canvas_map[y0:y0 + t, x0:x0 + t]
+            ink[y0:y0 + t, x0:x0 + t] = self.ink_map[y0:y0 + t, x0:x0 + t]
+        try:
+            with np.load(self._file("strokes.npz")) as data:
+                strokes = StrokeStore.from_state(data)
+        except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+            # Missing or damaged (written before the atomic replace): the ink still loads
+            return None
+        self.saved_revision = strokes.revision
+        return strokes
+
+    def inked_rects(self):
+        """Pixel rectangles (x0, y0, x1, y1) of the saved tiles that hold ink."""
+        t = self.tile
+        return [(c * t, r * t, min((c + 1) * t, self.width), min((r + 1) * t, self.height))
+                for r, c in np.argwhere(self.tiles)]
+
+    # --- saving ---------------------------------------------------------------
+
+    def mark(self, x0, y0, x1, y1, thickness):
+        r = thickness // 2 + 2
+        self.mark_rect(min(x0, x1) - r, min(y0, y1) - r, max(x0, x1) + r + 1, max(y0, y1) + r + 1)
+
+    def mark_rect(self, x0, y0, x1, y1):
+        t = self.tile
+        c0, c1 = max(int(x0) // t, 0), min((int(x1) - 1) // t + 1, self.cols)
+        r0, r1 = max(int(y0) // t, 0), min((int(y1) - 1) // t + 1, self.rows)
+        if c0 < c1 and r0 < r1:
+            self.dirty[r0:r1, c0:c1] = True
+
+    def maybe_save(self, canvas, ink, strokes, now=None):
+        """Snapshot changes if `interval` seconds passed; cheap enough for every frame."""
+        now = time.perf_counter() if now is None else now
+        if now - self.last_save >= self.interval:
+            self.save(canvas, ink, strokes)
+            self.last_save = now
+
+    def save(self, canvas, ink, strokes):
+        """Copy the changed tiles (and strokes, if changed) and hand them to the writer.
+
+        Runs on the painting thread; the copies are what keeps the writer
+        from seeing half-drawn frames.
+        """
+        if self.writer is None:
+            return
+        t = self.tile
+        tiles = []
+        for r, c in np.argwhere(self.dirty):
+            y0, x0 = r * t, c * t
+            tiles.append((r, c, canvas[y0:y0 + t, x0:x0 + t].copy(), ink[y0:y0 + t, x0:x0 + t].copy()))
+        self.dirty[:] = False
+        state = None
+        if strokes is not None and strokes.revision != self.saved_revision:
+            state = strokes.state()
+            self.saved_revision = strokes.revision
+        if tiles or state is not None:
+            self.writes.put((tiles, state))
+
+    def reset(self):
+        """Everything changed (board cleared): the next save rewrites all tiles."""
+        self.dirty[:] = True
+        self.saved_revision = None
+
+    def close(self, canvas=None, ink=None, strokes=None):
+        """Final save (if buffers are given), then wait for the writer."""
+        if self.writer is None:
+            return
+        if canvas is not None:
+            self.save(canvas, ink, strokes)
+        self.writes.put(None)
+        self.writer.join()
+        self.writer = None
+        self.canvas_map = self.ink_map = self.tiles = None
+
+    def _write_loop(self):
+        while True:
+            item = self.writes.get()
+            if item is None:
+                break
+            tiles, state = item
+            t = self.tile
+            for r, c, canvas_tile, ink_tile in tiles:
+                y0, x0 = r * t, c * t
+                self.canvas_map[y0:y0 + t, x0:x0 + t] = canvas_tile
+                self.ink_map[y0:y0 + t, x0:x0 + t] = ink_tile
+                self.tiles[r, c] = ink_tile.any()
+            try:
+                if tiles:
+                    self.canvas_map.flush()
+                    self.ink_map.flush()
+                    self.tiles.flush()
+                if state is not None:
+                    # Write aside and rename so a crash never leaves half a file
+                    tmp = self._file("strokes.tmp.npz")
+                    np.savez(tmp, **state)
+                    os.replace(tmp, self._file("strokes.npz"))
+            except OSError as e:
+                print("autosave failed:", e)
+
+    def _remove(self, name):
+        try:
+            os.remove(self._file(name))
+        except OSError:
+            pass
@@ -0,0 +1,296 @@
+"""Frame sources that always hand out the newest frame.
+
+cv2.VideoCapture(0) with default settings leaves the resolution, codec
+and driver buffer to the driver. Several buffered frames mean the frame
+being tracked is already old, so the stroke trails behind the finger.
+CameraSource asks for a resolution, frame rate and MJPG and shrinks the
+driver buffer. It then grabs on its own thread and keeps only the newest
+frame, stamped with its capture time (time.perf_counter clock). Frames
+nobody read are counted as dropped.
+
+FileSource plays a video (paced at its frame rate, or as fast as it is
+read) and SyntheticSource draws moving test frames, so everything above
+can run without a camera. open_source() picks one from a string:
+
+    0, 1, ...                  camera index
+    synthetic[:WxH[@FPS]]      generated frames
+    anything else              video file
+
+Measure a source:
+    python captureSource.py 0 --size 640x480 --fps 30 --seconds 10
+"""
+import abc
+import argparse
+import sys
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from perfMetrics import registry
+
+
+def parse_size(text):
+    w, h = text.lower().split("x")
+    return int(w), int(h)
+
+
+class FrameSource(abc.ABC):
+    """Base class: a thread produces frames, read() returns the newest one."""
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.frame = None
+        self.captured = 0.0
+        self.seq = 0
+        self.read_seq = 0
+        self.dropped = 0
+        self.ended = False
+        self.running = False
+        self.thread = None
+        self.info = {}
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name=type(self).__name__, daemon=True)
+        self.thread.start()
+        return self
+
+    def read(self, timeout=None):
+        """Newest frame not read yet as (frame, captured, seq).
+
+        Waits up to timeout seconds for one; returns None on timeout and once
+        the source has ended.
+        """
+        with self.cond:
+            if not self.cond.wait_for(lambda: self.seq > self.read_seq or self.ended, timeout):
+                return None
+            if self.seq <= self.read_seq:
+                return None
+            if self.seq - self.read_seq > 1:
+                self.dropped += self.seq - self.read_seq - 1
+            self.read_seq = self.seq
+            self.cond.notify_all()
+            return self.frame, self.captured, self.seq
+
+    def stop(self):
+        self.running = False
+        with self.cond:
+            self.cond.notify_all()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout=2.0)
+
+    def _publish(self, frame, captured):
+        with self.cond:
+            self.frame = frame
+            self.captured = captured
+            self.seq += 1
+            self.cond.notify_all()
+
+    def _end(self):
+        with self.cond:
+            self.ended = True
+            self.cond.notify_all()
+
+    @abc.abstractmethod
+    def _run(self):
+        """Produces frames with _publish() while self.running; _end() when out of frames."""
+
+
+class CameraSource(FrameSource):
+    def __init__(self, index=0, width=640, height=480, fps=30, fourcc="MJPG", buffersize=1,
+                 api=cv2.CAP_ANY):
+        super().__init__()
+        self.index = index
+        self.request = {"width": width, "height": height, "fps": fps, "fourcc": fourcc,
+                        "buffersize": buffersize}
+        self.api = api
+        self.cap = None
+
+    def open(self):
+        """Open the camera and negotiate; returns what the driver granted."""
+        cap = cv2.VideoCapture(self.index, self.api)
+        if not cap.isOpened():
+            raise IOError("cannot open camera %s" % self.index)
+        r = self.request
+        # The codec decides which sizes and rates are offered, so it goes first
+        if r["fourcc"]:
+            cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*r["fourcc"]))
+        if r["width"] and r["height"]:
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, r["width"])
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, r["height"])
+        if r["fps"]:
+            cap.set(cv2.CAP_PROP_FPS, r["fps"])
+        if r["buffersize"]:
+            # Not every backend supports it; the grab thread keeps it drained anyway
+            cap.set(cv2.CAP_PROP_BUFFERSIZE, r["buffersize"])
+        code = int(cap.get(cv2.CAP_PROP_FOURCC))
+        self.info = {
+            "width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            "fps": cap.get(cv2.CAP_PROP_FPS),
+            "fourcc": "".join(chr((code >> 8 * i) & 0xFF) for i in range(4)) if code > 0 else "?",
+            "buffersize": int(cap.get(cv2.CAP_PROP_BUFFERSIZE)),
+            "backend": cap.getBackendName(),
+        }
+        print("camera %s: %dx%d @ %.0f fps %s, buffer %d (%s)" % (
+            self.index, self.info["width"], self.info["height"], self.info["fps"], self.info["fourcc"],
+            self.info["buffersize"], self.info["backend"]))
+        self.cap = cap
+        return self.info
+
+    def _run(self):
+        if self.cap is None:
+            try:
+                self.open()
+            except IOError as e:
+                print(e)
+                self._end()
+                return
+        failures = 0
+        while self.running:
+            # grab() returns once the frame is off the driver; decode afterwards
+            if not self.cap.grab():
+                failures += 1
+                if failures > 30:
+                    break
+                time.sleep(0.01)
+                continue
+            captured = time.perf_counter()
+            failures = 0
+            success, frame = self.cap.retrieve()
+            if success:
+                registry.observe("decode", time.perf_counter() - captured)
+                self._publish(frame, captured)
+        self.cap.release()
+        self._end()
+
+
+class FileSource(FrameSource):
+    """A video file; realtime paces it like a camera, otherwise read() drives it."""
+
+    def __init__(self, path, realtime=False, loop=False):
+        super().__init__()
+        self.path = path
+        self.realtime = realtime
+        self.loop = loop
+
+    def _run(self):
+        cap = cv2.VideoCapture(self.path)
+        if not cap.isOpened():
+            print("cannot open video: %s" % self.path)
+            self._end()
+            return
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.info = {"width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                     "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)), "fps": fps, "fourcc": "file"}
+        next_frame = time.perf_counter()
+        while self.running:
+            if not self.realtime:
+                # Every frame is delivered: wait until the last one was read
+                with self.cond:
+                    self.cond.wait_for(lambda: self.read_seq >= self.seq or not self.running)
+            success, frame = cap.read()
+            if not success:
+                if self.loop and cap.set(cv2.CAP_PROP_POS_FRAMES, 0):
+                    continue
+                break
+            if self.realtime:
+                next_frame += 1.0 / fps
+                delay = next_frame - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            self._publish(frame, time.perf_counter())
+        cap.release()
+        self._end()
+
+
+class SyntheticSource(FrameSource):
+    """Moving test pattern at a fixed rate; frames carry their sequence number."""
+
+    def __init__(self, width=640, height=480, fps=30.0, frames=None):
+        super().__init__()
+        self.info = {"width": width, "height": height, "fps": fps, "fourcc": "synthetic"}
+        self.frames = frames
+
+    def _run(self):
+        w, h, fps = self.info["width"], self.info["height"], self.info["fps"]
+        background = np.full((h, w, 3), 40, np.uint8)
+        next_frame = time.perf_counter()
+        n = 0
+        while self.running and (self.frames is None or n < self.frames):
+            next_frame += 1.0 / fps
+            delay = next_frame - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            frame = background.copy()
+            t = n / fps
+            x = int(w / 2 + w / 3 * np.cos(t))
+            y = int(h / 2 + h / 3 * np.sin(2 * t))
+            cv2.circle(frame, (x, y), 20, (0, 200, 255), cv2.FILLED)
+            cv2.putText(frame, str(n), (10, h - 10), cv2.FONT_HERSHEY_PLAIN, 2, (255, 255, 255), 2)
+            self._publish(frame, time.perf_counter())
+            n += 1
+        self._end()
+
+
+def open_source(spec, width=640, height=480, fps=30, fourcc="MJPG", buffersize=1, realtime=False):
+    """FrameSource for a camera index, "synthetic[:WxH[@FPS]]" or a video path (not started)."""
+    if isinstance(spec, int) or str(spec).isdigit():
+        return CameraSource(int(spec), width, height, fps, fourcc, buffersize)
+    if str(spec).startswith("synthetic"):
+        size, _, rate = str(spec).partition(":")[2].partition("@")
+        w, h = parse_size(size) if size else (width, height)
+        return SyntheticSource(w, h, float(rate) if rate else fps or 30.0)
+    return FileSource(spec, realtime)
+
+
+def measure(source, seconds=10.0, work=0.0):
+    """Reads for `seconds` (spending `work` s per frame, like a tracker would) and
+    returns the frame rate and how old frames are when read."""
+    ages = []
+    intervals = []
+    last = None
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        item = source.read(timeout=1.0)
+        if item is None:
+            if source.ended:
+                break
+            continue
+        _, captured, _ = item
+        ages.append(time.perf_counter() - captured)
+        if last is not None:
+            intervals.append(captured - last)
+        last = captured
+        if work:
+            time.sleep(work)
+    ms = np.asarray(ages) * 1000.0
+    return {
+        "frames": len(ages),
+        "fps": 1.0 / np.mean(intervals) if intervals else 0.0,
+        "age_p50_ms": float(np.percentile(ms, 50)) if len(ms) else 0.0,
+        "age_p95_ms": float(np.percentile(ms, 95)) if len(ms) else 0.0,
+        "dropped": source.dropped,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure a frame source")
+    parser.add_argument("source", nargs="?", default="0", help="camera index, video file or synthetic[:WxH[@FPS]]")
+    parser.add_argument("--size", type=parse_size, default=(640, 480), help="requested camera size, WxH")
+    parser.add_argument("--fps", type=float, default=30)
+    parser.add_argument("--fourcc", default="MJPG", help="requested camera codec ('' for the driver default)")
+    parser.add_argument("--buffersize", type=int, default=1)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--work-ms", type=float, default=0.0, help="simulated processing per frame")
+    args = parser.parse_args()
+    src = open_source(args.source, args.size[0], args.size[1], args.fps, args.fourcc, args.buffersize,
+                      realtime=True).start()
+    result = measure(src, args.seconds, args.work_ms / 1000.0)
+    src.stop()
+    if not result["frames"]:
+        sys.exit("no frames from %s" % args.source)
+    print("%d frames, %.1f fps, frame age when read p50 %.1f ms p95 %.1f ms, dropped %d" % (
+        result["frames"], result["fps"], result["age_p50_ms"], result["age_p95_ms"], result["dropped"]))
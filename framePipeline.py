@@ -0,0 +1,195 @@
+import threading
+import time
+from collections import deque
+
+
+class LatestQueue:
+    """Bounded queue where a full put drops the oldest item (latest frame wins)."""
+
+    def __init__(self, maxsize=1):
+        self.items = deque(maxlen=maxsize)
+        self.cond = threading.Condition()
+        self.dropped = 0
+        self.closed = False
+
+    def put(self, item):
+        # Returns True when the oldest item had to be dropped
+        with self.cond:
+            dropped = len(self.items) == self.items.maxlen
+            if dropped:
+                self.dropped += 1  # oldest frame is overwritten
+            self.items.append(item)
+            self.cond.notify()
+            return dropped
+
+    def get(self, timeout=None):
+        # Returns None on timeout or when the queue was closed
+        with self.cond:
+            if not self.items and not self.closed:
+                self.cond.wait(timeout)
+            if self.items:
+                return self.items.popleft()
+            return None
+
+    def depth(self):
+        with self.cond:
+            return len(self.items)
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+
+class StageStats:
+    """Throughput counters for one pipeline stage."""
+
+    def __init__(self, name, window=2.0):
+        self.name = name
+        self.window = window
+        self.lock = threading.Lock()
+        self.count = 0
+        self.busy = 0.0
+        self.stamps = deque()
+
+    def record(self, started, finished):
+        with self.lock:
+            self.count += 1
+            self.busy += finished - started
+            self.stamps.append(finished)
+            while self.stamps and finished - self.stamps[0] > self.window:
+                self.stamps.popleft()
+
+    def snapshot(self):
+        with self.lock:
+            now = time.perf_counter()
+            while self.stamps and now - self.stamps[0] > self.window:
+                self.stamps.popleft()
+            fps = len(self.stamps) / self.window
+            avg_ms = 1000.0 * self.busy / self.count if self.count else 0.0
+            return {"fps": fps, "avg_ms": avg_ms, "frames": self.count}
+
+
+class FramePipeline:
+    """Runs capture -> inference -> compose on worker threads.
+
+    Each stage is a plain callable:
+      capture()               -> frame, or None when the source is exhausted
+      infer(frame)            -> result handed to compose
+      compose(result)         -> finished frame for the display thread
+    Stages are linked by LatestQueue instances so a slow stage never builds a
+    backlog; it just works on the newest frame available. The GUI thread calls
+    latest() to pick up the most recent finished frame.
+
+    If a perfMetrics.Metrics is given, dropped frames are counted in it as
+    "dropped_frames".
+
+    When the hands were tracked before a frame reached the pipeline (a
+    HandService tracks on its own thread and infer only picks the result
+    up), infer_time(frame) returns the seconds that tracking took; they are
+    added to the inference stage's busy time so the report still names the
+    right bottleneck.
+    """
+
+    def __init__(self, capture, infer, compose, queue_size=1, metrics=None, infer_time=None):
+        self.stages = [("capture", capture), ("inference", infer), ("compose", compose)]
+        self.upstream = {"inference": infer_time} if infer_time is not None else {}
+        # One queue between each pair of stages; the last stage publishes to self.output
+        self.queues = [LatestQueue(queue_size) for _ in self.stages[1:]]
+        self.stats = {name: StageStats(name) for name, _ in self.stages}
+        self.running = False
+        self.finished = False
+        self.threads = []
+        self.seq = 0
+        self.out_lock = threading.Lock()
+        self.output = None
+        self.shown = 0
+        self.display_dropped = 0
+        self.metrics = metrics
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.finished = False
+        for i, (name, fn) in enumerate(self.stages):
+            src = self.queues[i - 1] if i > 0 else None
+            dst = self.queues[i] if i < len(self.queues) else None
+            t = threading.Thread(target=self._run_stage, args=(name, fn, src, dst),
+                                 name="pipeline-" + name, daemon=True)
+            self.threads.append(t)
+            t.start()
+
+    def _run_stage(self, name, fn, src, dst):
+        stats = self.stats[name]
+        upstream = self.upstream.get(name)
+        while self.running:
+            if src is None:
+                started = time.perf_counter()
+                out = fn()
+                if out is None:
+                    # Source exhausted or camera failed
+                    self.finished = True
+                    break
+            else:
+                item = src.get(timeout=0.1)
+                if item is None:
+                    if src.closed:
+                        break
+                    continue
+                started = time.perf_counter()
+                out = fn(item)
+                if upstream is not None:
+                    # Count the work done for this item before it got here
+                    started -= upstream(item)
+            stats.record(started, time.perf_counter())
+            if dst is None:
+                with self.out_lock:
+                    self.seq += 1
+                    self.output = (self.seq, out)
+            elif dst.put(out) and self.metrics is not None:
+                self.metrics.count("dropped_frames")
+        if dst is not None:
+            dst.close()
+
+    def latest(self):
+        """Return the newest composed frame not yet shown, or None."""
+        with self.out_lock:
+            if self.output is None or self.output[0] <= self.shown:
+                return None
+            seq, frame = self.output
+            self.display_dropped += seq - self.shown - 1
+            if self.metrics is not None and seq - self.shown > 1:
+                self.metrics.count("dropped_frames", seq - self.shown - 1)
+            self.shown = seq
+            return frame
+
+    def stop(self):
+        self.running = False
+        for q in self.queues:
+            q.close()
+        for t in self.threads:
+            if t is not threading.current_thread():
+                t.join(timeout=1.0)
+        self.threads = []
+
+    def report(self):
+        """Per-stage throughput and average busy time per frame."""
+        stats = {}
+        for i, (name, _) in enumerate(self.stages):
+            snap = self.stats[name].snapshot()
+            # Frames this stage produced that the next one never saw
+            if i < len(self.queues):
+                snap["dropped"] = self.queues[i].dropped
+            else:
+                snap["dropped"] = self.display_dropped
+            stats[name] = snap
+        return stats
+
+    def format_report(self):
+        stats = self.report()
+        # The stage that spends longest per frame limits everything downstream
+        bottleneck = max(stats, key=lambda n: stats[n]["avg_ms"])
+        parts = ["%s %.1f fps %.1f ms drop %d" % (n, s["fps"], s["avg_ms"], s["dropped"])
+                 for n, s in stats.items()]
+        return " | ".join(parts) + " (bottleneck: %s)" % bottleneck
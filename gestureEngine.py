@@ -0,0 +1,179 @@
+"""Hand poses as tool controls, so changing tools needs no trip to the buttons.
+
+    index up            DRAW    the index fingertip paints
+    index + middle up   HOVER   the pen moves without painting
+    thumb-index pinch   PINCH   selects (the views switch to the next color)
+    fist                FIST    erases under the middle of the hand
+    open palm           PALM    clears the board, once per gesture
+
+classify() looks at every hand of the (n_hands, 21, 3) landmark array at
+once: finger extension from tip/joint distances to the wrist (which does
+not depend on how the hand is turned), a pose from a 16-entry table of
+finger patterns, and the pinch from the thumb-index gap relative to the
+palm size. GestureEngine adds hysteresis: the pinch gap has separate on
+and off thresholds, and a pose only takes over after it was seen for its
+number of frames (more for clearing than for drawing).
+
+Microbenchmark:
+    python gestureEngine.py --frames 20000
+"""
+import argparse
+import time
+
+import numpy as np
+
+NONE, DRAW, HOVER, PINCH, FIST, PALM = range(6)
+NAMES = ("none", "draw", "hover", "pinch", "fist", "palm")
+
+# Thumb to pinky: tips and the joint they are compared with. The thumb is
+# measured from the pinky knuckle, the fingers from the wrist
+TIPS = np.array([4, 8, 12, 16, 20])
+JOINTS = np.array([3, 6, 10, 14, 18])
+BASES = np.array([17, 0, 0, 0, 0])
+# The vectors classify() measures, as (to, from) landmarks: tips and
+# joints from their bases, the thumb-index gap and the palm (wrist to
+# middle knuckle)
+_TO = np.concatenate([TIPS, JOINTS, [4, 9]])
+_FROM = np.concatenate([BASES, BASES, [8, 0]])
+
+# Pose for each pattern of extended fingers (bit 0 index ... bit 3 pinky)
+PATTERNS = np.full(16, NONE, np.int8)
+PATTERNS[0b0000] = FIST
+PATTERNS[0b0001] = DRAW
+PATTERNS[0b0011] = HOVER
+PATTERNS[0b1111] = PALM
+BITS = np.array([1, 2, 4, 8])
+
+# Frames a pose must be seen before it takes over
+HOLD = {NONE: 3, DRAW: 1, HOVER: 2, PINCH: 3, FIST: 4, PALM: 12}
+
+
+def classify(landmarks, pinching=None, extend=1.15, pinch_on=0.25, pinch_off=0.35):
+    """Pose code of every hand in a (n, 21, 3) landmark array (pixels or normalized).
+
+    pinching is a bool per hand that was pinching last frame; those hands
+    keep the pinch until the gap exceeds pinch_off instead of pinch_on.
+    """
+    xy = np.asarray(landmarks)[:, :, :2]
+    v = xy[:, _TO] - xy[:, _FROM]
+    # Squared lengths: no square roots in the hot path
+    d = np.einsum("hki,hki->hk", v, v)
+    extended = d[:, 0:5] > (extend * extend) * d[:, 5:10]
+    pose = PATTERNS[extended[:, 1:] @ BITS]
+    # The open palm needs the thumb out as well
+    pose[(pose == PALM) & ~extended[:, 0]] = NONE
+
+    limit = pinch_on if pinching is None else np.where(pinching, pinch_off, pinch_on)
+    pinch = d[:, 10] < (limit * limit) * d[:, 11]
+    # In a fist the thumb rests on the index finger; that is no pinch
+    pose[pinch & (pose != FIST)] = PINCH
+    return pose
+
+
+class GestureEngine:
+    """Stable poses per hand; update() once per frame."""
+
+    def __init__(self, hold=None, **thresholds):
+        self.hold = dict(HOLD, **(hold or {}))
+        self.thresholds = thresholds
+        self.state = {}  # hand key -> [pose, candidate, frames seen]
+
+    def reset(self):
+        self.state.clear()
+
+    def update(self, landmarks, handedness=None):
+        """Returns (pose, entered) per hand: the stable pose and whether it began this frame.
+
+        Hands are followed by their handedness label, or by their index
+        without one. Hands that are gone are forgotten.
+        """
+        n = len(landmarks)
+        keys = list(handedness[:n]) if handedness is not None and len(handedness) >= n else list(range(n))
+        if len(set(keys)) < n:
+            keys = list(range(n))
+        for key in list(self.state):
+            if key not in keys:
+                del self.state[key]
+        if not n:
+            return []
+
+        pinching = np.array([self.state.get(key, (NONE,))[0] == PINCH for key in keys])
+        poses = classify(landmarks, pinching, **self.thresholds).tolist()
+        result = []
+        for key, seen in zip(keys, poses):
+            state = self.state.get(key)
+            if state is None:
+                state = self.state[key] = [NONE, NONE, 0]
+            if seen == state[0]:
+                state[1], state[2] = seen, 0
+                result.append((state[0], False))
+                continue
+            if seen == state[1]:
+                state[2] += 1
+            else:
+                state[1], state[2] = seen, 1
+            entered = state[2] >= self.hold[seen]
+            if entered:
+                state[0], state[2] = seen, 0
+            result.append((state[0], entered))
+        return result
+
+
+# --- synthetic hands, for the benchmark and quick checks ------------------------------
+
+# Knuckle directions (degrees from "up") and segment lengths of a right hand, palm to camera
+_FINGERS = ((-60, (0.45, 0.35, 0.3)), (-15, (0.4, 0.25, 0.2)), (0, (0.42, 0.28, 0.22)),
+            (15, (0.38, 0.25, 0.2)), (30, (0.3, 0.2, 0.18)))
+_KNUCKLES = ((-0.25, -0.3), (-0.2, -0.9), (0.0, -0.95), (0.2, -0.9), (0.38, -0.8))
+
+
+def synthetic_hand(extended, pinch=False, center=(320, 300), size=120):
+    """(21, 3) pixel landmarks of a hand with the given fingers (thumb..pinky) straight."""
+    pts = np.zeros((21, 3), np.float32)
+    for f, ((angle, lengths), (kx, ky), straight) in enumerate(zip(_FINGERS, _KNUCKLES, extended)):
+        x, y = kx, ky
+        pts[1 + 4 * f, :2] = x, y
+        a = np.radians(angle)
+        for j, length in enumerate(lengths):
+            # A curled finger folds back towards the palm
+            if not straight:
+                a += np.radians(100 if f else 50)
+            x, y = x + length * np.sin(a), y - length * np.cos(a)
+            pts[2 + 4 * f + j, :2] = x, y
+    if pinch:
+        pts[4, :2] = pts[8, :2] + (0.05, 0.05)
+    pts[:, :2] = pts[:, :2] * size + center
+    return pts
+
+
+def benchmark(frames=20000, hands=2):
+    poses = [synthetic_hand(e) for e in ((0, 1, 0, 0, 0), (0, 1, 1, 0, 0), (0, 0, 0, 0, 0), (1, 1, 1, 1, 1))]
+    poses.append(synthetic_hand((1, 1, 1, 1, 1), pinch=True))
+    rng = np.random.default_rng(0)
+    # Jittered landmark arrays of `hands` hands, cycled through
+    arrays = [np.stack([poses[(i + h) % len(poses)] + rng.normal(0, 1.5, (21, 3)).astype(np.float32)
+                        for h in range(hands)]) for i in range(64)]
+    labels = ["Right", "Left"][:hands]
+    engine = GestureEngine()
+    results = {}
+    for name, step in (("classify", lambda a: classify(a)), ("update", lambda a: engine.update(a, labels))):
+        for a in arrays[:8]:
+            step(a)
+        started = time.perf_counter()
+        for i in range(frames):
+            step(arrays[i % len(arrays)])
+        results[name] = (time.perf_counter() - started) / frames * 1e6
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Microbenchmark of the gesture classifier")
+    parser.add_argument("--frames", type=int, default=20000)
+    parser.add_argument("--hands", type=int, default=2, choices=[1, 2])
+    args = parser.parse_args()
+    checks = {"draw": (0, 1, 0, 0, 0), "hover": (0, 1, 1, 0, 0), "fist": (0, 0, 0, 0, 0), "palm": (1, 1, 1, 1, 1)}
+    seen = {name: NAMES[classify(synthetic_hand(e)[None])[0]] for name, e in checks.items()}
+    seen["pinch"] = NAMES[classify(synthetic_hand((1, 1, 1, 1, 1), pinch=True)[None])[0]]
+    print("synthetic hands:", ", ".join("%s -> %s" % item for item in seen.items()))
+    for name, us in benchmark(args.frames, args.hands).items():
+        print("%-9s %6.1f us/frame (%d hands)" % (name, us, args.hands))
@@ -0,0 +1,242 @@
+"""Hand landmark inference backends for handDetector.
+
+Every backend takes an RGB frame in process() and returns results shaped
+like mp.solutions.hands (multi_hand_landmarks of NormalizedLandmarkList,
+multi_handedness of ClassificationList, None when there is no hand), so
+ROI tracking, the adaptive rate, findLandmarks and drawing work the same
+whichever model runs.
+
+    mediapipe-full   mp.solutions.hands, model_complexity=1
+    mediapipe-lite   mp.solutions.hands, model_complexity=0
+    tasks            MediaPipe Tasks HandLandmarker; needs the
+                     hand_landmarker.task bundle ($HAND_LANDMARKER_MODEL or
+                     next to this file)
+    replay[:PATH]    landmarks from a landmarkLog recording, or no hands
+                     without one; no model, for tests
+
+select_backend() times the candidates on a few frames and keeps the most
+accurate one whose per-frame cost fits the budget.
+
+Compare the backends on this machine:
+    python handBackends.py --budget-ms 30
+"""
+import abc
+import argparse
+import os
+import statistics
+import time
+
+import numpy as np
+
+# Most accurate first. The Tasks bundle carries the newer full landmark
+# model; lite trades accuracy for about half the latency of full.
+ACCURACY_ORDER = ("tasks", "mediapipe-full", "mediapipe-lite")
+TASKS_MODEL = os.environ.get("HAND_LANDMARKER_MODEL",
+                             os.path.join(os.path.dirname(os.path.abspath(__file__)), "hand_landmarker.task"))
+
+
+class HandResults:
+    """The two fields of mp.solutions.hands results that handDetector reads."""
+
+    __slots__ = ("multi_hand_landmarks", "multi_handedness")
+
+    def __init__(self, multi_hand_landmarks=None, multi_handedness=None):
+        self.multi_hand_landmarks = multi_hand_landmarks
+        self.multi_handedness = multi_handedness
+
+
+def make_results(hands, labels, scores=None):
+    """HandResults from normalized (n, 21, 3) landmarks and "Left"/"Right" labels."""
+    from mediapipe.framework.formats import classification_pb2, landmark_pb2
+
+    if not len(hands):
+        return HandResults()
+    landmarks = [landmark_pb2.NormalizedLandmarkList(
+        landmark=[landmark_pb2.NormalizedLandmark(x=x, y=y, z=z) for x, y, z in hand])
+        for hand in np.asarray(hands, np.float32).tolist()]
+    handedness = [classification_pb2.ClassificationList(classification=[classification_pb2.Classification(
+        index=0 if label == "Left" else 1, label=label, score=1.0 if scores is None else float(scores[i]))])
+        for i, label in enumerate(labels)]
+    return HandResults(landmarks, handedness)
+
+
+class Backend(abc.ABC):
+    name = "?"
+
+    @abc.abstractmethod
+    def process(self, rgb):
+        """HandResults for one RGB frame."""
+
+    def close(self):
+        pass
+
+
+class MediaPipeBackend(Backend):
+    def __init__(self, complexity=1, static=False, max_hands=2, detection_con=0.5, tracking_con=0.5):
+        import mediapipe as mp
+
+        self.name = "mediapipe-full" if complexity else "mediapipe-lite"
+        self.hands = mp.solutions.hands.Hands(static_image_mode=static, max_num_hands=max_hands,
+                                              model_complexity=complexity,
+                                              min_detection_confidence=detection_con,
+                                              min_tracking_confidence=tracking_con)
+
+    def process(self, rgb):
+        return self.hands.process(rgb)
+
+    def close(self):
+        self.hands.close()
+
+
+class TasksBackend(Backend):
+    name = "tasks"
+
+    def __init__(self, model=TASKS_MODEL, static=False, max_hands=2, detection_con=0.5, tracking_con=0.5):
+        if not os.path.exists(model):
+            raise FileNotFoundError("hand landmarker model not found: %s" % model)
+        import mediapipe as mp
+        from mediapipe.tasks.python import BaseOptions, vision
+
+        self.mp = mp
+        self.static = static
+        options = vision.HandLandmarkerOptions(
+            base_options=BaseOptions(model_asset_path=model),
+            running_mode=vision.RunningMode.IMAGE if static else vision.RunningMode.VIDEO,
+            num_hands=max_hands, min_hand_detection_confidence=detection_con,
+            min_hand_presence_confidence=detection_con, min_tracking_confidence=tracking_con)
+        self.landmarker = vision.HandLandmarker.create_from_options(options)
+        self.timestamp = 0
+
+    def process(self, rgb):
+        image = self.mp.Image(image_format=self.mp.ImageFormat.SRGB, data=np.ascontiguousarray(rgb))
+        if self.static:
+            result = self.landmarker.detect(image)
+        else:
+            # Video mode wants strictly increasing timestamps
+            self.timestamp = max(self.timestamp + 1, int(time.perf_counter() * 1000))
+            result = self.landmarker.detect_for_video(image, self.timestamp)
+        if not result.hand_landmarks:
+            return HandResults()
+        hands = [[(lm.x, lm.y, lm.z) for lm in hand] for hand in result.hand_landmarks]
+        labels = [c[0].category_name for c in result.handedness]
+        scores = [c[0].score for c in result.handedness]
+        return make_results(hands, labels, scores)
+
+    def close(self):
+        self.landmarker.close()
+
+
+class ReplayBackend(Backend):
+    """Hands from a landmark log, one record per process() call, looping.
+    Without a log it never finds a hand."""
+
+    name = "replay"
+
+    def __init__(self, path=None, max_hands=2, **_):
+        self.max_hands = max_hands
+        self.log = None
+        self.i = 0
+        if path:
+            from landmarkLog import LandmarkLog
+            self.log = LandmarkLog(path)
+
+    def process(self, rgb):
+        if self.log is None or not len(self.log):
+            return HandResults()
+        _, landmarks, labels = self.log[self.i % len(self.log)]
+        self.i += 1
+        scale = np.array((self.log.width, self.log.height, self.log.width), np.float32)
+        return make_results(landmarks[:self.max_hands] / scale, labels[:self.max_hands])
+
+
+def create_backend(spec, static=False, max_hands=2, detection_con=0.5, tracking_con=0.5):
+    """Backend for a name from the module docstring ("replay:PATH" for a log)."""
+    name, _, arg = spec.partition(":")
+    options = {"static": static, "max_hands": max_hands, "detection_con": detection_con,
+               "tracking_con": tracking_con}
+    if name == "mediapipe-full":
+        return MediaPipeBackend(1, **options)
+    if name == "mediapipe-lite":
+        return MediaPipeBackend(0, **options)
+    if name == "tasks":
+        return TasksBackend(arg or TASKS_MODEL, **options)
+    if name == "replay":
+        return ReplayBackend(arg or None, **options)
+    raise ValueError("unknown hand backend %r" % spec)
+
+
+def measure(backend, frames, repeat=10, warmup=2):
+    """Median per-frame cost in seconds: the larger of wall time and process
+    CPU time (MediaPipe runs on several threads)."""
+    import cv2
+
+    rgbs = [cv2.cvtColor(f, cv2.COLOR_BGR2RGB) for f in frames]
+    for i in range(warmup):
+        backend.process(rgbs[i % len(rgbs)])
+    costs = []
+    for i in range(repeat):
+        wall, cpu = time.perf_counter(), time.process_time()
+        backend.process(rgbs[i % len(rgbs)])
+        costs.append(max(time.perf_counter() - wall, time.process_time() - cpu))
+    return statistics.median(costs)
+
+
+def select_backend(budget, frames=None, candidates=ACCURACY_ORDER, repeat=10, verbose=True, **options):
+    """Most accurate candidate that processes a frame within budget seconds.
+
+    frames are BGR test frames (default: one blank 640x480 frame; with no hand
+    MediaPipe searches for one on every frame, its expensive path). If no
+    candidate fits, the cheapest is used. Returns (backend, {name: cost}).
+    """
+    if frames is None:
+        frames = [np.zeros((480, 640, 3), np.uint8)]
+    costs = {}
+    cheapest = None
+    for name in candidates:
+        try:
+            backend = create_backend(name, **options)
+        except Exception as e:
+            if verbose:
+                print("hand backend %s unavailable: %s" % (name, e))
+            continue
+        cost = costs[name] = measure(backend, frames, repeat)
+        if verbose:
+            print("hand backend %s: %.1f ms per frame" % (name, cost * 1000))
+        if cost <= budget:
+            if cheapest is not None:
+                cheapest[0].close()
+            if verbose:
+                print("using %s (budget %.1f ms)" % (name, budget * 1000))
+            return backend, costs
+        if cheapest is None or cost < cheapest[1]:
+            if cheapest is not None:
+                cheapest[0].close()
+            cheapest = (backend, cost)
+        else:
+            backend.close()
+    if cheapest is None:
+        raise RuntimeError("no hand backend available")
+    if verbose:
+        print("no backend fits %.1f ms, using the cheapest: %s" % (budget * 1000, cheapest[0].name))
+    return cheapest[0], costs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the hand backends and pick one for a budget")
+    parser.add_argument("--budget-ms", type=float, default=30.0, help="per-frame inference budget")
+    parser.add_argument("--video", help="take test frames from this video instead of a blank frame")
+    parser.add_argument("--frames", type=int, default=30, help="frames timed per backend")
+    args = parser.parse_args()
+    frames = None
+    if args.video:
+        import cv2
+        cap = cv2.VideoCapture(args.video)
+        frames = []
+        while len(frames) < args.frames:
+            success, img = cap.read()
+            if not success:
+                break
+            frames.append(cv2.flip(img, 1))
+        cap.release()
+    backend, _ = select_backend(args.budget_ms / 1000.0, frames or None, repeat=args.frames)
+    backend.close()
@@ -0,0 +1,294 @@
+"""One camera and one hand tracker for the whole application.
+
+menu.py starts a HandService right after the first menu is on screen: it
+imports MediaPipe, runs the Hands graph once and opens the camera in the
+background. The service then keeps capturing and tracking on its own
+thread for as long as the application runs. Views subscribe to get the
+newest tracked frame and unsubscribe when they close, so switching views
+never reopens the camera or reloads the model.
+"""
+import threading
+import time
+
+from captureSource import open_source
+from framePipeline import LatestQueue
+from landmarkLog import LandmarkLog, LandmarkRecorder
+from perfMetrics import Metrics, registry
+
+
+def report(name, since):
+    """Record and print a startup duration measured from `since` (perf_counter)."""
+    seconds = time.perf_counter() - since
+    registry.milestone(name, seconds)
+    print("startup: %s %.0f ms" % (name, seconds * 1000))
+
+
+class HandFrame:
+    """A mirrored camera frame with the hands tracked in it.
+
+    image has the landmarks drawn on it; views may draw on it as well, as
+    only one view is subscribed at a time. landmarks is the pixel
+    (n_hands, 21, 3) array from handDetector.findLandmarks. captured is
+    the perf_counter time the frame came off the camera. tracking is the
+    seconds the service spent tracking it.
+    """
+
+    __slots__ = ("image", "landmarks", "handedness", "captured", "seq", "tracking")
+
+    def __init__(self, image, landmarks, handedness, captured, seq, tracking=0.0):
+        self.image = image
+        self.landmarks = landmarks
+        self.handedness = handedness
+        self.captured = captured
+        self.seq = seq
+        self.tracking = tracking
+
+    def tip(self, id=8, hand=0):
+        """Pixel (x, y) of one landmark of one hand, or None."""
+        if hand >= len(self.landmarks):
+            return None
+        return int(self.landmarks[hand, id, 0]), int(self.landmarks[hand, id, 1])
+
+
+class HandService:
+    def __init__(self, camera=0, detector_options=None, started=None, capture_options=None, record=None,
+                 governor=None):
+        """camera is anything captureSource.open_source takes; capture_options
+        are passed on to it (size, fps, fourcc, buffersize). record is a path
+        to log every tracked frame to (landmarkLog). governor is a
+        qosGovernor.QosGovernor whose level decides how much work a frame gets."""
+        self.camera = camera
+        self.record = record
+        self.governor = governor
+        self.scale = 1.0  # of the frames the detector was last given
+        self.recorder = None
+        self.detector_options = detector_options or {}
+        self.capture_options = capture_options or {}
+        self.started = time.perf_counter() if started is None else started
+        self.source = None
+        self.detector = None
+        self.errors = []
+        self.lock = threading.Lock()
+        self.subscribers = []
+        self.fresh = False
+        self.running = False
+        self.finished = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="hand-service", daemon=True)
+        self.thread.start()
+        return self
+
+    def subscribe(self):
+        """Returns a LatestQueue that receives every new HandFrame."""
+        frames = LatestQueue(1)
+        with self.lock:
+            if self.finished:
+                frames.close()
+            else:
+                self.subscribers.append(frames)
+                # Do not carry hands over from the previous view
+                self.fresh = True
+        return frames
+
+    def unsubscribe(self, frames):
+        with self.lock:
+            if frames in self.subscribers:
+                self.subscribers.remove(frames)
+        frames.close()
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(timeout=2.0)
+        if self.source is not None:
+            self.source.stop()
+            self.source = None
+
+    # --- service thread -------------------------------------------------------
+
+    def _open_camera(self):
+        try:
+            source = open_source(self.camera, **self.capture_options).start()
+            # The first frame starts the stream, which can take a while
+            if source.read(timeout=10.0) is None:
+                source.stop()
+                raise IOError("no frames from camera %s" % self.camera)
+            self.source = source
+            report("camera_ready", self.started)
+        except Exception as e:
+            self.errors.append(e)
+
+    def _load_model(self):
+        try:
+            import numpy as np
+            from handTrackingModule import handDetector  # imports MediaPipe
+
+            blank = np.zeros((self.capture_options.get("height") or 480, self.capture_options.get("width") or 640, 3),
+                             np.uint8)
+            # --backend auto times the backends at the capture size
+            options = dict(self.detector_options)
+            options.setdefault("calibrationFrames", [blank])
+            # Warm-up frames must not count in the detection rate
+            detector = handDetector(**options, metrics=Metrics(window=8))
+            detector.findHands(blank, draw=False)
+            detector.reset()
+            detector.metrics = registry
+            self.detector = detector
+            report("model_ready", self.started)
+        except Exception as e:
+            self.errors.append(e)
+
+    def _run(self):
+        # Opening the camera and loading the model are both slow; do them side by side
+        camera = threading.Thread(target=self._open_camera, name="hand-service-camera", daemon=True)
+        camera.start()
+        self._load_model()
+        camera.join()
+        if self.errors:
+            print("hand service failed to start:", self.errors[0])
+            self._finish()
+            return
+
+        import cv2
+        seq = 0
+        while self.running:
+            with self.lock:
+                subscribers = list(self.subscribers)
+                fresh, self.fresh = self.fresh, False
+            if not subscribers:
+                # Nobody is watching: skip inference. The source keeps a
+                # camera drained on its own thread; a video file just waits
+                time.sleep(0.05)
+                continue
+            if fresh:
+                self.detector.reset()
+
+            with registry.timer("capture"):
+                item = self.source.read(timeout=0.5)
+            if item is None:
+                if self.source.ended:
+                    break
+                continue
+            img, captured, _ = item
+            size = self.capture_options.get("width"), self.capture_options.get("height")
+            if size[0] and (img.shape[1], img.shape[0]) != size:
+                # The driver (or the video) gave another size; views expect the requested one
+                img = cv2.resize(img, size)
+            img = cv2.flip(img, 1)  # Mirror image, also a copy the source no longer holds
+            tracked = time.perf_counter()
+            self._track(img, seq)
+            landmarks, handedness, _ = self.detector.findLandmarks(img)
+            tracking = time.perf_counter() - tracked
+            seq += 1
+            if self.record:
+                if self.recorder is None:
+                    self.recorder = LandmarkRecorder(self.record, img.shape[1], img.shape[0],
+                                                     self.detector.maxHands)
+                self.recorder.write(landmarks, handedness, captured, seq)
+            self._deliver(HandFrame(img, landmarks, handedness, captured, seq, tracking), subscribers)
+        self._finish()
+
+    def _track(self, img, seq):
+        # Under load the governor turns off drawing, shrinks the inference
+        # frame or skips inference on some frames (the landmarks stay)
+        qos = self.governor
+        if qos is None:
+            self.detector.findHands(img)
+            return
+        if seq % qos.infer_every == 0:
+            scale = qos.inference_scale
+            if scale != self.scale:
+                self._rescale_roi(scale / self.scale)
+                self.scale = scale
+            if scale < 1.0:
+                import cv2
+                small = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+                self.detector.findHands(small, draw=False)
+            else:
+                self.detector.findHands(img, draw=False)
+        if qos.draw_landmarks:
+            self.detector.drawHands(img)
+
+    def _rescale_roi(self, ratio):
+        # With --roi-tracking the detector keeps the hand box in pixels of
+        # the frame it saw last; move it to the new inference size
+        box = self.detector.roiBox
+        if box is not None:
+            self.detector.roiBox = tuple(int(v * ratio) for v in box)
+
+    def _deliver(self, frame, subscribers):
+        for frames in subscribers:
+            if frames.put(frame):
+                registry.count("dropped_frames")
+
+    def _finish(self):
+        # Camera gone or service stopped: wake every view up with a closed queue
+        if self.recorder is not None:
+            self.recorder.close()
+        with self.lock:
+            self.finished = True
+            subscribers, self.subscribers = self.subscribers, []
+        for frames in subscribers:
+            frames.close()
+
+
+class ReplayService(HandService):
+    """Plays a landmark log to the views instead of a camera and the model.
+
+    Frames are dark images of the recorded size with the landmarks dotted
+    in, paced at the recorded times (scaled by speed; 0 means as fast as
+    the views take them). The log plays on while a view is subscribed and
+    pauses in between.
+    """
+
+    def __init__(self, path, speed=1.0, loop=False, started=None):
+        super().__init__(path, started=started)
+        self.speed = speed
+        self.loop = loop
+
+    def _run(self):
+        import cv2
+        import numpy as np
+
+        try:
+            log = LandmarkLog(self.camera)
+        except (OSError, ValueError) as e:
+            print("hand service failed to start:", e)
+            self._finish()
+            return
+        report("camera_ready", self.started)
+        background = np.full((log.height, log.width, 3), 40, np.uint8)
+        seq = 0
+        while self.running:
+            origin = None
+            i = 0
+            while self.running and i < len(log):
+                with self.lock:
+                    subscribers = list(self.subscribers)
+                if not subscribers:
+                    time.sleep(0.05)
+                    origin = None  # Resume at the recorded pace
+                    continue
+                t, landmarks, handedness = log[i]
+                if self.speed:
+                    if origin is None:
+                        origin = time.perf_counter() - t / self.speed
+                    delay = origin + t / self.speed - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                else:
+                    # Every frame reaches the views: wait until they took the last one
+                    while self.running and any(frames.depth() and not frames.closed for frames in subscribers):
+                        time.sleep(0.001)
+                img = background.copy()
+                for x, y, _ in landmarks.reshape(-1, 3):
+                    cv2.circle(img, (int(x), int(y)), 4, (0, 0, 255), cv2.FILLED)
+                seq += 1
+                self._deliver(HandFrame(img, landmarks, handedness, time.perf_counter(), seq), subscribers)
+                i += 1
+            if not self.loop:
+                break
+        self._finish()
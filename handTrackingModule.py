@@ -1,35 +1,261 @@
 import cv2
+import math
 import mediapipe as mp
+import numpy as np
 import time
+from handBackends import create_backend, select_backend
+from landmarkFilter import OneEuroFilter
+from perfMetrics import registry
 
 # class creation
 class handDetector():
-    def __init__(self, mode=False, maxHands=2, detectionCon=0.5,modelComplexity=1,trackCon=0.5):
+    def __init__(self, mode=False, maxHands=2, detectionCon=0.5,modelComplexity=1,trackCon=0.5,
+                 roiTracking=False, roiPad=0.5, searchScale=0.5, roiRefresh=30,
+                 adaptiveRate=False, maxInferEvery=4, cpuBudget=0.5, motionThreshold=0.03,
+                 metrics=None, backend=None, backendBudget=0.03, calibrationFrames=None):
         self.mode = mode
         self.maxHands = maxHands
         self.detectionCon = detectionCon
         self.modelComplex = modelComplexity
         self.trackCon = trackCon
         self.mpHands = mp.solutions.hands
-        self.hands = self.mpHands.Hands(self.mode, self.maxHands,self.modelComplex,
-                                        self.detectionCon, self.trackCon)
+        # Inference backend (handBackends): None follows modelComplexity, a
+        # name picks one, "auto" times the backends on calibrationFrames and
+        # takes the most accurate one within backendBudget seconds per frame
+        options = {"static": self.mode, "max_hands": self.maxHands,
+                   "detection_con": self.detectionCon, "tracking_con": self.trackCon}
+        if backend is None:
+            backend = "mediapipe-full" if self.modelComplex else "mediapipe-lite"
+        if backend == "auto":
+            self.hands, self.backendCosts = select_backend(backendBudget, calibrationFrames, **options)
+        elif isinstance(backend, str):
+            self.hands, self.backendCosts = create_backend(backend, **options), {}
+        else:
+            self.hands, self.backendCosts = backend, {}
+        self.backend = self.hands.name
+        self.backendSpec = backend if isinstance(backend, str) and backend != "auto" else self.backend
+        self.backendOptions = options
         self.mpDraw = mp.solutions.drawing_utils # it gives small dots onhands total 20 landmark points
+        # Seconds spent in each step of the last findHands call
+        self.stageTimes = {"color": 0.0, "inference": 0.0}
+        # Rolling stage latencies and detection rate (perfMetrics)
+        self.metrics = metrics if metrics is not None else registry
+        self.results = None
+        # Arrays parsed from the current results (see findLandmarks)
+        self._arrays = None
+
+        # ROI tracking: run the model on a padded crop around the previous
+        # frame's hands, or on a downscaled frame while searching for a hand
+        self.roiTracking = roiTracking
+        self.roiPad = roiPad
+        self.searchScale = searchScale
+        self.roiRefresh = roiRefresh  # full search every N frames while hands are missing
+        self.roiBox = None
+        self.roiFrames = 0
+        self.roiMode = "full"
+        # The tracking model carries a landmark-derived ROI from frame to frame,
+        # which only fits frames of one geometry; crops, whose box moves every
+        # frame, go through a separate static model (created on first use)
+        self.cropHands = None
+
+        # Adaptive rate: run the model only every inferEvery frames (or sooner when
+        # the hand moves fast) and predict the landmarks in between
+        self.adaptiveRate = adaptiveRate
+        self.maxInferEvery = maxInferEvery
+        self.cpuBudget = cpuBudget  # share of the frame interval inference may use
+        self.motionThreshold = motionThreshold  # normalized fingertip error that forces a model run
+        self.landmarkFilter = OneEuroFilter()
+        self.inferEvery = 1
+        self.framesSinceInference = 0
+        self.inferLatency = None
+        self.frameInterval = None
+        self.lastFrameTime = None
+        self.predictionError = 0.0
+        self.inferred = True
+
+    def reset(self):
+        # Forget the tracked hands, e.g. before another view reuses the detector
+        self.results = None
+        self._arrays = None
+        self.roiBox = None
+        self.roiFrames = 0
+        self.roiMode = "full"
+        self.landmarkFilter.reset()
+        self.inferEvery = 1
+        self.framesSinceInference = 0
+        self.lastFrameTime = None
+        self.predictionError = 0.0
 
     def findHands(self,img,draw=True):
         # Send rgb image to hands
-        imgRGB = cv2.cvtColor(img,cv2.COLOR_BGR2RGB)
-        self.results = self.hands.process(imgRGB) # process the frame
+        t0 = time.perf_counter()
+        if self.adaptiveRate and self.results is not None and not self._needInference(t0):
+            # Skip the model, move the landmarks along their filtered velocity
+            self._predictLandmarks(t0)
+            self.inferred = False
+            self.stageTimes["color"] = 0.0
+            self.stageTimes["inference"] = 0.0
+            self.metrics.count("predicted_frames")
+        else:
+            if self.roiTracking:
+                self.results, t1 = self._processTracked(img)
+            else:
+                imgRGB = cv2.cvtColor(img,cv2.COLOR_BGR2RGB)
+                t1 = time.perf_counter()
+                self.results = self.hands.process(imgRGB) # process the frame
+            t2 = time.perf_counter()
+            self.inferred = True
+            self.stageTimes["color"] = t1 - t0
+            self.stageTimes["inference"] = t2 - t1
+            self.metrics.observe("color", t1 - t0)
+            self.metrics.observe("inference", t2 - t1)
+            if self.adaptiveRate:
+                self._filterLandmarks(t0, t2 - t1)
+        self.metrics.detection(self.results.multi_hand_landmarks)
     #     print(results.multi_hand_landmarks)
 
-        if self.results.multi_hand_landmarks:
-            for handLms in self.results.multi_hand_landmarks:
+        if draw:
+            self.drawHands(img)
 
-                if draw:
-                    #Draw dots and connect them
-                    self.mpDraw.draw_landmarks(img,handLms,self.mpHands.HAND_CONNECTIONS)
+        return img
 
+    def drawHands(self, img):
+        # Landmarks are normalized, so img may be larger than the frame findHands saw
+        if self.results is not None and self.results.multi_hand_landmarks:
+            for handLms in self.results.multi_hand_landmarks:
+                #Draw dots and connect them
+                self.mpDraw.draw_landmarks(img,handLms,self.mpHands.HAND_CONNECTIONS)
         return img
 
+    def _needInference(self, now):
+        if self.lastFrameTime is not None:
+            interval = now - self.lastFrameTime
+            self.frameInterval = interval if self.frameInterval is None else 0.9 * self.frameInterval + 0.1 * interval
+        self.lastFrameTime = now
+        self.framesSinceInference += 1
+
+        if self.framesSinceInference >= self.inferEvery:
+            return True
+        f = self.landmarkFilter
+        if f.x is not None:
+            # Expected fingertip drift since the last model run
+            drift = np.abs(f.dx[:, 8, :2]).max() * (now - f.t)
+            if drift > self.motionThreshold:
+                return True
+        return False
+
+    def _filterLandmarks(self, now, latency):
+        self.framesSinceInference = 0
+        if self.lastFrameTime is None:
+            self.lastFrameTime = now
+        self.inferLatency = latency if self.inferLatency is None else 0.8 * self.inferLatency + 0.2 * latency
+
+        hands = self.results.multi_hand_landmarks
+        if not hands:
+            self.landmarkFilter.reset()
+            self.inferEvery = self._rateFromLatency()
+            return
+
+        raw = np.array([[(lm.x, lm.y, lm.z) for lm in hand.landmark] for hand in hands], np.float32)
+        f = self.landmarkFilter
+        if f.x is not None and f.x.shape == raw.shape:
+            # How far off the prediction would have been for this frame
+            self.predictionError = float(np.abs(f.predict(now)[:, 8, :2] - raw[:, 8, :2]).max())
+        else:
+            self.predictionError = 0.0
+        self._writeLandmarks(f(raw, now))
+
+        if self.predictionError > self.motionThreshold:
+            self.inferEvery = 1
+        else:
+            self.inferEvery = self._rateFromLatency()
+
+    def _rateFromLatency(self):
+        # Run the model often enough to stay within cpuBudget of the frame time
+        if not self.frameInterval or not self.inferLatency:
+            return 1
+        n = math.ceil(self.inferLatency / (self.cpuBudget * self.frameInterval))
+        return max(1, min(n, self.maxInferEvery))
+
+    def _predictLandmarks(self, now):
+        predicted = self.landmarkFilter.predict(now)
+        if predicted is not None and self.results.multi_hand_landmarks:
+            self._writeLandmarks(np.clip(predicted, -0.5, 1.5))
+
+    def _writeLandmarks(self, arr):
+        # Store filtered/predicted values in the results so every reader sees them
+        for hand, values in zip(self.results.multi_hand_landmarks, arr.tolist()):
+            for lm, (x, y, z) in zip(hand.landmark, values):
+                lm.x, lm.y, lm.z = x, y, z
+        self._arrays = None
+
+    def _processTracked(self, img):
+        """Runs the model on the ROI (or a downscaled frame) and maps the
+        landmarks back so results look exactly like a full-frame run."""
+        h, w = img.shape[:2]
+        box = self.roiBox
+        self.roiFrames += 1
+        found = len(self.results.multi_hand_landmarks or []) if self.results else 0
+        # Periodically look at the whole frame so a second hand can enter
+        if box is not None and found < self.maxHands and self.roiFrames % self.roiRefresh == 0:
+            box = None
+
+        if box is not None:
+            x0, y0, x1, y1 = box
+            imgRGB = cv2.cvtColor(img[y0:y1, x0:x1], cv2.COLOR_BGR2RGB)
+            if self.cropHands is None:
+                self.cropHands = create_backend(self.backendSpec, **dict(self.backendOptions, static=True))
+            t1 = time.perf_counter()
+            results = self.cropHands.process(imgRGB)
+            if results.multi_hand_landmarks:
+                self.roiMode = "crop"
+                self._mapFromCrop(results, box, w, h)
+            else:
+                # Tracking lost, fall back to a full-frame search right away
+                box = None
+        if box is None:
+            if self.searchScale < 1.0:
+                self.roiMode = "search"
+                small = cv2.resize(img, None, fx=self.searchScale, fy=self.searchScale,
+                                   interpolation=cv2.INTER_AREA)
+            else:
+                self.roiMode = "full"
+                small = img
+            imgRGB = cv2.cvtColor(small, cv2.COLOR_BGR2RGB)
+            t1 = time.perf_counter()
+            # Normalized landmarks are the same for a uniformly scaled frame, so
+            # the search and full frames share the tracking model
+            results = self.hands.process(imgRGB)
+
+        self.roiBox = self._handBox(results, w, h)
+        return results, t1
+
+    def _mapFromCrop(self, results, box, w, h):
+        x0, y0, x1, y1 = box
+        sx, sy = (x1 - x0) / w, (y1 - y0) / h
+        ox, oy = x0 / w, y0 / h
+        for hand in results.multi_hand_landmarks:
+            for lm in hand.landmark:
+                lm.x = ox + lm.x * sx
+                lm.y = oy + lm.y * sy
+                lm.z = lm.z * sx  # z is relative to the image width
+
+    def _handBox(self, results, w, h):
+        """Padded pixel box around all detected hands, or None."""
+        if not results.multi_hand_landmarks:
+            return None
+        pts = np.array([(lm.x, lm.y) for hand in results.multi_hand_landmarks
+                        for lm in hand.landmark], np.float32) * (w, h)
+        (x0, y0), (x1, y1) = pts.min(axis=0), pts.max(axis=0)
+        # Pad around the hand so it is still inside the crop next frame
+        size = max(x1 - x0, y1 - y0, 32) * (1 + 2 * self.roiPad)
+        cx, cy = (x0 + x1) / 2, (y0 + y1) / 2
+        x0, x1 = int(max(cx - size / 2, 0)), int(min(cx + size / 2, w))
+        y0, y1 = int(max(cy - size / 2, 0)), int(min(cy + size / 2, h))
+        if x1 - x0 < 16 or y1 - y0 < 16:
+            return None
+        return x0, y0, x1, y1
+
     def findPosition(self,img, handNo=0, draw=True):
         """Lists the position/type of landmarks
         we give in the list and in the list ww have stored
@@ -41,40 +267,77 @@ class handDetector():
         # check wether any landmark was detected
         if self.results.multi_hand_landmarks:
             #Which hand are we talking about
-            myHand = self.results.multi_hand_landmarks[handNo]
-            # Get id number and landmark information
-            for id, lm in enumerate(myHand.landmark):
-                # id will give id of landmark in exact index number
-                # height width and channel
-                h,w,c = img.shape
-                #find the position
-                cx,cy = int(lm.x*w), int(lm.y*h) #center
-                # print(id,cx,cy)
-                lmlist.append([id,cx,cy])
-
-                # Draw circle for 0th landmark
-                if draw:
+            landmarks, _, _ = self.findLandmarks(img, pixel=False)
+            h, w = img.shape[:2]
+            # Scale all 21 points at once; astype truncates like the old int() calls
+            points = (landmarks[handNo, :, :2].astype(np.float64) * (w, h)).astype(np.int32)
+            lmlist = [[id, cx, cy] for id, (cx, cy) in enumerate(points.tolist())]
+
+            # Draw circle for 0th landmark
+            if draw:
+                for _, cx, cy in lmlist:
                     cv2.circle(img,(cx,cy), 15 , (255,0,255), cv2.FILLED)
 
         return lmlist
 
+    def findLandmarks(self, img, pixel=True):
+        """All detected hands at once as arrays.
+
+        Returns (landmarks, handedness, scores):
+        landmarks  float32 array of shape (n_hands, 21, 3). With pixel=True x and y
+                   are pixel coordinates and z is scaled by the image width (the
+                   same scale MediaPipe uses for z); otherwise values are normalized.
+        handedness list of "Left"/"Right" labels, one per hand
+        scores     float32 array of handedness confidence, one per hand (NaN for
+                   a hand MediaPipe gave no handedness for)
+        """
+        hands = self.results.multi_hand_landmarks
+        if not hands:
+            return np.empty((0, 21, 3), np.float32), [], np.empty(0, np.float32)
+
+        # Parse the protobuf results once per findHands call
+        if self._arrays is None or self._arrays[0] is not self.results:
+            raw = np.array([[(lm.x, lm.y, lm.z) for lm in hand.landmark] for hand in hands],
+                           np.float32)
+            handedness = []
+            scores = np.full(len(hands), np.nan, np.float32)
+            for i, hand in enumerate((self.results.multi_handedness or [])[:len(hands)]):
+                handedness.append(hand.classification[0].label)
+                scores[i] = hand.classification[0].score
+            self._arrays = (self.results, raw, handedness, scores)
+        _, raw, handedness, scores = self._arrays
+
+        if not pixel:
+            return raw.copy(), list(handedness), scores.copy()
+        h, w = img.shape[:2]
+        # One vectorized scale instead of a multiply per landmark
+        return raw * np.array((w, h, w), np.float32), list(handedness), scores.copy()
+
+    def findLandmark(self, img, id=8, handNo=0):
+        """Pixel (x, y) of a single landmark, e.g. the index fingertip, or None."""
+        hands = self.results.multi_hand_landmarks
+        if not hands or handNo >= len(hands):
+            return None
+        lm = hands[handNo].landmark[id]
+        h, w = img.shape[:2]
+        return int(lm.x * w), int(lm.y * h)
+
 def main():
-    #Frame rates
-    pTime = 0
-    cTime = 0
     cap = cv2.VideoCapture(0)
     detector = handDetector()
 
     while True:
         success,img = cap.read()
+        if not success:
+            break
         img = detector.findHands(img)
         lmList = detector.findPosition(img)
         if len(lmList) != 0:
             print(lmList[4])
 
-        cTime = time.time()
-        fps = 1/(cTime-pTime)
-        pTime = cTime
+        #Frame rates over the last frames, no division by zero on the first one
+        registry.frame()
+        fps = registry.fps()
 
         cv2.putText(img,str(int(fps)),(10,70), cv2.FONT_HERSHEY_PLAIN,3,(255,0,255),3)
 
@@ -0,0 +1,58 @@
+import math
+
+import numpy as np
+
+
+def _alpha(dt, cutoff):
+    # Smoothing factor of a first order low-pass filter
+    tau = 1.0 / (2 * math.pi * cutoff)
+    return 1.0 / (1.0 + tau / dt)
+
+
+class OneEuroFilter:
+    """One-Euro filter (Casiez et al.) over arrays of any shape.
+
+    Smooths heavily while the input is slow and follows quickly when it moves
+    fast. The defaults are tuned for normalized (0..1) image coordinates; for
+    pixel coordinates divide beta by the image width.
+    The filter also keeps the smoothed velocity, so it can extrapolate the
+    position to a later time with predict().
+    """
+
+    def __init__(self, minCutoff=1.0, beta=5.0, dCutoff=1.0):
+        self.minCutoff = minCutoff
+        self.beta = beta
+        self.dCutoff = dCutoff
+        self.reset()
+
+    def reset(self):
+        self.x = None
+        self.dx = None
+        self.t = None
+
+    def __call__(self, x, t):
+        x = np.asarray(x, np.float32)
+        if self.x is None or self.x.shape != x.shape:
+            self.x = x.copy()
+            self.dx = np.zeros_like(x)
+            self.t = t
+            return self.x.copy()
+
+        dt = t - self.t
+        if dt <= 0:
+            return self.x.copy()
+        a_d = _alpha(dt, self.dCutoff)
+        self.dx = a_d * (x - self.x) / dt + (1 - a_d) * self.dx
+
+        cutoff = self.minCutoff + self.beta * np.abs(self.dx)
+        tau = 1.0 / (2 * np.pi * cutoff)
+        a = 1.0 / (1.0 + tau / dt)
+        self.x = a * x + (1 - a) * self.x
+        self.t = t
+        return self.x.copy()
+
+    def predict(self, t):
+        """Constant-velocity extrapolation of the filtered value to time t."""
+        if self.x is None:
+            return None
+        return self.x + self.dx * (t - self.t)
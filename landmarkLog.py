@@ -0,0 +1,187 @@
+"""Compact landmark recordings for deterministic replay.
+
+A log is a small JSON header followed by one fixed-size binary record per
+tracked frame (RECORD, 519 bytes with two hands):
+
+    t           float64  seconds since the recording started
+    seq         uint32   frame number of the tracker
+    count       uint8    hands in this frame
+    handedness  int8[max_hands]             0 Left, 1 Right, -1 no hand
+    landmarks   float32[max_hands, 21, 3]   pixel x, y and z, as findLandmarks
+
+Records are appended as frames come in, so a crash loses at most the
+unflushed tail. LandmarkLog maps the records straight from disk with
+np.memmap; nothing is parsed per frame.
+
+    recorder = LandmarkRecorder("session.hlog", 640, 480)
+    recorder.write(landmarks, handedness, t, seq)
+    recorder.close()
+
+    log = LandmarkLog("session.hlog")
+    for t, landmarks, handedness in log:
+        board.stroke_hands(landmarks, handedness, t=t)
+
+Replay a log through the painting code, without the model:
+    python landmarkLog.py session.hlog --mode cam --repeat 10
+"""
+import argparse
+import hashlib
+import json
+import os
+import struct
+import time
+
+import numpy as np
+
+MAGIC = b"HLMK"
+VERSION = 1
+HANDEDNESS = ("Left", "Right")
+
+
+def record_dtype(max_hands=2):
+    return np.dtype([("t", "<f8"), ("seq", "<u4"), ("count", "u1"),
+                     ("handedness", "i1", (max_hands,)), ("landmarks", "<f4", (max_hands, 21, 3))])
+
+
+RECORD = record_dtype()
+
+
+class LandmarkRecorder:
+    def __init__(self, path, width, height, max_hands=2, flush_every=30):
+        self.path = path
+        self.max_hands = max_hands
+        self.dtype = record_dtype(max_hands)
+        self.flush_every = flush_every
+        self.record = np.zeros(1, self.dtype)
+        self.count = 0
+        self.start = None
+        header = json.dumps({"version": VERSION, "width": width, "height": height,
+                             "max_hands": max_hands, "created": time.time()}).encode()
+        # Records start on a 64-byte boundary
+        size = -(-(len(MAGIC) + 4 + len(header)) // 64) * 64
+        self.file = open(path, "wb")
+        self.file.write(MAGIC + struct.pack("<I", size) + header.ljust(size - len(MAGIC) - 4))
+
+    def write(self, landmarks, handedness, t, seq=0):
+        """Append one frame: (n, 21, 3) landmarks, ["Left"/"Right"] labels, time in seconds."""
+        if self.start is None:
+            self.start = t
+        rec = self.record[0]
+        n = min(len(landmarks), self.max_hands)
+        rec["t"] = t - self.start
+        rec["seq"] = seq
+        rec["count"] = n
+        rec["handedness"] = -1
+        rec["landmarks"] = 0
+        for i in range(n):
+            rec["handedness"][i] = HANDEDNESS.index(handedness[i]) if i < len(handedness) else -1
+            rec["landmarks"][i] = landmarks[i]
+        self.file.write(self.record.tobytes())
+        self.count += 1
+        if self.count % self.flush_every == 0:
+            self.file.flush()
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+
+
+class LandmarkLog:
+    """Read-only, memory-mapped view of a recording."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            head = f.read(8)
+            if head[:4] != MAGIC:
+                raise ValueError("%s is not a landmark log" % path)
+            size = struct.unpack("<I", head[4:])[0]
+            self.meta = json.loads(f.read(size - 8).decode())
+        if self.meta.get("version") != VERSION:
+            raise ValueError("unsupported landmark log version %s" % self.meta.get("version"))
+        self.width = self.meta["width"]
+        self.height = self.meta["height"]
+        self.dtype = record_dtype(self.meta["max_hands"])
+        # A torn last record (crash while writing) is left out
+        count = (os.path.getsize(path) - size) // self.dtype.itemsize
+        if count > 0:
+            self.records = np.memmap(path, self.dtype, "r", offset=size, shape=(count,))
+        else:
+            self.records = np.zeros(0, self.dtype)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, i):
+        """(t, landmarks (n, 21, 3), handedness labels) of frame i."""
+        rec = self.records[i]
+        n = int(rec["count"])
+        return (float(rec["t"]), np.array(rec["landmarks"][:n]),
+                [HANDEDNESS[h] for h in rec["handedness"][:n]])
+
+    def __iter__(self):
+        for i in range(len(self.records)):
+            yield self[i]
+
+    def duration(self):
+        return float(self.records["t"][-1]) if len(self.records) else 0.0
+
+
+def replay(log, board, mode="board", multi_hand=False, frame=None, every=1):
+    """Drives a PaintingBoard from a log like the virtual painter does, using
+    the recorded times, so the result is the same on every run.
+
+    every > 1 skips frames, to see strokes as a slower detector delivers them.
+    """
+    if frame is None:
+        frame = np.zeros((log.height, log.width, 3), np.uint8)
+    for i in range(0, len(log), every):
+        t, landmarks, handedness = log[i]
+        img = frame.copy() if mode == "cam" else None
+        if multi_hand:
+            board.stroke_hands(landmarks, handedness, img, t=t)
+        else:
+            board.stroke(landmarks[0, 8] if len(landmarks) else None, img, t=t)
+        if mode == "cam":
+            board.compose_cam(img)
+        else:
+            board.compose_board()
+    # The end of the log lifts the pens
+    board.finish_splines()
+    return board
+
+
+def main():
+    from paintingBoard import PaintingBoard
+
+    parser = argparse.ArgumentParser(description="Replay a landmark log through the painting code")
+    parser.add_argument("log")
+    parser.add_argument("--mode", choices=["cam", "board"], default="board",
+                        help="cam = composite over a blank frame each time, board = strokes on white")
+    parser.add_argument("--multi-hand", action="store_true", help="every hand paints with its own pen")
+    parser.add_argument("--brush", action="store_true", help="anti-aliased brush, width from the fingertip depth")
+    parser.add_argument("--spline", action="store_true", help="curve strokes through the fingertip samples")
+    parser.add_argument("--every", type=int, default=1,
+                        help="replay every n-th frame only, as if detection ran at 1/n the rate")
+    parser.add_argument("--repeat", type=int, default=1, help="replay the log this many times")
+    parser.add_argument("--snapshot", help="write the final board to this image")
+    args = parser.parse_args()
+
+    log = LandmarkLog(args.log)
+    print("%s: %d frames, %.1f s, %dx%d" % (args.log, len(log), log.duration(), log.width, log.height))
+    started = time.perf_counter()
+    for _ in range(args.repeat):
+        board = PaintingBoard(log.width, log.height, brush=args.brush, spline=args.spline)
+        board = replay(log, board, args.mode, args.multi_hand, every=args.every)
+    elapsed = time.perf_counter() - started
+    frames = len(range(0, len(log), args.every)) * args.repeat
+    print("%.0f frames/s (%.1fx real time)" % (frames / elapsed, log.duration() * args.repeat / elapsed
+                                                if elapsed > 0 else 0.0))
+    # Same log, same code: same digest
+    print("canvas sha1", hashlib.sha1(board.canvas.tobytes()).hexdigest())
+    if args.snapshot:
+        import cv2
+        cv2.imwrite(args.snapshot, board.compose_board())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,40 +1,237 @@
-from tkinter import *
-from PIL import Image, ImageTk
-import cv2
-import numpy as np
-# from handTrackingModule import handDetector
-import mediapipe as mp
 import time
+STARTED = time.perf_counter()  # startup timings are measured from here
+from tkinter import *
+import os
+import argparse
+from framePipeline import FramePipeline
+from paintingBoard import PaintingBoard
+from whiteboardLayer import WhiteboardLayer
+from penTracker import Pen, PenTracker
+from perfMetrics import registry
+from canvasStore import CanvasStore
+from tiledCanvas import InfiniteBoard, InfiniteWhiteboard
+from handService import HandService, ReplayService, report
+from captureSource import parse_size
+from tkDisplay import TkDisplay
+from streamServer import StreamServer
+from qosGovernor import QosGovernor, frame_delay
+from gestureEngine import GestureEngine, DRAW, HOVER, PINCH, FIST, PALM
+from strokeSpline import pairs
+
+# Run capture, inference and compositing on worker threads (--pipeline)
+PIPELINE_MODE = False
+# Print the pipeline's per-stage rates every 5 s (--pipeline-report)
+PIPELINE_REPORT = False
+# Draw whiteboard strokes as Tk line items instead of a raster layer (--tk-lines)
+TK_LINES_MODE = False
+# Extra handDetector options, e.g. roiTracking (--roi-tracking)
+DETECTOR_OPTIONS = {}
+# Give every detected hand its own pen (--multi-hand)
+MULTI_HAND_MODE = False
+# Draw live fps and stage latencies over the video (--overlay)
+OVERLAY_MODE = False
+# Drawings are autosaved here and restored on the next start; None disables (--autosave, --session-dir)
+SESSION_DIR = None
+DEFAULT_SESSION_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sessions")
+# Paint on a large sparse board with pan and zoom instead of one screen (--infinite)
+INFINITE_MODE = False
+# Camera index, video file or synthetic[:WxH[@FPS]] (--camera) and what to ask the camera for
+CAMERA = 0
+CAPTURE_OPTIONS = {}
+# Log the tracked landmarks to this file (--record), or play a log instead of the camera (--replay)
+RECORD_PATH = None
+REPLAY_PATH = None
+# Publishes the virtual painter to remote viewers (--stream PORT)
+STREAM = None
+# Anti-aliased brush whose width follows the fingertip depth (--brush)
+BRUSH_MODE = False
+# Degrades drawing, inference and display when frames take longer than the budget (--qos, --frame-budget)
+QOS = None
+# Hand poses pick the tools: pinch = next color, fist = eraser, open palm = clear (--gestures)
+GESTURE_MODE = False
+# Strokes follow a spline through the fingertip samples instead of straight lines (--spline)
+SPLINE_MODE = False
+# The one Tk window; views are swapped inside it
+root = None
+# Camera and hand tracking shared by all views, loaded while the menu is up
+SERVICE = None
+
+def clear_view():
+    # Views are built straight into root; a switch only swaps the widgets
+    for child in root.winfo_children():
+        child.destroy()
+    for key in ("<Left>", "<Right>", "<Up>", "<Down>"):
+        root.unbind(key)
 
 def open_canvas():
-    root.destroy()  # Destroy the main menu root
-    canvas_root = Tk()
-    canvas_root.attributes('-fullscreen', True)
-    app = CanvasApp(canvas_root)
-    canvas_root.mainloop()
+    clear_view()
+    app = CanvasApp(root, pipelined=PIPELINE_MODE, raster=not TK_LINES_MODE, multi_hand=MULTI_HAND_MODE)
 
 def open_camera():
-    root.destroy()  # Destroy the main menu root
-    camera_root = Tk()
-    camera_root.attributes('-fullscreen', True)
-    app = FullScreenCameraApp(camera_root, "GUI\\header_def.jpg")
-
-    def back_to_main():
-        camera_root.destroy()
-        open_main_menu()  # Call function to create new main menu
-
-    app.exit_button.config(command=back_to_main)
-    camera_root.mainloop()
+    clear_view()
+    app = FullScreenCameraApp(root, "GUI\\header_def.jpg", pipelined=PIPELINE_MODE, multi_hand=MULTI_HAND_MODE)
 
 def open_main_menu():  # Added this function
-    global root  # Make root global so main function can access it
+    clear_view()
+    app = MainMenu(root)
+
+def run_app():
+    global root, SERVICE
     root = Tk()
     root.attributes('-fullscreen', True)
     app = MainMenu(root)
+    # First menu: measure it, then load the heavy parts behind it
+    root.update_idletasks()
+    report("first_menu", STARTED)
+    if REPLAY_PATH:
+        SERVICE = ReplayService(REPLAY_PATH, started=STARTED).start()
+    else:
+        SERVICE = HandService(CAMERA, DETECTOR_OPTIONS, STARTED, CAPTURE_OPTIONS, RECORD_PATH, QOS).start()
     root.mainloop()
+    SERVICE.stop()
+    if STREAM is not None:
+        STREAM.stop()
+
+def first_frame_shown(opened):
+    # Time from picking a view to its first tracked frame on screen
+    report("first_tracked_frame", opened)
+    if "first_tracked_frame_since_start" not in registry.milestones:
+        report("first_tracked_frame_since_start", STARTED)
+
+def frame_shown(display, cost):
+    # Feed the governor the frame's processing time and apply its display resolution to the view
+    if QOS is not None:
+        QOS.record(cost)
+        display.shrink = QOS.display_shrink
+
+def fingers_up(hand, tips):
+    """True if every fingertip in tips is above its middle (PIP) joint."""
+    return all(hand[tip, 1] < hand[tip - 2, 1] for tip in tips)
+
+def bind_pan_keys(root, pan, step=60):
+    # Arrow keys move the board content
+    root.bind("<Left>", lambda e: pan(step, 0))
+    root.bind("<Right>", lambda e: pan(-step, 0))
+    root.bind("<Up>", lambda e: pan(0, step))
+    root.bind("<Down>", lambda e: pan(0, -step))
+
+class TrackedView:
+    """Frame loop shared by the painting views.
+
+    Frames come from the hand service, are composed by the view and shown
+    through its TkDisplay, either on the Tk thread or through a
+    FramePipeline (pipelined). A view sets frames, display, opened,
+    pipelined, multi_hand and gestures, and composes frames into
+    (display buffer, ..., capture time, cost).
+    """
+
+    # Wait between frame updates on the Tk thread
+    delay = 0.010
+
+    def run_frames(self, compose):
+        self.running = True
+        if self.pipelined:
+            # Capture, inference and compositing run on worker threads;
+            # the Tk thread only shows the newest finished frame
+            self.pipeline = FramePipeline(self.read_frame, self.detect, compose, metrics=registry,
+                                          infer_time=lambda frame: frame.tracking)
+            self.pipeline.start()
+            self.last_report = time.time()
+            self.poll_pipeline()
+        else:
+            self.update_frame(compose)
+
+    def read_frame(self, wait=True):
+        # Newest tracked frame; None once the view or the camera stopped,
+        # or with wait=False when no new frame is ready yet
+        while True:
+            frame = self.frames.get(timeout=0.5 if wait else 0)
+            if frame is not None or self.frames.closed or not wait:
+                return frame
+
+    def detect(self, frame):
+        # Hands were already tracked by the service; the capture time goes
+        # along to measure capture-to-display latency, the tracking time to
+        # add up what the frame cost to process
+        return frame.image, self.pick_hands(frame), frame.captured, frame.tracking
+
+    def pick_hands(self, frame):
+        # What this view needs of the tracked hands
+        if self.multi_hand:
+            return frame.landmarks, frame.handedness
+        if self.gestures is not None:
+            return self.pick_gesture(self.gestures, frame)
+        return self.pick_tip(frame)
+
+    def pick_tip(self, frame):
+        # Only the index fingertip is needed
+        return frame.tip(8)
+
+    @staticmethod
+    def pick_gesture(gestures, frame):
+        # Stable pose of the first hand: (pose, entered this frame, landmarks)
+        if not len(frame.landmarks):
+            gestures.reset()
+            return None
+        pose, entered = gestures.update(frame.landmarks[:1], frame.handedness[:1])[0]
+        return pose, entered, frame.landmarks[0]
+
+    def draw(self, frame):
+        # Tk-thread work of a composed frame besides the display buffer
+        pass
+
+    def show(self, frame):
+        img, captured, cost = frame[0], frame[-2], frame[-1]
+        started = time.perf_counter()
+        with registry.timer("display"):
+            self.draw(frame)
+            self.display.show(img)
+        finished = time.perf_counter()
+        registry.observe("capture_to_display", finished - captured)
+        registry.frame()
+        frame_shown(self.display, cost + finished - started)
+        if self.opened is not None:
+            first_frame_shown(self.opened)
+            self.opened = None
+
+    def update_frame(self, compose):
+        if self.running:
+            started = time.perf_counter()
+            if self.frames.closed:
+                self.stop_painting()
+                return
 
-class CanvasApp:
-    def __init__(self, root):
+            # The Tk thread never blocks on the camera
+            frame = self.read_frame(wait=False)
+            if frame is not None:
+                self.show(compose(self.detect(frame)))
+
+            # Continue updating the frame; a slow frame already used up the wait
+            self.root.after(frame_delay(started, self.delay), self.update_frame, compose)
+
+    def poll_pipeline(self):
+        if self.running:
+            if self.pipeline.finished:
+                self.stop_painting()
+                return
+            frame = self.pipeline.latest()
+            if frame is not None:
+                self.show(frame)
+            if PIPELINE_REPORT and time.time() - self.last_report > 5:
+                print(self.pipeline.format_report())
+                self.last_report = time.time()
+            self.root.after(5, self.poll_pipeline)
+
+    def stop_frames(self):
+        self.running = False
+        # Closing the subscription also wakes a pipeline waiting for a frame
+        SERVICE.unsubscribe(self.frames)
+        if self.pipeline:
+            self.pipeline.stop()
+            self.pipeline = None
+
+class CanvasApp(TrackedView):
+    def __init__(self, root, pipelined=False, raster=True, multi_hand=False):
         self.root = root
         self.root.title("Canvas")
         Label(root, text="Canvas Area", font=("Arial", 36)).pack(pady=20)
@@ -42,19 +239,45 @@ class CanvasApp:
         self.canvas_height = root.winfo_screenheight() - 180
         self.canvas = Canvas(root, bg="white", width=self.canvas_width, height=self.canvas_height)
         self.canvas.pack(pady=10)
+        # One PhotoImage for the whole session, at the canvas size
+        self.display = TkDisplay(self.canvas, (self.canvas_width, self.canvas_height))
 
         self.setup_buttons()
 
-        # Initialize camera for hand detection
-        self.cap = cv2.VideoCapture(0)
-        self.detector = handDetector()
-
-        # Previous point coordinates
-        self.px, self.py = 0, 0
-
-        # Current brush settings
+        # Tracked frames come from the shared hand service
+        self.opened = time.perf_counter()
+        self.frames = SERVICE.subscribe()
+        self.pipelined = pipelined
+        self.pipeline = None
+
+        # Strokes are rasterized into one layer shown through a single image item,
+        # so the canvas display list does not grow with the session
+        if raster and INFINITE_MODE:
+            self.board_layer = InfiniteWhiteboard(self.canvas_width, self.canvas_height)
+        else:
+            self.board_layer = WhiteboardLayer(self.canvas_width, self.canvas_height) if raster else None
+        if self.board_layer is not None and SESSION_DIR and not INFINITE_MODE:
+            # Bring back the last whiteboard session and keep saving it
+            self.board_layer.restore(CanvasStore(os.path.join(SESSION_DIR, "whiteboard"),
+                                                 self.canvas_width, self.canvas_height))
+
+        # Current brush settings; the pen also holds the previous point
         self.line_width = 15
         self.color = "black"
+        self.pen = Pen(0, color=self.color, spline=SPLINE_MODE)
+
+        # With multi_hand every detected hand draws with its own pen
+        self.multi_hand = multi_hand
+        self.tracker = PenTracker({"Right": "black", "Left": "blue"}, "black",
+                                  max_jump=0.25 * self.canvas_width, spline=SPLINE_MODE)
+
+        # Tools by hand pose (single pen only); the pinch cycles the colors
+        self.gestures = GestureEngine() if GESTURE_MODE and not multi_hand else None
+        self.palette = ["black", "red", "green", "blue"]
+        self.pose = None
+        self.fist_eraser = False
+        self.clear_lines = False
+        self.lifted = []  # end of the stroke a pose change lifted, still to draw
 
         # Start painting
         self.start_painting()
@@ -78,80 +301,183 @@ class CanvasApp:
         self.blue_button = Button(self.button_frame, text="Blue", command=lambda: self.set_brush_color("blue"), bg="blue", fg="white", font=('Arial', 14), padx=20)
         self.blue_button.pack(side=LEFT, padx=5)
 
+        # Undo / redo buttons
+        self.undo_button = Button(self.button_frame, text="Undo", command=self.undo, bg="gray25", fg="white", font=('Arial', 14), padx=20)
+        self.undo_button.pack(side=LEFT, padx=5)
+
+        self.redo_button = Button(self.button_frame, text="Redo", command=self.redo, bg="gray25", fg="white", font=('Arial', 14), padx=20)
+        self.redo_button.pack(side=LEFT, padx=5)
+
+        if INFINITE_MODE:
+            # Zoom buttons; the arrow keys pan the board
+            self.zoom_in_button = Button(self.button_frame, text="Zoom +", command=lambda: self.zoom(1.25), bg="gray25", fg="white", font=('Arial', 14), padx=20)
+            self.zoom_in_button.pack(side=LEFT, padx=5)
+
+            self.zoom_out_button = Button(self.button_frame, text="Zoom -", command=lambda: self.zoom(0.8), bg="gray25", fg="white", font=('Arial', 14), padx=20)
+            self.zoom_out_button.pack(side=LEFT, padx=5)
+            bind_pan_keys(self.root, self.pan)
+
         # Exit button
         self.exit_button = Button(self.button_frame, text="Exit", command=self.back_to_main, bg="red", fg="white", font=('Arial', 14), padx=20)
         self.exit_button.pack(side=RIGHT, padx=10)
 
+    def pens(self):
+        return [self.pen] + list(self.tracker.pens.values())
+
     def set_brush_color(self, color):
         self.color = color
+        for pen in self.pens():
+            pen.color = color
 
     def toggle_eraser(self):
         self.color = "white" if self.color != "white" else "black"
+        for pen in self.pens():
+            pen.color = "white" if pen.color != "white" else "black"
 
-    def start_painting(self):
-        self.running = True
-        self.update_frame()
-
-    def update_frame(self):
-        if self.running:
-            success, img = self.cap.read()
-            if not success:
-                self.stop_painting()
-                return
-
-            img = cv2.flip(img, 1)  # Mirror image
-
-            # Find hand landmarks
-            img = self.detector.findHands(img)
-            lm_list = self.detector.findPosition(img, draw=False)
+    def undo(self):
+        # Only the raster renderer keeps a stroke history
+        if self.board_layer is not None:
+            self.board_layer.undo()
 
-            if len(lm_list) > 0:  # If hand detected
-                # Get index finger tip coordinates
-                x, y = lm_list[8][1], lm_list[8][2]
+    def redo(self):
+        if self.board_layer is not None:
+            self.board_layer.redo()
 
-                # Map coordinates to canvas dimensions
-                frame_height, frame_width, _ = img.shape
-                mapped_x = int(x / frame_width * self.canvas_width)
-                mapped_y = int(y / frame_height * self.canvas_height)
+    def pan(self, dx, dy):
+        if isinstance(self.board_layer, InfiniteWhiteboard):
+            self.board_layer.pan(dx, dy)
 
-                # Set thickness
-                thickness = 50 if self.color == "white" else 5
-                paint_color = "white" if self.color == "white" else self.color
+    def zoom(self, factor):
+        if isinstance(self.board_layer, InfiniteWhiteboard):
+            self.board_layer.zoom(factor)
 
-                # Draw line on the canvas with detected hand position
-                if self.px == 0 and self.py == 0:
-                    self.px, self.py = mapped_x, mapped_y
-                else:
-                    self.canvas.create_line(self.px, self.py, mapped_x, mapped_y,
-                                            width=thickness, fill=paint_color,
-                                            capstyle=ROUND, smooth=TRUE, splinesteps=36)
-
-                # Update previous point
-                self.px, self.py = mapped_x, mapped_y
-            else:
-                # Reset previous point when hand not detected
-                self.px, self.py = 0, 0
-
-            # Resize frame to fit GUI window
-            img = cv2.resize(img, (self.canvas.winfo_width(), self.canvas.winfo_height()))
-            img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-            imgtk = ImageTk.PhotoImage(image=Image.fromarray(img))
-            self.canvas.create_image(0, 0, image=imgtk, anchor=NW)
-
-            # Continue updating the frame
-            self.root.after(10, self.update_frame)
+    def start_painting(self):
+        self.run_frames(self.compose)
+
+    def apply_gesture(self, gesture):
+        """Tool actions of the pose; returns the fingertip the pen follows, or None."""
+        pose, entered, hand = gesture if gesture is not None else (None, False, None)
+        if pose != self.pose:
+            # Every pose starts a new stroke
+            self.lifted = self.move_pen(self.pen, None)
+            self.pose = pose
+        if self.fist_eraser != (pose == FIST):
+            # The fist erases while it is held
+            self.fist_eraser = pose == FIST
+            self.pen.color = "white" if self.fist_eraser else self.color
+        if entered and pose == PINCH:
+            self.set_brush_color(self.palette[(self.palette.index(self.color) + 1) % len(self.palette)]
+                                 if self.color in self.palette else self.palette[0])
+        elif entered and pose == PALM:
+            self.clear_board()
+        if pose == DRAW:
+            return hand[8, :2]
+        if pose == FIST:
+            return hand[9, :2]  # Middle of the hand
+        return None
+
+    def clear_board(self):
+        if self.board_layer is not None:
+            self.board_layer.clear()
+        else:
+            # Tk lines go on the Tk thread, in show()
+            self.clear_lines = True
+
+    def map_point(self, img, tip):
+        # Map coordinates to canvas dimensions
+        frame_height, frame_width, _ = img.shape
+        return int(tip[0] / frame_width * self.canvas_width), int(tip[1] / frame_height * self.canvas_height)
+
+    def move_pen(self, pen, point, t=None):
+        """Moves a pen to a canvas point; returns the new line segments to draw"""
+        # Set thickness
+        thickness = 50 if pen.color == "white" else 5
+        pieces = []
+        if point is not None:  # If hand detected
+            mapped_x, mapped_y = point
+
+            # Draw line on the canvas with detected hand position
+            if pen.spline is not None:
+                if pen.px == 0 and pen.py == 0:
+                    pen.spline.reset()
+                pieces = pairs(pen.spline.add(mapped_x, mapped_y, t))
+            elif pen.px != 0 or pen.py != 0:
+                pieces = [(pen.px, pen.py, mapped_x, mapped_y)]
+
+            # Update previous point
+            pen.px, pen.py = mapped_x, mapped_y
+            return [piece + (thickness, pen.color, pen.key) for piece in pieces]
+
+        # Reset previous point when hand not detected; the spline still holds the end of the stroke
+        if pen.spline is not None:
+            pieces = pairs(pen.spline.finish())
+        segments = [piece + (thickness, pen.color, pen.key) for piece in pieces]
+        pen.lift()
+        if self.board_layer is not None:
+            # The end belongs to the stroke that is ending
+            for segment in segments:
+                self.board_layer.draw_segment(*segment)
+            segments = []
+            self.board_layer.end_stroke(pen.key)
+        return segments
+
+    def map_strokes(self, img, hands, t=None):
+        """Returns the line segments to draw this frame"""
+        if not self.multi_hand:
+            tip = self.apply_gesture(hands) if self.gestures is not None else hands
+            segments = self.lifted + self.move_pen(self.pen, None if tip is None else self.map_point(img, tip), t)
+            self.lifted = []
+            return segments
+
+        landmarks, handedness = hands
+        points = [self.map_point(img, tip) for tip in landmarks[:, 8, :2]]
+        pens, lost = self.tracker.match(points, handedness)
+        segments = []
+        for pen in lost:
+            segments.extend(self.move_pen(pen, None))
+        for pen, point in zip(pens, points):
+            segments.extend(self.move_pen(pen, point, t))
+        return segments
+
+    def compose(self, detected):
+        # Runs on the compose worker in pipeline mode; Tk calls stay on the main thread
+        started = time.perf_counter()
+        with registry.timer("compose"):
+            img, hands, captured, cost = detected
+            segments = self.map_strokes(img, hands, captured)
+            if self.board_layer is not None:
+                for segment in segments:
+                    self.board_layer.draw_segment(*segment)
+                img = self.board_layer.compose(img)
+                segments = []
+            # Resize and convert into a display buffer off the Tk thread
+            img = self.display.convert(img)
+            if OVERLAY_MODE:
+                registry.overlay(img, color=(255, 0, 255, 255))
+            return img, segments, captured, cost + time.perf_counter() - started
+
+    def draw(self, frame):
+        # Tk line items are drawn here, on the Tk thread
+        _, segments, _, _ = frame
+        if self.clear_lines:
+            self.canvas.delete("stroke")
+            self.clear_lines = False
+        for x0, y0, x1, y1, thickness, paint_color, _ in segments:
+            self.canvas.create_line(x0, y0, x1, y1,
+                                    width=thickness, fill=paint_color,
+                                    capstyle=ROUND, smooth=TRUE, splinesteps=36, tags="stroke")
 
     def stop_painting(self):
-        self.running = False
-        if self.cap:
-            self.cap.release()
+        self.stop_frames()
+        if self.board_layer is not None:
+            self.board_layer.close()
 
     def back_to_main(self):
-        self.root.destroy()
+        self.stop_painting()
         open_main_menu()
 
 class FullScreenCameraApp:
-    def __init__(self, root, header_path):
+    def __init__(self, root, header_path, pipelined=False, multi_hand=False):
         self.root = root
         self.root.title("Camera Viewer")
 
@@ -180,12 +506,28 @@ class FullScreenCameraApp:
         self.blue_button = Button(self.button_frame, text="Blue", command=lambda: self.change_color((255, 0, 0)), bg="blue", fg="white", font=('Arial', 14), padx=20)
         self.blue_button.pack(side=LEFT, padx=5)
 
+        # Undo / redo buttons
+        self.undo_button = Button(self.button_frame, text="Undo", command=self.undo, bg="gray25", fg="white", font=('Arial', 14), padx=20)
+        self.undo_button.pack(side=LEFT, padx=5)
+
+        self.redo_button = Button(self.button_frame, text="Redo", command=self.redo, bg="gray25", fg="white", font=('Arial', 14), padx=20)
+        self.redo_button.pack(side=LEFT, padx=5)
+
+        if INFINITE_MODE:
+            # Zoom buttons; the arrow keys or two raised fingers pan the board
+            self.zoom_in_button = Button(self.button_frame, text="Zoom +", command=lambda: self.zoom(1.25), bg="gray25", fg="white", font=('Arial', 14), padx=20)
+            self.zoom_in_button.pack(side=LEFT, padx=5)
+
+            self.zoom_out_button = Button(self.button_frame, text="Zoom -", command=lambda: self.zoom(0.8), bg="gray25", fg="white", font=('Arial', 14), padx=20)
+            self.zoom_out_button.pack(side=LEFT, padx=5)
+            bind_pan_keys(self.root, self.pan)
+
         # Exit button
         self.exit_button = Button(self.button_frame, text="Exit", command=self.close_app, bg="red", fg="white", font=('Arial', 14), padx=20)
         self.exit_button.pack(side=RIGHT, padx=10)
 
         # Initialize VirtualPainter
-        self.virtual_painter = VirtualPainter(root, self.video_frame)
+        self.virtual_painter = VirtualPainter(root, self.video_frame, pipelined=pipelined, multi_hand=multi_hand)
         self.virtual_painter.start_painting_cam()  # Start painting functionality
 
     def toggle_eraser(self):
@@ -194,157 +536,184 @@ class FullScreenCameraApp:
     def change_color(self, color):
         self.virtual_painter.change_color(color)
 
-    def close_app(self):
-        # Stop virtual painter and close application
-        self.virtual_painter.stop_painting()
-        self.root.destroy()
+    def undo(self):
+        self.virtual_painter.undo()
 
-class VirtualPainter:
-    def __init__(self, root, video_label):
-        self.root = root
-        self.video_label = video_label
-        self.running = False
+    def redo(self):
+        self.virtual_painter.redo()
 
-        # Initialize camera
-        self.cap = cv2.VideoCapture(0)
-        self.detector = handDetector()
+    def pan(self, dx, dy):
+        self.virtual_painter.pan(dx, dy)
 
-        # Create canvas for drawing
-        self.canvas = np.zeros((480, 640, 3), np.uint8)
+    def zoom(self, factor):
+        self.virtual_painter.zoom(factor)
 
-        # Previous point coordinates
-        self.px, self.py = 0, 0
+    def close_app(self):
+        # Stop virtual painter (saving the drawing) and go back to the menu
+        self.virtual_painter.stop_painting()
+        open_main_menu()
 
-        # Eraser mode
-        self.is_eraser = False
+class VirtualPainter(TrackedView):
+    delay = 0.015
 
-        # Current color
-        self.current_color = (0, 0, 255)  # Default to red
+    def __init__(self, root, video_label, pipelined=False, multi_hand=False):
+        self.root = root
+        self.video_label = video_label
+        # Follows the label size; the PhotoImage is only rebuilt when it changes
+        self.display = TkDisplay(video_label)
+        self.running = False
+        self.pipelined = pipelined
+        self.multi_hand = multi_hand
+        self.pipeline = None
+
+        # Tracked frames come from the shared hand service
+        self.opened = time.perf_counter()
+        self.frames = SERVICE.subscribe()
+
+        # Drawing canvas and brush state; an adaptive-rate detector already smooths
+        smooth = not DETECTOR_OPTIONS.get("adaptiveRate", False)
+        # The service hands out frames of the requested capture size
+        size = CAPTURE_OPTIONS.get("width", 640), CAPTURE_OPTIONS.get("height", 480)
+        if INFINITE_MODE:
+            self.board = InfiniteBoard(*size, smooth=smooth, spline=SPLINE_MODE)
+        else:
+            self.board = PaintingBoard(*size, smooth=smooth, brush=BRUSH_MODE, spline=SPLINE_MODE)
+        if SESSION_DIR and not INFINITE_MODE:
+            # Bring back the last drawing and keep saving it
+            self.board.restore(CanvasStore(os.path.join(SESSION_DIR, "virtual"),
+                                           self.board.width, self.board.height))
+        # Remote viewers of /strokes get the stroke deltas
+        self.board.stream = STREAM
+
+        # Tools by hand pose (single pen only); the pinch cycles the button colors
+        self.gestures = GestureEngine() if GESTURE_MODE and not multi_hand else None
+        self.palette = [(0, 0, 255), (0, 255, 0), (255, 0, 0)]
+        self.pose = None
+        self.fist_eraser = False
 
     def toggle_eraser(self):
         # Toggle eraser mode
-        self.is_eraser = not self.is_eraser
+        self.board.toggle_eraser()
 
     def change_color(self, color):
         # Change current drawing color
-        self.current_color = color
-        self.is_eraser = False  # Disable eraser when changing color
-
-    def start_painting(self):
-        if not self.running:
-            self.running = True
-            self.update_frame()
-
-    def start_painting_cam(self):
-        if not self.running:
-            self.running = True
-            self.update_frame_cam()
-
-    def update_frame(self):
-        if self.running:
-            success, img = self.cap.read()
-            if not success:
-                self.stop_painting()
-                return
-
-            img = cv2.flip(img, 1)  # Mirror image
-
-            # Detect hand landmarks
-            img = self.detector.findHands(img)
-            lm_list = self.detector.findPosition(img, draw=False)
-
-            if len(lm_list) > 0:
-                # Index finger coordinates
-                x, y = lm_list[8][1], lm_list[8][2]
-
-                # Smooth coordinates
-                self.smoothed_x = 0.7 * getattr(self, 'smoothed_x', x) + 0.3 * x
-                self.smoothed_y = 0.7 * getattr(self, 'smoothed_y', y) + 0.3 * y
-                x, y = int(self.smoothed_x), int(self.smoothed_y)
+        self.board.change_color(color)
 
-                # Set thickness and color
-                thickness = 50 if self.is_eraser else 15
-                color = (0, 0, 0) if self.is_eraser else self.current_color
+    def undo(self):
+        self.board.undo()
 
-                # Draw line if not the first point
-                if abs(x - self.px) > 5 or abs(y - self.py) > 5:  # Ignore small movements
-                    if self.px != 0 and self.py != 0:
-                        cv2.line(self.canvas, (self.px, self.py), (x, y), color, thickness)
-                    self.px, self.py = x, y
-            else:
-                self.px, self.py = 0, 0  # Hand not detected
+    def redo(self):
+        self.board.redo()
 
-            # Create a white background
-            white_background = np.ones_like(self.canvas, dtype=np.uint8) * 255
-            combined_canvas = cv2.addWeighted(self.canvas, 1.0, white_background, 1.0, 0)
+    def pan(self, dx, dy):
+        if isinstance(self.board, InfiniteBoard):
+            self.board.pan(dx, dy)
 
-            # Render resized frame for display
-            img = cv2.resize(combined_canvas, (self.video_label.winfo_width(), self.video_label.winfo_height()))
-            img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-            imgtk = ImageTk.PhotoImage(image=Image.fromarray(img))
-            self.video_label.imgtk = imgtk
-            self.video_label.config(image=imgtk)
+    def zoom(self, factor):
+        if isinstance(self.board, InfiniteBoard):
+            self.board.zoom(factor)
 
-            # Schedule the next update
-            self.root.after(15, self.update_frame)
+    def start_painting(self):
+        if not self.running:
+            self.run_frames(self.compose_board)
 
-    def update_frame_cam(self):
-        if self.running:
-            success, img = self.cap.read()
-            if not success:
-                self.stop_painting()
+    def start_painting_cam(self):
+        if not self.running:
+            self.run_frames(self.compose_cam)
+
+    def pick_tip(self, frame):
+        # With gestures the poses also cover the pan (hover)
+        if isinstance(self.board, InfiniteBoard):
+            if len(frame.landmarks) and fingers_up(frame.landmarks[0], (8, 12)):
+                # Index and middle finger raised: move the board instead of drawing
+                return "pan", frame.tip(8)
+        if BRUSH_MODE and len(frame.landmarks):
+            # The brush also wants the fingertip depth
+            return frame.landmarks[0, 8]
+        return super().pick_tip(frame)
+
+    def apply_gesture(self, gesture):
+        """Tool actions of the pose; returns what stroke() takes for the pen."""
+        pose, entered, hand = gesture if gesture is not None else (None, False, None)
+        pen = self.board.pen
+        if pose != self.pose:
+            # Every pose starts a new stroke
+            self.board.stroke(None)
+            self.pose = pose
+        if self.fist_eraser != (pose == FIST):
+            # The fist erases while it is held
+            self.fist_eraser = pose == FIST
+            pen.is_eraser = self.fist_eraser
+        if entered and pose == PINCH:
+            color = tuple(pen.color)
+            i = self.palette.index(color) + 1 if color in self.palette else 0
+            self.board.change_color(self.palette[i % len(self.palette)])
+        elif entered and pose == PALM:
+            self.board.clear()
+        if pose == DRAW:
+            # The brush also wants the fingertip depth
+            return hand[8] if BRUSH_MODE else hand[8, :2]
+        if pose == FIST:
+            return hand[9, :2]  # Middle of the hand
+        if pose == HOVER and isinstance(self.board, InfiniteBoard):
+            # Two fingers move the board
+            return "pan", (int(hand[8, 0]), int(hand[8, 1]))
+        return None
+
+    def stroke(self, hands, img=None):
+        if self.gestures is not None:
+            hands = self.apply_gesture(hands)
+        if isinstance(self.board, InfiniteBoard) and not self.multi_hand:
+            if hands is not None and hands[0] == "pan":
+                self.board.drag(hands[1])
                 return
-
-            img = cv2.flip(img, 1)  # Mirror image
-
-            # Detect hand landmarks
-            img = self.detector.findHands(img)
-            lm_list = self.detector.findPosition(img, draw=False)
-
-            if len(lm_list) > 0:
-                # Index finger coordinates
-                x, y = lm_list[8][1], lm_list[8][2]
-
-                # Smooth coordinates
-                self.smoothed_x = 0.7 * getattr(self, 'smoothed_x', x) + 0.3 * x
-                self.smoothed_y = 0.7 * getattr(self, 'smoothed_y', y) + 0.3 * y
-                x, y = int(self.smoothed_x), int(self.smoothed_y)
-
-                # Set thickness and color
-                thickness = 50 if self.is_eraser else 15
-                color = (0, 0, 0) if self.is_eraser else self.current_color
-
-                # Draw line if movement is significant
-                if abs(x - self.px) > 5 or abs(y - self.py) > 5:
-                    if self.px != 0 and self.py != 0:
-                        # Draw on both canvas and live feed
-                        cv2.line(self.canvas, (self.px, self.py), (x, y), color, thickness)
-                        cv2.line(img, (self.px, self.py), (x, y), color, thickness)
-                    self.px, self.py = x, y
-            else:
-                # Reset previous points when hand is not detected
-                self.px, self.py = 0, 0
-
-            # Combine live video with the drawing canvas
-            img = cv2.add(img, self.canvas)
-
-            # Resize frame to fit the GUI window
-            img = cv2.resize(img, (self.video_label.winfo_width(), self.video_label.winfo_height()))
-            img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-
-            # Convert frame to Tkinter-compatible format
-            imgtk = ImageTk.PhotoImage(image=Image.fromarray(img))
-            self.video_label.imgtk = imgtk
-            self.video_label.config(image=imgtk)
-
-            # Schedule the next frame update
-            self.root.after(15, self.update_frame_cam)
+            self.board.drag(None)
+        if self.multi_hand:
+            # One pen per hand, all from the same inference call
+            self.board.stroke_hands(hands[0], hands[1], img)
+        else:
+            self.board.stroke(hands, img)
+
+    def compose_board(self, detected):
+        started = time.perf_counter()
+        with registry.timer("compose"):
+            img, hands, captured, cost = detected
+            self.stroke(hands)
+            board = self.board.compose_board()
+            self.publish_board(board)
+            img = self.prepare(board)
+        return img, captured, cost + time.perf_counter() - started
+
+    def compose_cam(self, detected):
+        started = time.perf_counter()
+        with registry.timer("compose"):
+            img, hands, captured, cost = detected
+            # Draw on both canvas and live feed
+            self.stroke(hands, img)
+            self.publish_board()
+            img = self.prepare(self.board.compose_cam(img))
+        return img, captured, cost + time.perf_counter() - started
+
+    def publish_board(self, board=None):
+        # Viewers of /strokes reload the board view, whichever view is shown
+        if STREAM is not None and STREAM.board_wanted:
+            STREAM.publish_board(self.board.compose_board() if board is None else board)
+
+    def prepare(self, img):
+        if STREAM is not None:
+            # Encoded off this thread, only while someone watches
+            STREAM.publish(img)
+        # Resize frame to fit the GUI window, into a reused display buffer
+        img = self.display.convert(img)
+        if OVERLAY_MODE:
+            registry.overlay(img, color=(255, 0, 255, 255))
+        return img
 
     def stop_painting(self):
-        self.running = False
-        if self.cap:
-            self.cap.release()
-        self.canvas = np.zeros((480, 640, 3), np.uint8)
+        # Workers must be gone before the board is saved
+        self.stop_frames()
+        # Keep the drawing: the last changes go to disk for the next session
+        self.board.close()
 
 class MainMenu:
     def __init__(self, root):
@@ -359,90 +728,101 @@ class MainMenu:
         Button(main_frame, text="Papan Tulis", command=open_canvas, bg="blue", fg="white", font=("Arial", 24), padx=20, pady=10).pack(pady=(0, 20))
         Button(main_frame, text="Papan Virtual", command=open_camera, bg="green", fg="white", font=("Arial", 24), padx=20, pady=10).pack(pady=(0, 0))
 
-class handDetector():
-    def __init__(self, mode=False, maxHands=2, detectionCon=0.5,modelComplexity=1,trackCon=0.5):
-        self.mode = mode
-        self.maxHands = maxHands
-        self.detectionCon = detectionCon
-        self.modelComplex = modelComplexity
-        self.trackCon = trackCon
-        self.mpHands = mp.solutions.hands
-        self.hands = self.mpHands.Hands(self.mode, self.maxHands,self.modelComplex,
-                                        self.detectionCon, self.trackCon)
-        self.mpDraw = mp.solutions.drawing_utils # it gives small dots onhands total 20 landmark points
-
-    def findHands(self,img,draw=True):
-        # Send rgb image to hands
-        imgRGB = cv2.cvtColor(img,cv2.COLOR_BGR2RGB)
-        self.results = self.hands.process(imgRGB) # process the frame
-    #     print(results.multi_hand_landmarks)
-
-        if self.results.multi_hand_landmarks:
-            for handLms in self.results.multi_hand_landmarks:
-
-                if draw:
-                    #Draw dots and connect them
-                    self.mpDraw.draw_landmarks(img,handLms,self.mpHands.HAND_CONNECTIONS)
-
-        return img
-
-    def findPosition(self,img, handNo=0, draw=True):
-        """Lists the position/type of landmarks
-        we give in the list and in the list ww have stored
-        type and position of the landmarks.
-        List has all the lm position"""
-
-        lmlist = []
-
-        # check wether any landmark was detected
-        if self.results.multi_hand_landmarks:
-            #Which hand are we talking about
-            myHand = self.results.multi_hand_landmarks[handNo]
-            # Get id number and landmark information
-            for id, lm in enumerate(myHand.landmark):
-                # id will give id of landmark in exact index number
-                # height width and channel
-                h,w,c = img.shape
-                #find the position
-                cx,cy = int(lm.x*w), int(lm.y*h) #center
-                # print(id,cx,cy)
-                lmlist.append([id,cx,cy])
-
-                # Draw circle for 0th landmark
-                if draw:
-                    cv2.circle(img,(cx,cy), 15 , (255,0,255), cv2.FILLED)
-
-        return lmlist
-
-def main():
-    #Frame rates
-    pTime = 0
-    cTime = 0
-    cap = cv2.VideoCapture(0)
-    detector = handDetector()
-
-    while True:
-        success,img = cap.read()
-        img = detector.findHands(img)
-        lmList = detector.findPosition(img)
-        if len(lmList) != 0:
-            print(lmList[4])
-
-        cTime = time.time()
-        fps = 1/(cTime-pTime)
-        pTime = cTime
-
-        cv2.putText(img,str(int(fps)),(10,70), cv2.FONT_HERSHEY_PLAIN,3,(255,0,255),3)
-
-        cv2.imshow("Video",img)
-        if cv2.waitKey(1) == ord('q'):
-            break
-
-    cap.release()
-    cv2.destroyAllWindows()
-
-# if __name__ == "__main__":
-#     main()
-
 if __name__ == "__main__":
-    open_main_menu()
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pipeline", action="store_true",
+                        help="run capture, inference and compositing on worker threads")
+    parser.add_argument("--pipeline-report", action="store_true",
+                        help="print the pipeline's per-stage rates and bottleneck every 5 s")
+    parser.add_argument("--tk-lines", action="store_true",
+                        help="draw whiteboard strokes as Tk canvas lines (legacy renderer)")
+    parser.add_argument("--roi-tracking", action="store_true",
+                        help="run hand inference on a crop around the previous frame's hand")
+    parser.add_argument("--adaptive-rate", action="store_true",
+                        help="run hand inference only every few frames and predict in between")
+    parser.add_argument("--multi-hand", action="store_true",
+                        help="let every detected hand draw with its own pen")
+    parser.add_argument("--overlay", action="store_true",
+                        help="draw fps, detection rate and stage latencies over the video")
+    parser.add_argument("--metrics-port", type=int,
+                        help="serve Prometheus metrics on http://127.0.0.1:PORT/metrics")
+    parser.add_argument("--metrics-dump", metavar="PATH",
+                        help="write metrics to PATH every 10 s (.json snapshot, otherwise CSV rows)")
+    parser.add_argument("--autosave", action="store_true",
+                        help="save the drawings and restore them on the next start")
+    parser.add_argument("--session-dir", default=DEFAULT_SESSION_DIR,
+                        help="directory the drawings are autosaved to (default: sessions/ next to this "
+                             "file); implies --autosave")
+    parser.add_argument("--infinite", action="store_true",
+                        help="paint on a large board with pan and zoom (not autosaved)")
+    parser.add_argument("--camera", default="0",
+                        help="camera index, video file or synthetic[:WxH[@FPS]] for testing without a camera")
+    parser.add_argument("--capture-size", type=parse_size, default=(640, 480),
+                        help="resolution to ask the camera for, WxH; also the virtual painter's board size")
+    parser.add_argument("--capture-fps", type=float, default=30, help="frame rate to ask the camera for")
+    parser.add_argument("--no-mjpg", action="store_true",
+                        help="let the driver pick the camera codec instead of MJPG")
+    parser.add_argument("--record", metavar="PATH", help="log the tracked landmarks of every frame to PATH")
+    parser.add_argument("--replay", metavar="PATH",
+                        help="drive the views from a landmark log instead of the camera and the model")
+    parser.add_argument("--stream", type=int, metavar="PORT",
+                        help="stream the virtual painter on http://HOST:PORT/ (MJPEG, stroke deltas on /strokes)")
+    parser.add_argument("--stream-host", default="127.0.0.1", metavar="HOST",
+                        help="interface to stream on (default: this machine only; 0.0.0.0 for every interface)")
+    parser.add_argument("--backend",
+                        help="hand backend: mediapipe-full, mediapipe-lite, tasks, replay[:LOG] or auto "
+                             "(the most accurate one within --inference-budget)")
+    parser.add_argument("--inference-budget", type=float, default=30.0,
+                        help="per-frame inference budget in ms for --backend auto")
+    parser.add_argument("--qos", action="store_true",
+                        help="degrade drawing, inference and display when frames go over --frame-budget")
+    parser.add_argument("--frame-budget", type=float, default=50.0,
+                        help="per-frame processing budget in ms (tracking, compositing, display) for --qos")
+    parser.add_argument("--spline", action="store_true",
+                        help="curve strokes through the fingertip samples (smooth strokes at low detection rates)")
+    parser.add_argument("--gestures", action="store_true",
+                        help="pick tools by hand pose: index draws, two fingers hover, pinch = next color, "
+                             "fist erases, open palm clears (single hand)")
+    parser.add_argument("--brush", action="store_true",
+                        help="paint the virtual board with an anti-aliased brush that widens towards the camera")
+    args = parser.parse_args()
+    PIPELINE_MODE = args.pipeline
+    PIPELINE_REPORT = args.pipeline_report
+    MULTI_HAND_MODE = args.multi_hand
+    TK_LINES_MODE = args.tk_lines
+    DETECTOR_OPTIONS["roiTracking"] = args.roi_tracking
+    DETECTOR_OPTIONS["adaptiveRate"] = args.adaptive_rate
+    DETECTOR_OPTIONS["backend"] = args.backend
+    DETECTOR_OPTIONS["backendBudget"] = args.inference_budget / 1000.0
+    OVERLAY_MODE = args.overlay
+    if args.infinite and args.brush:
+        parser.error("--brush does not work with --infinite (the tiled board draws plain lines)")
+    if args.autosave or args.session_dir != DEFAULT_SESSION_DIR:
+        if args.infinite:
+            # The sparse tiles have no CanvasStore format; nothing is saved or restored
+            print("autosave is not available with --infinite; the drawing will not be saved")
+        else:
+            SESSION_DIR = os.path.abspath(args.session_dir)
+    INFINITE_MODE = args.infinite
+    CAMERA = args.camera
+    RECORD_PATH = args.record
+    REPLAY_PATH = args.replay
+    BRUSH_MODE = args.brush
+    GESTURE_MODE = args.gestures
+    SPLINE_MODE = args.spline
+    if args.qos:
+        QOS = QosGovernor(args.frame_budget / 1000.0)
+    CAPTURE_OPTIONS.update(width=args.capture_size[0], height=args.capture_size[1], fps=args.capture_fps,
+                           fourcc="" if args.no_mjpg else "MJPG")
+    if REPLAY_PATH:
+        # Views size their boards to the recorded frames
+        from landmarkLog import LandmarkLog
+        log = LandmarkLog(REPLAY_PATH)
+        CAPTURE_OPTIONS.update(width=log.width, height=log.height)
+    if args.metrics_port:
+        registry.serve(args.metrics_port)
+    if args.metrics_dump:
+        registry.start_dump(args.metrics_dump, 10)
+    if args.stream:
+        STREAM = StreamServer(args.stream, args.stream_host).start()
+    run_app()
\ No newline at end of file
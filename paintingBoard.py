@@ -0,0 +1,305 @@
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+from boardCompositor import BoardCompositor
+from brushEngine import BrushEngine
+from penTracker import Pen, PenTracker
+from strokeSpline import pairs
+from strokeStore import StrokeStore
+
+# Starting pen color per hand in multi-hand mode (BGR)
+HAND_COLORS = {"Right": (0, 0, 255), "Left": (255, 0, 0)}
+
+
+class PaintingBoard:
+    """Stroke state and compositing for the virtual painter, without any Tk code.
+
+    Kept separate from the GUI so the same logic can run on a worker thread or
+    headless (benchmarks, batch jobs).
+
+    With brush=True strokes are painted anti-aliased by a BrushEngine, wider
+    as the fingertip comes towards the camera (pass tips as (x, y, z)).
+
+    With spline=True strokes follow a spline through the fingertip samples
+    instead of straight lines between them (see strokeSpline), so they stay
+    round at low detection rates.
+    """
+
+    def __init__(self, width=640, height=480, smooth=True, brush=False, spline=False):
+        self.width = width
+        self.height = height
+
+        # Create canvas for drawing
+        self.canvas = np.zeros((height, width, 3), np.uint8)
+        # 1 where the canvas holds ink, 0 where it is empty or erased; with
+        # the brush engine, coverage 0..255 and the canvas is premultiplied
+        self.ink = np.zeros((height, width), np.uint8)
+        self.brush_engine = BrushEngine() if brush else None
+        self.compositor = BoardCompositor(width, height, alpha=brush)
+
+        # Vector record of the strokes, for undo/redo and re-rendering
+        self.strokes = StrokeStore(width, height)
+        # Undo/redo requests from the GUI thread, applied before the next stroke
+        self.commands = deque()
+        # Optional CanvasStore the board autosaves to (see restore())
+        self.saver = None
+        # Optional StreamServer that gets the stroke deltas
+        self.stream = None
+
+        # Brush state. The single-hand pen follows stroke(); stroke_hands()
+        # gives every detected hand its own pen
+        beta = 5.0 / width if smooth else None
+        self.pen = Pen(0, color=(0, 0, 255), smooth_beta=beta, spline=spline)  # Default to red
+        self.tracker = PenTracker(HAND_COLORS, (0, 0, 255), max_jump=0.25 * width, smooth_beta=beta,
+                                  spline=spline)
+
+    def all_pens(self):
+        return [self.pen] + list(self.tracker.pens.values())
+
+    def toggle_eraser(self, pen=None):
+        # Toggle eraser mode, for one pen or all of them (GUI buttons)
+        for p in [pen] if pen is not None else self.all_pens():
+            p.is_eraser = not p.is_eraser
+
+    def change_color(self, color, pen=None):
+        # Change current drawing color
+        for p in [pen] if pen is not None else self.all_pens():
+            p.color = color
+            p.is_eraser = False  # Disable eraser when changing color
+
+    def stroke(self, tip, img=None, t=None):
+        """Extend the current stroke to the index fingertip (x, y[, z]); None lifts the pen.
+
+        If img is given the new segment is drawn on it as well (live feed).
+        t is the frame timestamp in seconds, used by the smoothing filter.
+        """
+        self.run_commands()
+        t = time.perf_counter() if t is None else t
+        segments = self._advance(self.pen, tip, t)
+        if segments:
+            self.draw_segments(segments, img)
+        self.autosave(t)
+
+    def stroke_hands(self, landmarks, handedness, img=None, t=None):
+        """Advance one pen per detected hand from a (n_hands, 21, 3) landmark array.
+
+        All new segments of the frame are rasterized together.
+        """
+        self.run_commands()
+        t = time.perf_counter() if t is None else t
+        tips = landmarks[:, 8] if len(landmarks) else []
+        pens, lost = self.tracker.match(tips, handedness)
+        for pen in lost:
+            self._advance(pen, None, t)
+        segments = []
+        for pen, tip in zip(pens, tips):
+            segments.extend(self._advance(pen, tip, t))
+        if segments:
+            self.draw_segments(segments, img)
+        self.autosave(t)
+
+    def _advance(self, pen, tip, t):
+        """Moves a pen to tip; returns the segments (pen, x0, y0, x1, y1) to draw."""
+        if tip is None:
+            # Reset previous points when hand is not detected
+            self.finish_splines(pen)
+            self.end_stroke(pen)
+            pen.lift()
+            return []
+
+        # Index finger coordinates
+        x, y = tip[0], tip[1]
+        if len(tip) > 2:
+            pen.depth = -float(tip[2]) / self.width
+
+        # Smooth coordinates
+        if pen.tip_filter is not None:
+            x, y = pen.tip_filter((x, y), t)
+        x, y = int(x), int(y)
+
+        segments = []
+        # Draw line if movement is significant
+        if abs(x - pen.px) > 5 or abs(y - pen.py) > 5:
+            if pen.spline is not None:
+                if pen.px == 0 and pen.py == 0:
+                    # First sample of a stroke
+                    pen.spline.reset()
+                segments = [(pen,) + piece for piece in pairs(pen.spline.add(x, y, t))]
+            elif pen.px != 0 and pen.py != 0:
+                segments = [(pen, pen.px, pen.py, x, y)]
+            pen.px, pen.py = x, y
+        return segments
+
+    def finish_splines(self, pen=None):
+        """Draws the end of the strokes the pen splines still hold back."""
+        for p in [pen] if pen is not None else self.all_pens():
+            if p.spline is not None:
+                segments = [(p,) + piece for piece in pairs(p.spline.finish())]
+                if segments:
+                    self.draw_segments(segments)
+
+    def brush(self, pen):
+        """(color, thickness) a pen paints with; the eraser paints black."""
+        if pen.is_eraser:
+            return (0, 0, 0), 50
+        return tuple(pen.color), 15
+
+    def draw_segments(self, segments, img=None):
+        """Rasterizes segments with one polylines call per brush (color, width)."""
+        if self.brush_engine is not None:
+            self.paint_segments(segments)
+            return
+        batches = {}
+        for pen, x0, y0, x1, y1 in segments:
+            # Set thickness and color
+            color, thickness = self.brush(pen)
+            batches.setdefault((color, thickness, pen.is_eraser), []).append(
+                np.array(((x0, y0), (x1, y1)), np.int32))
+            self.compositor.mark(x0, y0, x1, y1, thickness, ink=not pen.is_eraser)
+            if self.saver is not None:
+                self.saver.mark(x0, y0, x1, y1, thickness)
+            self.record(pen, x0, y0, x1, y1, color, thickness)
+        self.publish([(x0, y0, x1, y1) + self.brush(pen) + (pen.is_eraser,)
+                      for pen, x0, y0, x1, y1 in segments])
+
+        for (color, thickness, eraser), lines in batches.items():
+            cv2.polylines(self.canvas, lines, False, color, thickness)
+            cv2.polylines(self.ink, lines, False, 0 if eraser else 1, thickness)
+            if img is not None:
+                # Draw on the live feed as well
+                cv2.polylines(img, lines, False, color, thickness)
+
+    def paint_segments(self, segments):
+        """Brush engine path: each segment is painted once, into the canvas and
+        ink only; compose_cam puts it on the live feed."""
+        engine = self.brush_engine
+        published = []
+        for pen, x0, y0, x1, y1 in segments:
+            color, thickness = self.brush(pen)
+            if pen.is_eraser:
+                # The eraser keeps its width, it should be predictable
+                size = float(thickness)
+            else:
+                size = 2.0 * engine.radius_for(pen.depth, thickness / 2.0, pen)
+            start = self.record(pen, x0, y0, x1, y1, color, thickness, size)
+            rect = engine.segment(self.canvas, self.ink, pen, x0, y0, x1, y1,
+                                  start / 2.0, size / 2.0, color, pen.is_eraser)
+            if rect is not None:
+                self.compositor.mark_rect(*rect, ink=not pen.is_eraser)
+                if self.saver is not None:
+                    self.saver.mark_rect(*rect)
+            published.append((x0, y0, x1, y1, color, int(round(size)), pen.is_eraser))
+        self.publish(published)
+
+    def record(self, pen, x0, y0, x1, y1, color, thickness, size=None):
+        """Adds the segment to the pen's stroke; returns the width at (x0, y0)."""
+        store = self.strokes
+        sid = pen.stroke_id
+        # A brush change mid-stroke starts a new stroke
+        if sid is not None and (store.eraser[sid] != pen.is_eraser or store.color[sid] != tuple(color)):
+            self.end_stroke(pen)
+            sid = None
+        if sid is None:
+            sid = pen.stroke_id = store.begin(x0, y0, color, thickness, pen.is_eraser, size=size)
+        start = float(store.open[sid][-1][3])
+        store.add_point(sid, x1, y1, size=size)
+        return start
+
+    def end_stroke(self, pen=None):
+        for p in [pen] if pen is not None else self.all_pens():
+            if p.stroke_id is not None:
+                self.strokes.finish(p.stroke_id)
+                p.stroke_id = None
+            if self.brush_engine is not None:
+                self.brush_engine.end_stroke(p)
+
+    def undo(self):
+        # Safe to call from the GUI thread while stroke() runs on a worker
+        self.commands.append("undo")
+
+    def redo(self):
+        self.commands.append("redo")
+
+    def erase_at(self, x, y, radius=25):
+        """Removes whole strokes under (x, y) instead of painting over them."""
+        self.commands.append(("erase", x, y, radius))
+
+    def run_commands(self):
+        if self.commands:
+            # What the splines hold back belongs to the drawing before the command
+            self.finish_splines()
+        while self.commands:
+            self._run_command(self.commands.popleft())
+
+    def _run_command(self, command):
+        # Pens start a fresh stroke after the history changed
+        self.end_stroke()
+        for pen in self.all_pens():
+            pen.px, pen.py = 0, 0
+        if command == "undo":
+            sids = self.strokes.undo()
+        elif command == "redo":
+            sids = self.strokes.redo()
+        elif command == "clear":
+            sids = self.strokes.clear()
+        else:
+            _, x, y, radius = command
+            sids = self.strokes.erase_at(x, y, radius)
+        rect = self.strokes.bounds(sids)
+        if rect is not None:
+            self.redraw(rect)
+            self.publish(None)
+
+    def publish(self, segments):
+        # Stroke deltas for remote viewers; None: the drawing changed otherwise
+        if self.stream is not None:
+            self.stream.publish_strokes(segments)
+
+    def redraw(self, rect=None):
+        """Re-render the canvas (or one region of it) from the stroke store."""
+        if rect is None:
+            rect = (0, 0, self.width, self.height)
+        self.strokes.rasterize(self.canvas, self.ink, rect, brush=self.brush_engine)
+        self.compositor.mark_rect(*rect)
+        if self.saver is not None:
+            self.saver.mark_rect(*rect)
+
+    def compose_board(self):
+        # Drawing on a white background; only changed regions are re-blended.
+        # The returned buffer is reused on the next call.
+        return self.compositor.compose_board(self.canvas, self.ink)
+
+    def compose_cam(self, img):
+        # Combine live video with the drawing canvas, in place on img
+        return self.compositor.compose_cam(img, self.canvas)
+
+    def clear(self):
+        # Hides every stroke, so undo brings the drawing back (as on the whiteboard)
+        self.commands.append("clear")
+
+    def restore(self, saver):
+        """Load the session saved in a CanvasStore and keep autosaving to it."""
+        self.saver = saver
+        if saver.open():
+            strokes = saver.load(self.canvas, self.ink)
+            if strokes is not None:
+                self.strokes = strokes
+                if self.brush_engine is not None:
+                    # The session may have been painted without the brush
+                    # (ink 0/1); re-render it anti-aliased
+                    self.redraw()
+            for rect in saver.inked_rects():
+                self.compositor.mark_rect(*rect)
+
+    def autosave(self, now=None):
+        if self.saver is not None:
+            self.saver.maybe_save(self.canvas, self.ink, self.strokes, now)
+
+    def close(self):
+        # Final save; the drawing stays on disk for the next session
+        if self.saver is not None:
+            self.saver.close(self.canvas, self.ink, self.strokes)
+            self.saver = None
@@ -0,0 +1,96 @@
+import numpy as np
+
+from landmarkFilter import OneEuroFilter
+from strokeSpline import StrokeSpline
+
+
+class Pen:
+    """Brush state of one hand: color, eraser mode, previous point and open stroke."""
+
+    def __init__(self, key, hand=None, color=(0, 0, 255), smooth_beta=None, spline=False):
+        self.key = key
+        self.hand = hand  # "Left"/"Right" from MediaPipe, None for the single-hand pen
+        self.color = color
+        self.is_eraser = False
+        self.px, self.py = 0, 0
+        self.tip_filter = OneEuroFilter(minCutoff=1.0, beta=smooth_beta) if smooth_beta else None
+        self.spline = StrokeSpline() if spline else None  # curves the stroke through the samples
+        self.stroke_id = None
+        self.depth = None  # fingertip towards the camera (-z / frame width), widens the brush
+        self.last = None  # last raw fingertip, used to match hands between frames
+        self.active = False
+
+    def lift(self):
+        self.px, self.py = 0, 0
+        self.active = False
+        if self.tip_filter is not None:
+            self.tip_filter.reset()
+        if self.spline is not None:
+            self.spline.reset()
+
+
+class PenTracker:
+    """Assigns detected hands to pens across frames.
+
+    Hands are matched to the nearest active pen (same handedness preferred),
+    so two people showing the same hand still get separate pens. A hand that
+    reappears takes back an idle pen of the same handedness, keeping its
+    color and eraser mode.
+    """
+
+    def __init__(self, colors, default_color, max_jump, smooth_beta=None, max_pens=4, spline=False):
+        self.colors = colors  # handedness -> starting color
+        self.default_color = default_color
+        self.max_jump = max_jump  # largest fingertip move (pixels) between frames for the same pen
+        self.smooth_beta = smooth_beta
+        self.spline = spline
+        self.max_pens = max_pens
+        self.pens = {}
+        self.next_key = 0
+
+    def match(self, tips, handedness):
+        """Returns the pen for each tip and the pens whose hand disappeared.
+
+        A tip without a handedness label is matched as an unknown hand."""
+        handedness = list(handedness[:len(tips)]) + [None] * (len(tips) - len(handedness))
+        pairs = []
+        for i, (tip, hand) in enumerate(zip(tips, handedness)):
+            for key, pen in self.pens.items():
+                if pen.active and pen.last is not None:
+                    cost = float(np.hypot(tip[0] - pen.last[0], tip[1] - pen.last[1]))
+                    if pen.hand != hand:
+                        cost += self.max_jump / 2
+                    if cost < self.max_jump:
+                        pairs.append((cost, i, key))
+                elif pen.hand == hand:
+                    # Idle pen of the same hand, position unknown
+                    pairs.append((self.max_jump, i, key))
+        pairs.sort()
+
+        assigned = [None] * len(tips)
+        used = set()
+        for _, i, key in pairs:
+            if assigned[i] is None and key not in used:
+                assigned[i] = self.pens[key]
+                used.add(key)
+        for i, (_, hand) in enumerate(zip(tips, handedness)):
+            if assigned[i] is None:
+                assigned[i] = self._new_pen(hand, used)
+                used.add(assigned[i].key)
+
+        lost = [pen for key, pen in self.pens.items() if pen.active and key not in used]
+        for pen, tip in zip(assigned, tips):
+            pen.last = (float(tip[0]), float(tip[1]))
+            pen.active = True
+        return assigned, lost
+
+    def _new_pen(self, hand, used=()):
+        if len(self.pens) >= self.max_pens:
+            # Pens matched this frame are not active yet, but are taken
+            idle = [key for key, pen in self.pens.items() if not pen.active and key not in used]
+            if idle:
+                del self.pens[idle[0]]
+        pen = Pen(self.next_key, hand, self.colors.get(hand, self.default_color), self.smooth_beta, self.spline)
+        self.pens[pen.key] = pen
+        self.next_key += 1
+        return pen
@@ -0,0 +1,246 @@
+"""Always-on performance metrics.
+
+Stages record their latency into rolling windows (for percentiles) and
+cumulative buckets (for Prometheus). Recording is a couple of array writes
+under a lock, so it can stay enabled in production.
+
+    from perfMetrics import registry
+    with registry.timer("inference"):
+        ...
+    registry.serve(9100)                   # http://localhost:9100/metrics
+    registry.start_dump("metrics.csv", 10)  # append a row every 10 s
+"""
+import bisect
+import csv
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+import numpy as np
+
+# Histogram bucket upper bounds in seconds (Prometheus "le" labels)
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.0167, 0.025, 0.033, 0.05, 0.075, 0.1, 0.25, 0.5, 1.0)
+
+
+class StageHistogram:
+    """Latency of one stage: last `window` samples plus cumulative buckets."""
+
+    def __init__(self, window=512):
+        self.samples = np.zeros(window, np.float32)
+        self.n = 0
+        self.buckets = np.zeros(len(BUCKETS) + 1, np.int64)
+        self.total = 0.0
+
+    def observe(self, seconds):
+        self.samples[self.n % len(self.samples)] = seconds
+        self.n += 1
+        self.total += seconds
+        self.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+
+    def summary(self):
+        count = min(self.n, len(self.samples))
+        if count == 0:
+            return {"count": 0, "mean_ms": 0.0, "p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0}
+        ms = self.samples[:count] * 1000.0
+        p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+        return {"count": self.n, "mean_ms": float(ms.mean()), "p50_ms": float(p50),
+                "p95_ms": float(p95), "p99_ms": float(p99)}
+
+
+class _Timer:
+    __slots__ = ("metrics", "stage", "start")
+
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.stage, time.perf_counter() - self.start)
+
+
+class Metrics:
+    def __init__(self, window=512):
+        self.window = window
+        self.lock = threading.Lock()
+        self.stages = {}
+        self.counters = {}
+        self.detections = np.zeros(window, np.bool_)
+        self.detection_n = 0
+        self.frame_times = np.zeros(window, np.float64)
+        self.frame_n = 0
+        self.milestones = {}
+        self.started = time.time()
+        self.server = None
+        self.dumper = None
+
+    # --- recording -----------------------------------------------------------
+
+    def observe(self, stage, seconds):
+        with self.lock:
+            hist = self.stages.get(stage)
+            if hist is None:
+                hist = self.stages[stage] = StageHistogram(self.window)
+            hist.observe(seconds)
+
+    def timer(self, stage):
+        return _Timer(self, stage)
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def detection(self, found):
+        """Record whether a hand was found in a frame."""
+        with self.lock:
+            self.detections[self.detection_n % self.window] = bool(found)
+            self.detection_n += 1
+
+    def milestone(self, name, seconds):
+        """Record a one-off duration, e.g. time to the first menu."""
+        with self.lock:
+            self.milestones[name] = seconds
+
+    def frame(self, now=None):
+        """Mark one displayed frame; used for the fps figure."""
+        with self.lock:
+            self.frame_times[self.frame_n % self.window] = time.perf_counter() if now is None else now
+            self.frame_n += 1
+
+    # --- reading ---------------------------------------------------------------
+
+    def fps(self):
+        with self.lock:
+            count = min(self.frame_n, self.window)
+            if count < 2:
+                return 0.0
+            times = self.frame_times[:count]
+            span = times.max() - times.min()
+            return (count - 1) / span if span > 0 else 0.0
+
+    def detection_rate(self):
+        with self.lock:
+            count = min(self.detection_n, self.window)
+            return float(self.detections[:count].mean()) if count else 0.0
+
+    def snapshot(self):
+        fps = self.fps()
+        rate = self.detection_rate()
+        with self.lock:
+            return {
+                "time": time.time(),
+                "uptime_s": time.time() - self.started,
+                "fps": fps,
+                "detection_rate": rate,
+                "counters": dict(self.counters),
+                "milestones": dict(self.milestones),
+                "stages": {name: hist.summary() for name, hist in self.stages.items()},
+            }
+
+    # --- outputs ---------------------------------------------------------------
+
+    def overlay(self, img, origin=(10, 20), color=(255, 0, 255)):
+        """Draws fps, detection rate and per-stage p50/p95 onto img (BGR, RGB or RGBA)."""
+        snap = self.snapshot()
+        lines = ["%.1f fps  hand %.0f%%" % (snap["fps"], 100 * snap["detection_rate"])]
+        for name, s in snap["stages"].items():
+            lines.append("%-10s %5.1f / %5.1f ms" % (name, s["p50_ms"], s["p95_ms"]))
+        for name, value in snap["counters"].items():
+            lines.append("%s %d" % (name, value))
+        x, y = origin
+        for line in lines:
+            cv2.putText(img, line, (x, y), cv2.FONT_HERSHEY_PLAIN, 1, color, 1)
+            y += 16
+        return img
+
+    def dump(self, path):
+        """Writes a snapshot: .json replaces the file, anything else appends a CSV row per stage."""
+        snap = self.snapshot()
+        if path.endswith(".json"):
+            tmp = path + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(snap, f, indent=2)
+            os.replace(tmp, path)
+            return
+        new_file = not os.path.exists(path)
+        with open(path, "a", newline="") as f:
+            writer = csv.writer(f)
+            if new_file:
+                writer.writerow(["time", "stage", "count", "mean_ms", "p50_ms", "p95_ms", "p99_ms",
+                                 "fps", "detection_rate"])
+            for name, s in snap["stages"].items():
+                writer.writerow(["%.3f" % snap["time"], name, s["count"], "%.3f" % s["mean_ms"],
+                                 "%.3f" % s["p50_ms"], "%.3f" % s["p95_ms"], "%.3f" % s["p99_ms"],
+                                 "%.2f" % snap["fps"], "%.3f" % snap["detection_rate"]])
+
+    def start_dump(self, path, interval=10.0):
+        """Dumps periodically from a daemon thread."""
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.dump(path)
+                except OSError as e:
+                    print("metrics dump failed:", e)
+        self.dumper = threading.Thread(target=loop, name="metrics-dump", daemon=True)
+        self.dumper.start()
+
+    def prometheus_text(self):
+        """Prometheus text exposition format."""
+        fps = self.fps()
+        rate = self.detection_rate()
+        out = ["# TYPE painter_fps gauge", "painter_fps %f" % fps,
+               "# TYPE painter_detection_rate gauge", "painter_detection_rate %f" % rate]
+        with self.lock:
+            for name, value in self.counters.items():
+                out.append("# TYPE painter_%s_total counter" % name)
+                out.append("painter_%s_total %d" % (name, value))
+            if self.milestones:
+                out.append("# TYPE painter_startup_seconds gauge")
+            for name, value in self.milestones.items():
+                out.append('painter_startup_seconds{event="%s"} %f' % (name, value))
+            out.append("# TYPE painter_stage_seconds histogram")
+            for name, hist in self.stages.items():
+                cumulative = np.cumsum(hist.buckets)
+                for le, c in zip(BUCKETS, cumulative):
+                    out.append('painter_stage_seconds_bucket{stage="%s",le="%g"} %d' % (name, le, c))
+                out.append('painter_stage_seconds_bucket{stage="%s",le="+Inf"} %d' % (name, hist.n))
+                out.append('painter_stage_seconds_sum{stage="%s"} %f' % (name, hist.total))
+                out.append('painter_stage_seconds_count{stage="%s"} %d' % (name, hist.n))
+        return "\n".join(out) + "\n"
+
+    def serve(self, port=9100, host="127.0.0.1"):
+        """Serves /metrics (Prometheus text) and /metrics.json on a daemon thread."""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.startswith("/metrics.json"):
+                    body, ctype = json.dumps(metrics.snapshot()).encode(), "application/json"
+                elif self.path.startswith("/metrics"):
+                    body, ctype = metrics.prometheus_text().encode(), "text/plain; version=0.0.4"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass  # keep the console quiet
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self.server.serve_forever, name="metrics-http", daemon=True).start()
+        return self.server
+
+
+# Process-wide registry used by handDetector and the painters
+registry = Metrics()
@@ -0,0 +1,83 @@
+"""Frame-budget governor: trades quality for latency under load.
+
+Views report what every frame cost to process: tracking in the service,
+compositing and display. Time spent waiting in queues or for the camera
+is left out, since degrading quality does not shorten it. When the mean
+over a window of frames goes over the budget the governor steps down one
+level, and steps back up after a longer stretch well under it, so it
+does not flap between two levels. Each level keeps the savings of the
+ones before it:
+
+    0 full           everything on
+    1 no-landmarks   the service stops drawing the hand skeleton
+    2 small-infer    inference runs on a half-size frame
+    3 small-display  frames are shown at half resolution, zoomed by Tk
+    4 half-rate      inference on every second frame; the other frames
+                     reuse the last landmarks
+
+Every change is printed and counted (qos_level_changes).
+"""
+import collections
+import threading
+import time
+
+from perfMetrics import registry
+
+LEVELS = ("full", "no-landmarks", "small-infer", "small-display", "half-rate")
+
+
+class QosGovernor:
+    def __init__(self, budget=0.05, window=15, headroom=0.6, hold=90, metrics=None):
+        self.budget = budget  # seconds of processing a frame may take
+        self.window = window  # frames averaged before stepping down
+        self.headroom = headroom  # step up when the mean is under this share of the budget...
+        self.hold = hold  # ...for this many frames
+        self.metrics = metrics if metrics is not None else registry
+        self.costs = collections.deque(maxlen=hold)
+        self.level = 0
+        self.lock = threading.Lock()
+
+    # What the levels mean for the service and the views
+
+    @property
+    def draw_landmarks(self):
+        return self.level < 1
+
+    @property
+    def inference_scale(self):
+        return 0.5 if self.level >= 2 else 1.0
+
+    @property
+    def display_shrink(self):
+        return 2 if self.level >= 3 else 1
+
+    @property
+    def infer_every(self):
+        return 2 if self.level >= 4 else 1
+
+    def record(self, cost):
+        """Add one frame's cost in seconds; returns the (possibly new) level."""
+        with self.lock:
+            self.costs.append(cost)
+            self.metrics.observe("frame_cost", cost)
+            n = len(self.costs)
+            if n >= self.window:
+                recent = sum(list(self.costs)[-self.window:]) / self.window
+                if recent > self.budget and self.level < len(LEVELS) - 1:
+                    self._change(self.level + 1, recent)
+                elif n >= self.hold and self.level > 0 and sum(self.costs) / n < self.headroom * self.budget:
+                    self._change(self.level - 1, sum(self.costs) / n)
+            return self.level
+
+    def _change(self, level, cost):
+        print("qos: %s -> %s (frame cost %.1f ms, budget %.1f ms)" % (
+            LEVELS[self.level], LEVELS[level], cost * 1000, self.budget * 1000))
+        self.level = level
+        # Judge the new level on its own frames
+        self.costs.clear()
+        self.metrics.count("qos_level_changes")
+
+
+def frame_delay(started, period=0.010):
+    """Milliseconds to wait before polling again, minus what this frame took."""
+    return max(1, int((period - (time.perf_counter() - started)) * 1000))
@@ -0,0 +1,291 @@
+"""Runs several painting stations from one machine.
+
+Every source (camera index or video file) is a session with its own
+canvas. Frames are written into shared memory and a pool of worker
+processes, each with warm MediaPipe Hands instances, runs the hand
+tracking. Every session is pinned to one worker (session id % workers),
+so a single tracker sees all of its frames in order. Only small
+task/result tuples cross the process boundary.
+
+Example:
+    python sessionServer.py 0 1 lecture.mp4 --workers 4 --show
+"""
+import argparse
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from collections import deque
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+from framePipeline import StageStats
+from paintingBoard import PaintingBoard
+
+
+def parse_source(text):
+    return int(text) if text.isdigit() else text
+
+
+def _worker(task_q, result_q, detector_options):
+    # Imported here so the parent never pays for loading MediaPipe
+    from handTrackingModule import handDetector
+
+    # One Hands instance per session pinned to this worker keeps MediaPipe's
+    # tracking state apart; the first one is created up front so the model is warm
+    spare = handDetector(**detector_options)
+    detectors = {}
+    blocks = {}
+    while True:
+        task = task_q.get()
+        if task is None:
+            break
+        session_id, block_name, shape, frame_no, captured = task
+        shm = blocks.get(block_name)
+        if shm is None:
+            # Spawned workers share the parent's resource tracker, which
+            # unlinks the block; the worker only maps it
+            shm = shared_memory.SharedMemory(name=block_name)
+            blocks[block_name] = shm
+        img = np.ndarray(shape, np.uint8, buffer=shm.buf)
+
+        detector = detectors.get(session_id)
+        if detector is None:
+            detector = spare if spare is not None else handDetector(**detector_options)
+            spare = None
+            detectors[session_id] = detector
+        detector.findHands(img, draw=False)
+        landmarks, handedness, _ = detector.findLandmarks(img)
+        result_q.put((session_id, block_name, frame_no, captured, landmarks, handedness,
+                      detector.stageTimes["inference"]))
+
+    for shm in blocks.values():
+        shm.close()
+
+
+class Session:
+    """One station: a source, its shared frame slots and its canvas."""
+
+    def __init__(self, session_id, source, slots=2):
+        self.id = session_id
+        self.source = source
+        self.live = isinstance(source, int)
+        self.cap = cv2.VideoCapture(source)
+        self.slots = slots
+        self.blocks = {}
+        self.free = deque()
+        self.lock = threading.Lock()
+        self.slot_freed = threading.Condition(self.lock)
+        self.board = None
+        self.shape = None
+        self.frame_no = 0
+        self.applied = -1
+        self.in_flight = 0
+        self.dropped = 0
+        self.stale = 0
+        self.finished = False
+        self.stats = StageStats("session-%d" % session_id)
+        self.inference = StageStats("inference-%d" % session_id)
+        self.latest = None
+
+    def allocate(self, shape):
+        self.shape = shape
+        size = int(np.prod(shape))
+        for _ in range(self.slots):
+            shm = shared_memory.SharedMemory(create=True, size=size)
+            self.blocks[shm.name] = shm
+            self.free.append(shm.name)
+        self.board = PaintingBoard(shape[1], shape[0])
+
+    def view(self, block_name):
+        return np.ndarray(self.shape, np.uint8, buffer=self.blocks[block_name].buf)
+
+    def release(self, block_name):
+        with self.lock:
+            self.free.append(block_name)
+            self.in_flight -= 1
+            self.slot_freed.notify()
+
+    def close(self):
+        self.cap.release()
+        for shm in self.blocks.values():
+            shm.close()
+            shm.unlink()
+        self.blocks = {}
+
+
+class SessionServer:
+    def __init__(self, sources, workers=None, mode="cam", detector_options=None, slots=2):
+        self.sessions = [Session(i, src, slots) for i, src in enumerate(sources)]
+        # A session never spans workers, so more workers than sessions would idle
+        self.workers = min(workers or max(1, (os.cpu_count() or 2) - 1), len(self.sessions))
+        self.mode = mode
+        self.detector_options = detector_options or {}
+        ctx = mp.get_context("spawn")
+        # One task queue per worker; a session's frames always go to the same one
+        self.task_qs = [ctx.Queue() for _ in range(self.workers)]
+        self.result_q = ctx.Queue()
+        self.procs = [ctx.Process(target=_worker, args=(task_q, self.result_q, self.detector_options),
+                                  daemon=True) for task_q in self.task_qs]
+        self.threads = []
+        self.running = False
+
+    def start(self):
+        self.running = True
+        for p in self.procs:
+            p.start()
+        for session in self.sessions:
+            t = threading.Thread(target=self._capture, args=(session,), daemon=True)
+            self.threads.append(t)
+            t.start()
+        t = threading.Thread(target=self._collect, daemon=True)
+        self.threads.append(t)
+        t.start()
+
+    def _capture(self, session):
+        task_q = self.task_qs[session.id % self.workers]
+        while self.running:
+            success, frame = session.cap.read()
+            if not success:
+                break
+            captured = time.perf_counter()
+            if session.shape is None:
+                session.allocate(frame.shape)
+            with session.lock:
+                if not session.free:
+                    if session.live:
+                        # Workers are behind: skip this camera frame
+                        session.dropped += 1
+                        continue
+                    # Video files wait so that no frame is skipped
+                    while not session.free and self.running:
+                        session.slot_freed.wait(0.1)
+                    if not self.running:
+                        break
+                block_name = session.free.popleft()
+                session.in_flight += 1
+            # Mirror straight into shared memory; no extra copy or pickling
+            cv2.flip(frame, 1, dst=session.view(block_name))
+            task_q.put((session.id, block_name, session.shape, session.frame_no, captured))
+            session.frame_no += 1
+        # Let in-flight frames come back before reporting the session as done
+        with session.lock:
+            while session.in_flight and self.running:
+                session.slot_freed.wait(0.1)
+        session.finished = True
+
+    def _collect(self):
+        while self.running:
+            try:
+                result = self.result_q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            session_id, block_name, frame_no, captured, landmarks, handedness, infer_s = result
+            session = self.sessions[session_id]
+            finished = time.perf_counter()
+            if frame_no < session.applied:
+                # Cannot happen while a session stays on one worker; kept as a guard
+                session.stale += 1
+                session.release(block_name)
+                continue
+            session.applied = frame_no
+            img = session.view(block_name)
+            board = session.board
+            if self.mode == "cam":
+                frame = img.copy()
+                board.stroke_hands(landmarks, handedness, frame, t=captured)
+                session.latest = board.compose_cam(frame)
+            else:
+                board.stroke_hands(landmarks, handedness, t=captured)
+                session.latest = board.compose_board()
+            session.release(block_name)
+            session.stats.record(captured, finished)
+            session.inference.record(finished - infer_s, finished)
+
+    def done(self):
+        return all(s.finished for s in self.sessions)
+
+    def report(self):
+        rows = {}
+        for s in self.sessions:
+            snap = s.stats.snapshot()
+            rows[s.id] = {
+                "source": s.source,
+                "fps": snap["fps"],
+                "latency_ms": snap["avg_ms"],
+                "inference_ms": s.inference.snapshot()["avg_ms"],
+                "queue_depth": s.in_flight,
+                "dropped": s.dropped,
+                "stale": s.stale,
+            }
+        return rows
+
+    def format_report(self):
+        lines = []
+        for sid, r in self.report().items():
+            lines.append("session %d (%s): %.1f fps, latency %.1f ms, inference %.1f ms, "
+                         "queue %d, dropped %d, stale %d" % (
+                             sid, r["source"], r["fps"], r["latency_ms"], r["inference_ms"],
+                             r["queue_depth"], r["dropped"], r["stale"]))
+        return "\n".join(lines)
+
+    def stop(self):
+        self.running = False
+        for t in self.threads:
+            t.join(timeout=1.0)
+        for task_q in self.task_qs:
+            task_q.put(None)
+        for p in self.procs:
+            p.join(timeout=2.0)
+            if p.is_alive():
+                p.terminate()
+        for s in self.sessions:
+            s.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve several painting sessions from one machine")
+    parser.add_argument("sources", nargs="+", help="camera indexes or video files, one per session")
+    parser.add_argument("--workers", type=int, default=None, help="inference processes (default: cores - 1)")
+    parser.add_argument("--mode", choices=["cam", "board"], default="cam")
+    parser.add_argument("--model-complexity", type=int, default=1, choices=[0, 1])
+    parser.add_argument("--report", type=float, default=5.0, help="seconds between reports")
+    parser.add_argument("--show", action="store_true", help="open one window per session")
+    parser.add_argument("--save-dir", help="write each session's canvas here on exit")
+    args = parser.parse_args()
+
+    server = SessionServer([parse_source(s) for s in args.sources], args.workers, args.mode,
+                           {"modelComplexity": args.model_complexity})
+    server.start()
+    last_report = time.time()
+    try:
+        while not server.done():
+            if args.show:
+                for s in server.sessions:
+                    if s.latest is not None:
+                        cv2.imshow("session %d" % s.id, s.latest)
+                if cv2.waitKey(1) == ord('q'):
+                    break
+            else:
+                time.sleep(0.05)
+            if time.time() - last_report > args.report:
+                print(server.format_report())
+                last_report = time.time()
+    except KeyboardInterrupt:
+        pass
+    print(server.format_report())
+    if args.save_dir:
+        os.makedirs(args.save_dir, exist_ok=True)
+        for s in server.sessions:
+            if s.board is not None:
+                cv2.imwrite(os.path.join(args.save_dir, "session_%d.png" % s.id), s.board.compose_board())
+    server.stop()
+    if args.show:
+        cv2.destroyAllWindows()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,436 @@
+"""Streams the painter to remote viewers (classroom screens, laptops).
+
+An asyncio server on its own thread serves:
+
+    /             page showing the MJPEG stream
+    /stream.mjpg  multipart/x-mixed-replace JPEG stream
+    /snapshot.jpg the next frame as a single JPEG
+    /board.jpg    the next board view as a single JPEG
+    /strokes      page that draws stroke deltas from /ws on a canvas
+    /ws           WebSocket with stroke deltas (JSON)
+
+The painting loop calls publish() with each composite. When nobody
+watches that returns at once; otherwise it copies the frame for an
+encoder thread, which JPEG-encodes the newest frame once and hands the
+bytes to the event loop to write to every client. A client whose socket
+still holds part of an earlier frame skips frames until it has caught
+up, so slow viewers always get the latest frame and never a backlog.
+
+Stroke deltas are for the board view: PaintingBoard calls
+publish_strokes() with the segments it draws, and with None when the
+drawing changed otherwise (undo, erase, clear, pan). A delta viewer then
+reloads /board.jpg and carries on with the segments. Its keyframes come
+from publish_board(), which the painter calls with compose_board() while
+board_wanted is set, whichever view the stream itself shows.
+
+The server binds to 127.0.0.1 unless given another host ("0.0.0.0" for
+every interface), since the stream has no authentication.
+
+    stream = StreamServer(8080).start()
+    stream.publish(board.compose_cam(frame))
+    if stream.board_wanted:
+        stream.publish_board(board.compose_board())
+"""
+import asyncio
+import base64
+import hashlib
+import json
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from perfMetrics import registry
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+# Viewers only send pings and the close frame; anything longer is dropped
+# before it is read
+MAX_WS_PAYLOAD = 125
+
+INDEX_PAGE = b"""<!doctype html>
+<title>Papan Virtual</title>
+<style>body{margin:0;background:#000}img{width:100vw;height:100vh;object-fit:contain}</style>
+<img src="/stream.mjpg">
+"""
+
+STROKES_PAGE = b"""<!doctype html>
+<title>Papan Virtual</title>
+<style>body{margin:0;background:#fff}canvas{width:100vw;height:100vh;object-fit:contain}</style>
+<canvas id="board"></canvas>
+<script>
+const board = document.getElementById("board"), g = board.getContext("2d");
+let loading = false, pending = [];
+function draw(segments) {
+  g.lineCap = "round";
+  for (const [x0, y0, x1, y1, color, width, eraser] of segments) {
+    g.strokeStyle = eraser ? "#fff" : color;
+    g.lineWidth = width;
+    g.beginPath(); g.moveTo(x0, y0); g.lineTo(x1, y1); g.stroke();
+  }
+}
+function keyframe() {
+  loading = true;
+  const img = new Image();
+  img.onload = () => {
+    board.width = img.width; board.height = img.height;
+    g.drawImage(img, 0, 0);
+    // Segments that arrived meanwhile; drawing one twice does no harm
+    pending.forEach(draw); pending = []; loading = false;
+  };
+  img.src = "/board.jpg?" + Date.now();
+}
+const ws = new WebSocket((location.protocol == "https:" ? "wss://" : "ws://") + location.host + "/ws");
+ws.onmessage = (e) => {
+  const m = JSON.parse(e.data);
+  if (m.type == "reset") keyframe();
+  else if (loading) pending.push(m.segments);
+  else draw(m.segments);
+};
+keyframe();
+</script>
+"""
+
+
+def ws_frame(payload, opcode=0x1):
+    """One unmasked, unfragmented WebSocket frame (server to client)."""
+    n = len(payload)
+    if n < 126:
+        header = bytes((0x80 | opcode, n))
+    elif n < 1 << 16:
+        header = bytes((0x80 | opcode, 126)) + n.to_bytes(2, "big")
+    else:
+        header = bytes((0x80 | opcode, 127)) + n.to_bytes(8, "big")
+    return header + payload
+
+
+def hex_color(bgr):
+    b, g, r = (int(c) for c in bgr[:3])
+    return "#%02x%02x%02x" % (r, g, b)
+
+
+class _Client:
+    __slots__ = ("writer", "since", "skipped", "resync")
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.since = time.perf_counter()  # last time its socket buffer was empty
+        self.skipped = 0
+        self.resync = False
+
+
+class StreamServer:
+    def __init__(self, port=8080, host="127.0.0.1", quality=80, max_fps=30.0, write_timeout=5.0):
+        self.port = port
+        self.host = host
+        self.quality = quality
+        self.interval = 1.0 / max_fps if max_fps else 0.0
+        self.write_timeout = write_timeout  # drop a client stuck this long
+        self.loop = None
+        self.server = None
+        self.running = False
+        self.thread = None
+        self.encoder = None
+
+        # Painting thread -> encoder thread: newest frame only
+        self.lock = threading.Lock()
+        self.latest = None
+        self.latest_board = None
+        self.pending = threading.Event()
+        self.last_publish = 0.0
+
+        # Event loop state
+        self.mjpeg_clients = []
+        self.ws_clients = []
+        self.keyframe_wanted = False
+        self.board_wanted = False  # a delta viewer waits for a board keyframe
+        self.reset_pending = False
+        self.jpeg = None
+        self.board_jpeg = None
+        self.seq = 0
+        self.frame_event = None
+        self.board_event = None
+
+    # --- painting thread --------------------------------------------------------
+
+    @property
+    def clients(self):
+        return len(self.mjpeg_clients) + len(self.ws_clients)
+
+    def publish(self, img):
+        """Offer a BGR frame to the viewers; cheap when nobody needs one."""
+        if not (self.mjpeg_clients or self.keyframe_wanted):
+            return False
+        now = time.perf_counter()
+        if now - self.last_publish < self.interval:
+            return False
+        self.last_publish = now
+        # The painter reuses its buffers; the encoder gets its own copy
+        frame = img.copy()
+        with self.lock:
+            self.latest = frame
+        self.pending.set()
+        return True
+
+    def publish_board(self, img):
+        """Offer the board view as the keyframe for delta viewers, if one is wanted."""
+        if not self.board_wanted:
+            return False
+        frame = img.copy()
+        with self.lock:
+            self.latest_board = frame
+        self.pending.set()
+        return True
+
+    def publish_strokes(self, segments):
+        """Send segments [(x0, y0, x1, y1, bgr, thickness, eraser)] to delta viewers.
+
+        None means the drawing changed in another way and viewers reload it.
+        """
+        if not self.ws_clients or self.loop is None:
+            return
+        if segments is None:
+            self.loop.call_soon_threadsafe(self._request_reset)
+            return
+        message = json.dumps({"type": "strokes", "segments": [
+            (int(x0), int(y0), int(x1), int(y1), hex_color(color), int(thickness), bool(eraser))
+            for x0, y0, x1, y1, color, thickness, eraser in segments]})
+        # Encoded once for every viewer
+        self.loop.call_soon_threadsafe(self._send_strokes, ws_frame(message.encode()))
+
+    # --- lifecycle ----------------------------------------------------------------
+
+    def start(self):
+        self.running = True
+        started = threading.Event()
+        self.thread = threading.Thread(target=self._run, args=(started,), name="stream-server", daemon=True)
+        self.thread.start()
+        started.wait(5.0)
+        self.encoder = threading.Thread(target=self._encode_loop, name="stream-encoder", daemon=True)
+        self.encoder.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        self.pending.set()
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self._shutdown)
+        if self.thread is not None:
+            self.thread.join(timeout=2.0)
+        if self.encoder is not None:
+            self.encoder.join(timeout=2.0)
+
+    def _run(self, started):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.frame_event = asyncio.Event()
+        self.board_event = asyncio.Event()
+        try:
+            self.server = self.loop.run_until_complete(
+                asyncio.start_server(self._handle, self.host, self.port))
+            # Port 0 picks a free one
+            self.port = self.server.sockets[0].getsockname()[1]
+        except OSError as e:
+            print("stream server failed to start:", e)
+            self.running = False
+            started.set()
+            return
+        started.set()
+        self.loop.run_forever()
+        self.loop.close()
+
+    def _shutdown(self):
+        self.server.close()
+        for client in self.mjpeg_clients + self.ws_clients:
+            client.writer.close()
+        self.frame_event.set()
+        self.board_event.set()
+        self.loop.stop()
+
+    # --- encoder thread -------------------------------------------------------------
+
+    def _encode_loop(self):
+        params = [cv2.IMWRITE_JPEG_QUALITY, self.quality]
+        while self.running:
+            if not self.pending.wait(0.5):
+                continue
+            self.pending.clear()
+            with self.lock:
+                frame, self.latest = self.latest, None
+                board, self.latest_board = self.latest_board, None
+            if self.loop is None:
+                continue
+            for img, send in ((frame, self._send_frame), (board, self._send_board)):
+                if img is None:
+                    continue
+                with registry.timer("stream_encode"):
+                    success, jpeg = cv2.imencode(".jpg", img, params)
+                if success:
+                    self.loop.call_soon_threadsafe(send, jpeg.tobytes())
+
+    # --- event loop: fan-out ----------------------------------------------------------
+
+    def _writable(self, client, clients):
+        """True if the client's socket buffer is empty; drops clients stuck too long."""
+        now = time.perf_counter()
+        if client.writer.transport.get_write_buffer_size() == 0:
+            client.since = now
+            return True
+        if now - client.since > self.write_timeout:
+            clients.remove(client)
+            client.writer.close()
+        return False
+
+    def _send_frame(self, jpeg):
+        self.jpeg = jpeg
+        self.seq += 1
+        self.keyframe_wanted = False
+        part = b"--frame\r\nContent-Type: image/jpeg\r\nContent-Length: %d\r\n\r\n" % len(jpeg)
+        skipped = 0
+        for client in list(self.mjpeg_clients):
+            if self._writable(client, self.mjpeg_clients):
+                client.writer.writelines((part, jpeg, b"\r\n"))
+            else:
+                # Still sending an older frame: this one is skipped
+                client.skipped += 1
+                skipped += 1
+        if skipped:
+            registry.count("stream_skipped_frames", skipped)
+        event, self.frame_event = self.frame_event, asyncio.Event()
+        event.set()
+
+    def _send_board(self, jpeg):
+        self.board_jpeg = jpeg
+        self.board_wanted = False
+        if self.reset_pending:
+            # The drawing changed; this board view is the new keyframe
+            self.reset_pending = False
+            self._send_ws(ws_frame(b'{"type": "reset"}'))
+        event, self.board_event = self.board_event, asyncio.Event()
+        event.set()
+
+    def _request_reset(self):
+        self.reset_pending = True
+        self.board_wanted = True
+
+    def _send_strokes(self, message):
+        if not self.reset_pending:
+            self._send_ws(message)
+
+    def _send_ws(self, message):
+        for client in list(self.ws_clients):
+            if self._writable(client, self.ws_clients):
+                if client.resync:
+                    # It missed deltas while behind; have it reload the board
+                    client.resync = False
+                    client.writer.write(ws_frame(b'{"type": "reset"}'))
+                    self.board_wanted = True
+                else:
+                    client.writer.write(message)
+            else:
+                client.resync = True
+
+    # --- event loop: connections ------------------------------------------------------
+
+    async def _handle(self, reader, writer):
+        try:
+            request = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), 10.0)
+            lines = request.decode("latin-1").split("\r\n")
+            method, target, _ = lines[0].split(" ", 2)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            writer.close()
+            return
+        headers = {}
+        for line in lines[1:]:
+            name, sep, value = line.partition(":")
+            if sep:
+                headers[name.strip().lower()] = value.strip()
+        path = target.split("?", 1)[0]
+
+        try:
+            if method != "GET":
+                self._respond(writer, b"405 Method Not Allowed", b"text/plain", b"GET only\n")
+            elif path == "/":
+                self._respond(writer, b"200 OK", b"text/html", INDEX_PAGE)
+            elif path == "/strokes":
+                self._respond(writer, b"200 OK", b"text/html", STROKES_PAGE)
+            elif path == "/snapshot.jpg":
+                self.keyframe_wanted = True
+                await asyncio.wait_for(self.frame_event.wait(), 5.0)
+                self._respond(writer, b"200 OK", b"image/jpeg", self.jpeg or b"")
+            elif path == "/board.jpg":
+                self.board_wanted = True
+                await asyncio.wait_for(self.board_event.wait(), 5.0)
+                self._respond(writer, b"200 OK", b"image/jpeg", self.board_jpeg or b"")
+            elif path == "/stream.mjpg":
+                await self._serve_mjpeg(reader, writer)
+            elif path == "/ws" and headers.get("upgrade", "").lower() == "websocket":
+                await self._serve_ws(reader, writer, headers)
+            else:
+                self._respond(writer, b"404 Not Found", b"text/plain", b"not found\n")
+            await writer.drain()
+        except (ConnectionError, asyncio.TimeoutError):
+            pass
+        finally:
+            writer.close()
+
+    def _respond(self, writer, status, ctype, body):
+        writer.write(b"HTTP/1.1 %s\r\nContent-Type: %s\r\nContent-Length: %d\r\n"
+                     b"Cache-Control: no-cache\r\nConnection: close\r\n\r\n" % (status, ctype, len(body)))
+        writer.write(body)
+
+    async def _serve_mjpeg(self, reader, writer):
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: multipart/x-mixed-replace; boundary=frame\r\n"
+                     b"Cache-Control: no-cache\r\nConnection: close\r\n\r\n")
+        client = _Client(writer)
+        self.mjpeg_clients.append(client)
+        try:
+            # Frames are written by _send_frame; wait for the viewer to leave
+            while self.running and await reader.read(1024):
+                pass
+        finally:
+            if client in self.mjpeg_clients:
+                self.mjpeg_clients.remove(client)
+
+    async def _serve_ws(self, reader, writer, headers):
+        key = headers.get("sec-websocket-key", "")
+        accept = base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest())
+        writer.write(b"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                     b"Sec-WebSocket-Accept: %s\r\n\r\n" % accept)
+        client = _Client(writer)
+        self.ws_clients.append(client)
+        try:
+            while self.running:
+                # Viewers send nothing but pings and the close frame
+                head = await reader.readexactly(2)
+                opcode, n = head[0] & 0x0F, head[1] & 0x7F
+                if n == 126:
+                    n = int.from_bytes(await reader.readexactly(2), "big")
+                elif n == 127:
+                    n = int.from_bytes(await reader.readexactly(8), "big")
+                if n > MAX_WS_PAYLOAD:
+                    # 1009: message too big
+                    writer.write(ws_frame((1009).to_bytes(2, "big"), 0x8))
+                    await writer.drain()
+                    break
+                mask = await reader.readexactly(4) if head[1] & 0x80 else b"\0\0\0\0"
+                data = np.frombuffer(await reader.readexactly(n), np.uint8)
+                payload = (data ^ np.resize(np.frombuffer(mask, np.uint8), n)).tobytes()
+                if opcode == 0x8:
+                    writer.write(ws_frame(b"", 0x8))
+                    break
+                if opcode == 0x9:
+                    writer.write(ws_frame(payload, 0xA))
+        except asyncio.IncompleteReadError:
+            pass
+        finally:
+            if client in self.ws_clients:
+                self.ws_clients.remove(client)
+
+    def report(self):
+        return {
+            "mjpeg_clients": len(self.mjpeg_clients),
+            "ws_clients": len(self.ws_clients),
+            "frames": self.seq,
+            "skipped": sum(c.skipped for c in self.mjpeg_clients),
+        }
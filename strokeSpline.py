@@ -0,0 +1,211 @@
+"""Curved strokes from sparse fingertip samples.
+
+At 10-15 inference frames per second a fast stroke gets only a few
+samples, and joining them with straight lines shows the corners.
+StrokeSpline fits a centripetal Catmull-Rom spline through the samples of
+a pen instead and hands out the curve as short line pieces, about
+`spacing` pixels apart, so the painting code keeps drawing plain segments.
+
+Centripetal knots (alpha 0.5) keep the curve from looping or overshooting
+at sharp turns and uneven sample spacing, which uniform Catmull-Rom does.
+A Catmull-Rom piece needs the sample after its end, so the curve runs one
+sample behind the fingertip; finish() draws the rest when the pen lifts.
+Samples further apart in time than max_gap are not curved into each
+other (the hand was lost in between).
+
+centripetal() evaluates any number of pieces in one batch of NumPy
+operations: the same code does one piece per frame and whole strokes.
+
+Compare with straight segments on a sampled figure eight:
+    python strokeSpline.py --fps 12
+"""
+import argparse
+import time
+
+import numpy as np
+
+NO_POINTS = np.zeros((0, 2), np.int32)
+
+
+def centripetal(p0, p1, p2, p3, counts, alpha=0.5):
+    """Points on the Catmull-Rom pieces p1 -> p2 (arrays of shape (m, 2)).
+
+    counts[i] points per piece, evenly spaced in the spline parameter,
+    ending at p2; the start p1 is not included. p0 and p3 are the samples
+    before and after the piece.
+    """
+    p = np.stack([p0, p1, p2, p3], axis=1).astype(np.float64)
+    counts = np.asarray(counts, np.intp)
+    # Sample steps and knot intervals (distance ** alpha, kept apart for
+    # repeated samples), as (m, 3, 1)
+    steps = p[:, 1:] - p[:, :-1]
+    dt = np.maximum(np.einsum("mki,mki->mk", steps, steps) ** (alpha / 2), 1e-6)[:, :, None]
+    # Tangents at p1 and p2 over the piece's knot interval: the same curve
+    # as the Barry-Goldman pyramid, written as a cubic Hermite piece
+    v = steps / dt
+    m1 = (v[:, 1] + (v[:, 0] - v[:, 1]) * dt[:, 1] / (dt[:, 0] + dt[:, 1])) * dt[:, 1]
+    m2 = (v[:, 1] + (v[:, 2] - v[:, 1]) * dt[:, 1] / (dt[:, 1] + dt[:, 2])) * dt[:, 1]
+    c2 = 3 * steps[:, 1] - 2 * m1 - m2
+    c3 = m1 + m2 - 2 * steps[:, 1]
+    coef = np.stack([c3, c2, m1, p[:, 1]], axis=1)
+
+    # One row per output point: its piece's coefficients and its fraction of the piece
+    piece = np.repeat(np.arange(len(p)), counts)
+    starts = np.repeat(np.cumsum(counts) - counts, counts)
+    s = ((np.arange(len(piece)) - starts + 1) / np.repeat(counts, counts))[:, None]
+    c = coef[piece]
+    return ((c[:, 0] * s + c[:, 1]) * s + c[:, 2]) * s + c[:, 3]
+
+
+def point_counts(p1, p2, spacing, max_points):
+    """Points per piece for about one every spacing pixels along the chord."""
+    chord = np.hypot(*(np.asarray(p2, np.float64) - p1).T)
+    return np.clip(np.ceil(chord / spacing), 1, max_points).astype(np.intp)
+
+
+def interpolate(points, spacing=4.0, max_points=32, alpha=0.5):
+    """Whole polyline (n, 2) as a spline, all pieces in one batch; float (k, 2)."""
+    points = np.asarray(points, np.float64)
+    if len(points) < 3:
+        return points
+    # Mirrored samples stand in for the missing neighbors at the ends
+    padded = np.concatenate([[2 * points[0] - points[1]], points, [2 * points[-1] - points[-2]]])
+    counts = point_counts(points[:-1], points[1:], spacing, max_points)
+    curve = centripetal(padded[:-3], padded[1:-2], padded[2:-1], padded[3:], counts, alpha)
+    return np.concatenate([points[:1], curve])
+
+
+def pairs(points):
+    """(x0, y0, x1, y1) line pieces along an integer polyline."""
+    xy = points.tolist()
+    return [(x0, y0, x1, y1) for (x0, y0), (x1, y1) in zip(xy[:-1], xy[1:])]
+
+
+class StrokeSpline:
+    """Spline state of one pen: add() every sample, finish() when the pen lifts."""
+
+    def __init__(self, spacing=4.0, max_points=32, max_gap=0.25, alpha=0.5):
+        self.spacing = spacing  # pixels between the points handed out
+        self.max_points = max_points  # per piece, for very fast moves
+        self.max_gap = max_gap  # seconds; samples further apart are joined straight
+        self.alpha = alpha
+        self.samples = []  # the last samples, up to 4, as float (x, y)
+        self.started = False  # the first piece was handed out
+        self.last_t = None
+
+    def reset(self):
+        self.samples = []
+        self.started = False
+        self.last_t = None
+
+    def add(self, x, y, t=None):
+        """Adds a sample; returns the integer polyline (k, 2) that became final, maybe empty.
+
+        Consecutive results join up: each starts where the one before ended.
+        """
+        out = NO_POINTS
+        if t is not None:
+            if self.last_t is not None and t - self.last_t > self.max_gap and self.samples:
+                # Draw up to the last sample and start over from it
+                last = self.samples[-1]
+                out = self.finish()
+                self.samples = [last]
+            self.last_t = t
+        s = self.samples
+        s.append(np.array((x, y), np.float64))
+        if len(s) == 3 and not self.started:
+            # First piece: a mirrored sample stands in for the one before
+            self.started = True
+            return self._join(out, self._piece(2 * s[0] - s[1], s[0], s[1], s[2]))
+        if len(s) == 4:
+            piece = self._piece(*s)
+            s.pop(0)
+            return self._join(out, piece)
+        return out
+
+    def finish(self):
+        """The rest of the stroke, up to the last sample; then starts over."""
+        s = self.samples
+        out = NO_POINTS
+        if len(s) >= 2:
+            b, c = s[-2], s[-1]
+            a = s[-3] if len(s) >= 3 else 2 * b - c
+            out = self._piece(a, b, c, 2 * c - b)
+        self.reset()
+        return out
+
+    def _piece(self, a, b, c, d):
+        counts = point_counts(b[None], c[None], self.spacing, self.max_points)
+        curve = centripetal(a[None], b[None], c[None], d[None], counts, self.alpha)
+        points = np.rint(np.concatenate([b[None], curve])).astype(np.int32)
+        # Rounding can repeat a point; zero-length pieces draw nothing useful
+        keep = np.ones(len(points), bool)
+        keep[1:] = np.any(points[1:] != points[:-1], axis=1)
+        points = points[keep]
+        return points if len(points) >= 2 else NO_POINTS
+
+    @staticmethod
+    def _join(first, second):
+        if not len(first):
+            return second
+        if not len(second):
+            return first
+        return np.concatenate([first, second[1:]])
+
+
+# --- benchmark ------------------------------------------------------------------------
+
+def figure_eight(times, center=(320, 240), size=(200, 120), period=1.2):
+    """A fast figure-eight stroke (one loop per period seconds) at the given times."""
+    w = 2 * np.pi * np.asarray(times) / period
+    return np.stack([center[0] + size[0] * np.sin(w), center[1] + size[1] * np.sin(2 * w)], axis=1)
+
+
+def deviation(polyline, truth):
+    """Mean and largest distance (pixels) of a polyline, walked in 1 px steps, from the true curve."""
+    polyline = np.asarray(polyline, np.float64)
+    steps = [np.linspace(a, b, max(int(np.hypot(*(b - a))), 1), endpoint=False)
+             for a, b in zip(polyline[:-1], polyline[1:])]
+    walked = np.concatenate(steps + [polyline[-1:]])
+    dist = np.sqrt(((walked[:, None, :] - truth[None, :, :]) ** 2).sum(axis=2)).min(axis=1)
+    return float(dist.mean()), float(dist.max())
+
+
+def benchmark(fps=12, reference_fps=60, duration=1.2, repeat=200):
+    truth = figure_eight(np.linspace(0, duration, 4000))
+    result = {}
+    for name, rate in (("straight %d fps" % reference_fps, reference_fps), ("straight %d fps" % fps, fps)):
+        samples = figure_eight(np.arange(0, duration, 1.0 / rate))
+        result[name] = deviation(np.rint(samples), truth)
+
+    times = np.arange(0, duration, 1.0 / fps)
+    samples = np.rint(figure_eight(times))
+    spline = StrokeSpline()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        pieces = [spline.add(x, y, t) for (x, y), t in zip(samples.tolist(), times.tolist())]
+        pieces.append(spline.finish())
+    per_sample = (time.perf_counter() - started) / (repeat * len(times)) * 1e6
+    curve = pieces[0]
+    for piece in pieces[1:]:
+        curve = StrokeSpline._join(curve, piece)
+    result["spline %d fps" % fps] = deviation(curve, truth)
+
+    started = time.perf_counter()
+    for _ in range(repeat):
+        interpolate(samples)
+    whole = (time.perf_counter() - started) / repeat * 1e6
+    return result, per_sample, whole, len(samples)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Spline vs straight segments on a sampled stroke")
+    parser.add_argument("--fps", type=int, default=12, help="inference rate the stroke is sampled at")
+    parser.add_argument("--reference-fps", type=int, default=60)
+    args = parser.parse_args()
+    result, per_sample, whole, n = benchmark(args.fps, args.reference_fps)
+    print("distance from the true stroke (pixels):")
+    for name, (mean, worst) in result.items():
+        print("  %-18s mean %5.2f  max %6.2f" % (name, mean, worst))
+    print("StrokeSpline.add   %6.1f us/sample" % per_sample)
+    print("interpolate()      %6.1f us for the whole stroke (%d samples)" % (whole, n))
@@ -0,0 +1,344 @@
+import time
+
+import cv2
+import numpy as np
+
+
+class StrokeStore:
+    """Vector model of everything drawn on a board.
+
+    Points of finished strokes live in one packed float32 buffer; each stroke
+    is a slice of it with its color, width, eraser flag, per-point
+    timestamps (seconds since the store was created) and per-point widths
+    (the brush engine varies the width along a stroke; otherwise all of a
+    stroke's points have its width). Strokes still being
+    drawn keep their own small buffer, so several pens can draw at once.
+
+    A uniform grid maps cells to the strokes passing through them, so hit
+    tests only look at strokes near the query point. Undo and redo are
+    stacks of actions; undoing only flips visibility flags.
+    """
+
+    def __init__(self, width, height, cell=64):
+        # Size of the coordinate space the points are recorded in
+        self.width = width
+        self.height = height
+        self.cell = cell
+        self.t0 = time.perf_counter()
+
+        self.points = np.empty((4096, 2), np.float32)
+        self.times = np.empty(4096, np.float32)
+        self.sizes = np.empty(4096, np.float32)
+        self.n_points = 0
+
+        # Per-stroke columns
+        self.start = []
+        self.end = []
+        self.color = []
+        self.width_px = []
+        self.eraser = []
+        self.visible = []
+
+        self.open = {}  # stroke id -> list of (x, y, t, width) while being drawn
+        self.grid = {}  # (cx, cy) -> set of stroke ids
+        self.undo_stack = []
+        self.redo_stack = []
+        # Bumped on every change, so savers can skip unchanged stores
+        self.revision = 0
+
+    def __len__(self):
+        return len(self.start)
+
+    # --- recording --------------------------------------------------------
+
+    def begin(self, x, y, color, width, eraser=False, t=None, size=None):
+        """Start a stroke at (x, y) and return its id; size is the width at this point."""
+        sid = len(self.start)
+        self.start.append(0)
+        self.end.append(0)
+        self.color.append(tuple(int(c) for c in color))
+        self.width_px.append(int(width))
+        self.eraser.append(bool(eraser))
+        self.visible.append(True)
+        size = float(width if size is None else size)
+        self.open[sid] = [(float(x), float(y), self._now(t), size)]
+        self._index(sid, x, y, x, y, size)
+        self.undo_stack.append(("add", [sid]))
+        self.redo_stack.clear()
+        self.revision += 1
+        return sid
+
+    def add_point(self, sid, x, y, t=None, size=None):
+        pts = self.open[sid]
+        px, py, _, psize = pts[-1]
+        size = float(self.width_px[sid] if size is None else size)
+        pts.append((float(x), float(y), self._now(t), size))
+        self._index(sid, px, py, x, y, max(size, psize))
+        self.revision += 1
+
+    def finish(self, sid):
+        """Move an open stroke into the packed buffer."""
+        pts = self.open.pop(sid, None)
+        if pts is None:
+            return
+        n = len(pts)
+        self._reserve(n)
+        arr = np.asarray(pts, np.float32)
+        i = self.n_points
+        self.points[i:i + n] = arr[:, :2]
+        self.times[i:i + n] = arr[:, 2]
+        self.sizes[i:i + n] = arr[:, 3]
+        self.start[sid], self.end[sid] = i, i + n
+        self.n_points += n
+
+    def stroke_points(self, sid):
+        if sid in self.open:
+            return np.asarray(self.open[sid], np.float32)[:, :2]
+        return self.points[self.start[sid]:self.end[sid]]
+
+    def stroke_times(self, sid):
+        if sid in self.open:
+            return np.asarray(self.open[sid], np.float32)[:, 2]
+        return self.times[self.start[sid]:self.end[sid]]
+
+    def stroke_sizes(self, sid):
+        if sid in self.open:
+            return np.asarray(self.open[sid], np.float32)[:, 3]
+        return self.sizes[self.start[sid]:self.end[sid]]
+
+    # --- undo / redo / erase -----------------------------------------------
+
+    def undo(self):
+        """Undo the last action; returns the affected stroke ids."""
+        if not self.undo_stack:
+            return []
+        kind, sids = self.undo_stack.pop()
+        for sid in sids:
+            self.finish(sid)
+            self.visible[sid] = kind != "add"
+        self.redo_stack.append((kind, sids))
+        self.revision += 1
+        return sids
+
+    def redo(self):
+        if not self.redo_stack:
+            return []
+        kind, sids = self.redo_stack.pop()
+        for sid in sids:
+            self.visible[sid] = kind == "add"
+        self.undo_stack.append((kind, sids))
+        self.revision += 1
+        return sids
+
+    def erase_at(self, x, y, radius):
+        """Remove whole strokes under a circle; returns their ids (undoable)."""
+        sids = [sid for sid in self.hit_test(x, y, radius) if sid not in self.open]
+        if sids:
+            for sid in sids:
+                self.visible[sid] = False
+            self.undo_stack.append(("remove", sids))
+            self.redo_stack.clear()
+            self.revision += 1
+        return sids
+
+    def clear(self):
+        """Remove every finished stroke; returns their ids (undoable)."""
+        sids = [sid for sid, v in enumerate(self.visible) if v and sid not in self.open]
+        if sids:
+            for sid in sids:
+                self.visible[sid] = False
+            self.undo_stack.append(("remove", sids))
+            self.redo_stack.clear()
+            self.revision += 1
+        return sids
+
+    # --- saving -------------------------------------------------------------
+
+    def state(self):
+        """Plain arrays describing every stroke (open ones included), for saving."""
+        n = self.n_points
+        points, times, sizes = [self.points[:n]], [self.times[:n]], [self.sizes[:n]]
+        start = np.array(self.start, np.int64)
+        end = np.array(self.end, np.int64)
+        for sid, pts in self.open.items():
+            arr = np.asarray(pts, np.float32)
+            start[sid], end[sid] = n, n + len(arr)
+            n += len(arr)
+            points.append(arr[:, :2])
+            times.append(arr[:, 2])
+            sizes.append(arr[:, 3])
+        return {
+            "size": np.array((self.width, self.height), np.int64),
+            "points": np.concatenate(points),
+            "times": np.concatenate(times),
+            "sizes": np.concatenate(sizes),
+            "start": start,
+            "end": end,
+            "color": np.array(self.color, np.uint8).reshape(-1, 3),
+            "width_px": np.array(self.width_px, np.int32),
+            "eraser": np.array(self.eraser, np.bool_),
+            "visible": np.array(self.visible, np.bool_),
+        }
+
+    @classmethod
+    def from_state(cls, state, cell=64):
+        """Rebuild a store saved with state(). The undo history starts empty."""
+        width, height = (int(v) for v in state["size"])
+        store = cls(width, height, cell)
+        store.points = np.array(state["points"], np.float32).reshape(-1, 2)
+        store.n_points = len(store.points)
+        store.times = np.array(state["times"], np.float32)
+        store.start = [int(v) for v in state["start"]]
+        store.end = [int(v) for v in state["end"]]
+        store.color = [tuple(int(c) for c in v) for v in state["color"]]
+        store.width_px = [int(v) for v in state["width_px"]]
+        store.eraser = [bool(v) for v in state["eraser"]]
+        store.visible = [bool(v) for v in state["visible"]]
+        if "sizes" in state:
+            store.sizes = np.array(state["sizes"], np.float32)
+        else:
+            # Saved before per-point widths: every point has its stroke's width
+            store.sizes = np.zeros(store.n_points, np.float32)
+            for sid, w in enumerate(store.width_px):
+                store.sizes[store.start[sid]:store.end[sid]] = w
+        if len(store.times):
+            # Keep new timestamps after the restored ones
+            store.t0 -= float(store.times.max())
+        # Index each stroke by its bounding box: a superset of the cells it
+        # crosses, which is all candidates() needs and avoids a per-segment loop
+        for sid in range(len(store.start)):
+            pts = store.points[store.start[sid]:store.end[sid]]
+            if len(pts):
+                (x0, y0), (x1, y1) = pts.min(axis=0), pts.max(axis=0)
+                store._index(sid, x0, y0, x1, y1, float(store.stroke_sizes(sid).max()))
+        return store
+
+    # --- spatial queries ---------------------------------------------------
+
+    def candidates(self, x0, y0, x1, y1):
+        """Visible stroke ids whose grid cells overlap the rectangle, in drawing order."""
+        c = self.cell
+        found = set()
+        for cx in range(int(x0) // c, int(x1) // c + 1):
+            for cy in range(int(y0) // c, int(y1) // c + 1):
+                found.update(self.grid.get((cx, cy), ()))
+        return sorted(sid for sid in found if self.visible[sid])
+
+    def hit_test(self, x, y, radius=0):
+        """Visible, non-eraser strokes passing within radius of (x, y)."""
+        hits = []
+        p = np.array((x, y), np.float32)
+        for sid in self.candidates(x - radius, y - radius, x + radius, y + radius):
+            if self.eraser[sid]:
+                continue
+            pts = self.stroke_points(sid)
+            reach = radius + float(self.stroke_sizes(sid).max()) / 2.0
+            if self._distance(p, pts) <= reach:
+                hits.append(sid)
+        return hits
+
+    def bounds(self, sids):
+        """Pixel bounding box (x0, y0, x1, y1) of strokes including their width."""
+        boxes = []
+        for sid in sids:
+            pts = self.stroke_points(sid)
+            r = float(self.stroke_sizes(sid).max()) / 2.0 + 2
+            lo, hi = pts.min(axis=0) - r, pts.max(axis=0) + r
+            boxes.append((lo[0], lo[1], hi[0], hi[1]))
+        if not boxes:
+            return None
+        b = np.array(boxes)
+        return (int(max(b[:, 0].min(), 0)), int(max(b[:, 1].min(), 0)),
+                int(min(np.ceil(b[:, 2].max()), self.width)), int(min(np.ceil(b[:, 3].max()), self.height)))
+
+    # --- rasterizing -------------------------------------------------------
+
+    def rasterize(self, canvas, ink=None, rect=None, scale=1.0, origin=(0, 0), brush=None):
+        """Redraw visible strokes into canvas (and the ink mask), in order.
+
+        rect = (x0, y0, x1, y1) in store coordinates limits the redraw to that
+        region; only strokes from the overlapping grid cells are drawn.
+        scale maps store coordinates to canvas pixels, so the board can be
+        re-rendered at any resolution. origin is the store point at canvas
+        pixel (0, 0), for canvases that hold only part of the store.
+        With a BrushEngine the strokes are drawn anti-aliased with their
+        per-point widths, into premultiplied canvas and 0..255 ink.
+        """
+        ox, oy = int(round(origin[0] * scale)), int(round(origin[1] * scale))
+        if rect is None:
+            sids = [sid for sid, v in enumerate(self.visible) if v]
+            self._draw(sids, canvas, ink, (ox, oy), scale, brush)
+            return canvas
+
+        sids = self.candidates(*rect)
+        # OpenCV rasterizes a clipped thick line differently, so the strokes
+        # are drawn whole into a scratch area and only the rect is copied back
+        area = rect
+        box = self.bounds(sids)
+        if box is not None:
+            area = (min(rect[0], box[0]), min(rect[1], box[1]), max(rect[2], box[2]), max(rect[3], box[3]))
+        ax0, ay0, ax1, ay1 = [int(round(v * scale)) for v in area]
+        x0, y0, x1, y1 = [int(round(v * scale)) for v in rect]
+        scratch = np.zeros((ay1 - ay0, ax1 - ax0, 3), np.uint8)
+        scratch_ink = np.zeros(scratch.shape[:2], np.uint8) if ink is not None else None
+        self._draw(sids, scratch, scratch_ink, (ax0, ay0), scale, brush)
+        canvas[y0 - oy:y1 - oy, x0 - ox:x1 - ox] = scratch[y0 - ay0:y1 - ay0, x0 - ax0:x1 - ax0]
+        if ink is not None:
+            ink[y0 - oy:y1 - oy, x0 - ox:x1 - ox] = scratch_ink[y0 - ay0:y1 - ay0, x0 - ax0:x1 - ax0]
+        return canvas
+
+    def _draw(self, sids, canvas, ink, origin, scale, brush=None):
+        canvas[:] = 0
+        if ink is not None:
+            ink[:] = 0
+        offset = np.array(origin, np.float32)
+        if brush is not None:
+            for sid in sids:
+                pts = self.stroke_points(sid) * scale - offset
+                radii = self.stroke_sizes(sid) * (scale / 2.0)
+                brush.polyline(canvas, ink, pts.tolist(), radii.tolist(), self.color[sid], self.eraser[sid])
+            return
+        for sid in sids:
+            pts = np.rint(self.stroke_points(sid) * scale - offset).astype(np.int32)
+            thickness = max(int(round(self.width_px[sid] * scale)), 1)
+            color = (0, 0, 0) if self.eraser[sid] else self.color[sid]
+            cv2.polylines(canvas, [pts], False, color, thickness)
+            if ink is not None:
+                cv2.polylines(ink, [pts], False, 0 if self.eraser[sid] else 1, thickness)
+
+    # --- internals -----------------------------------------------------------
+
+    def _now(self, t):
+        return (time.perf_counter() if t is None else t) - self.t0
+
+    def _reserve(self, n):
+        if self.n_points + n <= len(self.points):
+            return
+        size = max(len(self.points) * 2, self.n_points + n)
+        points = np.empty((size, 2), np.float32)
+        times = np.empty(size, np.float32)
+        sizes = np.empty(size, np.float32)
+        points[:self.n_points] = self.points[:self.n_points]
+        times[:self.n_points] = self.times[:self.n_points]
+        sizes[:self.n_points] = self.sizes[:self.n_points]
+        self.points, self.times, self.sizes = points, times, sizes
+
+    def _index(self, sid, x0, y0, x1, y1, width):
+        r = width / 2.0
+        c = self.cell
+        for cx in range(int(min(x0, x1) - r) // c, int(max(x0, x1) + r) // c + 1):
+            for cy in range(int(min(y0, y1) - r) // c, int(max(y0, y1) + r) // c + 1):
+                self.grid.setdefault((cx, cy), set()).add(sid)
+
+    @staticmethod
+    def _distance(p, pts):
+        # Shortest distance from p to the polyline pts
+        if len(pts) == 1:
+            return float(np.hypot(*(pts[0] - p)))
+        a, b = pts[:-1], pts[1:]
+        ab = b - a
+        denom = np.einsum("ij,ij->i", ab, ab)
+        denom[denom == 0] = 1
+        u = np.clip(np.einsum("ij,ij->i", p - a, ab) / denom, 0, 1)
+        closest = a + ab * u[:, None]
+        return float(np.sqrt(((closest - p) ** 2).sum(axis=1)).min())
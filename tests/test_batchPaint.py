@@ -0,0 +1,97 @@
+import cv2
+import numpy as np
+import pytest
+
+import batchPaint
+from batchPaint import paint_video, plan_chunks, tracked_frames
+from landmarkLog import LandmarkLog
+
+FRAMES = 40
+
+
+class FakeDetector:
+    """Stands in for handDetector: one right hand per frame, placed by the frame it saw.
+
+    x is the frame number (from the frame's brightness), y the number of
+    frames the tracker has seen since it was reset.
+    """
+
+    def __init__(self):
+        self.seen = []
+
+    def reset(self):
+        self.seen = []
+
+    def findHands(self, img, draw=False):
+        self.seen.append(int(round(img.mean() / 5)))
+
+    def findLandmarks(self, img):
+        hand = np.zeros((1, 21, 3), np.float32)
+        hand[0, :, 0] = self.seen[-1]
+        hand[0, :, 1] = len(self.seen)
+        return hand, ["Right"], None
+
+
+@pytest.fixture
+def video(tmp_path):
+    path = str(tmp_path / "clip.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 20, (64, 48))
+    for i in range(FRAMES):
+        writer.write(np.full((48, 64, 3), i * 5, np.uint8))
+    writer.release()
+    return path
+
+
+@pytest.fixture
+def fake_tracker(monkeypatch):
+    def init(detector_options):
+        batchPaint._detector = FakeDetector()
+
+    monkeypatch.setattr(batchPaint, "_init_worker", init)
+
+
+def test_plan_chunks():
+    assert plan_chunks(10, 4) == [(0, 4), (4, 8), (8, 10)]
+    assert plan_chunks(0, 4) == []
+
+
+def test_tracked_frames_pairs_frames_with_chunk_rows():
+    chunks = [(0, np.arange(3)[:, None] * np.ones((1, 2)), np.zeros((3, 2)), 0.1),
+              (3, np.arange(3, 5)[:, None] * np.ones((1, 2)), np.zeros((2, 2)), 0.1)]
+    log = []
+    paired = list(tracked_frames(iter(range(100, 106)), chunks, log))
+    # The sixth frame has no tracking result and ends the stream
+    assert [(n, img, int(landmarks[0])) for n, img, landmarks, _ in paired] == [
+        (0, 100, 0), (1, 101, 1), (2, 102, 2), (3, 103, 3), (4, 104, 4)]
+    assert len(log) == 2
+
+
+def test_chunks_reseed_the_tracker_on_the_overlap(video, fake_tracker, tmp_path):
+    output = str(tmp_path / "painted.avi")
+    landmarks = str(tmp_path / "painted.hlog")
+    result = paint_video(video, output, landmarks, workers=1, chunk=15, overlap=5)
+    assert result["frames"] == FRAMES and result["chunks"] == 3
+
+    log = LandmarkLog(landmarks)
+    assert (log.width, log.height) == (64, 48) and len(log) == FRAMES
+    seen = []
+    for i, (t, hands, labels) in enumerate(log):
+        # The video times, one record per frame
+        assert t == pytest.approx(i / 20.0)
+        assert labels == ["Right"] and int(log.records[i]["seq"]) == i
+        frame, history = int(hands[0, 0, 0]), int(hands[0, 0, 1])
+        assert frame == i
+        seen.append(history)
+    # The first chunk starts cold; the others after 5 overlap frames
+    assert seen[:15] == list(range(1, 16))
+    assert seen[15:30] == list(range(6, 21))
+    assert seen[30:] == list(range(6, 16))
+
+    cap = cv2.VideoCapture(output)
+    assert int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) == FRAMES
+    cap.release()
+
+
+def test_no_landmark_log_unless_asked(video, fake_tracker, tmp_path):
+    paint_video(video, str(tmp_path / "painted.avi"), workers=1, chunk=15)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["clip.avi", "painted.avi"]
@@ -0,0 +1,101 @@
+import cv2
+import numpy as np
+
+from boardCompositor import BoardCompositor
+
+
+def paint(canvas, ink, x0, y0, x1, y1, color=(0, 0, 255), thickness=8):
+    cv2.line(canvas, (x0, y0), (x1, y1), color, thickness)
+    cv2.line(ink, (x0, y0), (x1, y1), 255, thickness)
+
+
+def full_composite(canvas, ink):
+    board = np.full_like(canvas, 255)
+    np.copyto(board, canvas, where=ink[:, :, None].view(bool))
+    return board
+
+
+def test_mark_clips_and_pads():
+    comp = BoardCompositor(640, 480)
+    comp.mark(10, 20, 100, 20, 8)
+    assert comp.dirty == [(4, 14, 107, 27)]
+    comp.mark(-50, -50, 5, 5, 2)
+    assert comp.dirty[-1] == (0, 0, 9, 9)
+    # Entirely off the board
+    comp.mark_rect(700, 0, 800, 10)
+    assert len(comp.dirty) == 2
+
+
+def test_many_marks_merge_into_one_rect():
+    comp = BoardCompositor(640, 480)
+    for i in range(65):
+        comp.mark_rect(i, i, i + 10, i + 10)
+    assert comp.dirty == [(0, 0, 74, 74)]
+
+
+def test_compose_board_redraws_only_dirty_rects():
+    comp = BoardCompositor(640, 480)
+    canvas = np.zeros((480, 640, 3), np.uint8)
+    ink = np.zeros((480, 640), np.uint8)
+    paint(canvas, ink, 50, 50, 300, 200)
+    comp.mark(50, 50, 300, 200, 8)
+    np.testing.assert_array_equal(comp.compose_board(canvas, ink), full_composite(canvas, ink))
+    assert comp.dirty == []
+
+    # Ink outside any marked rectangle is not picked up
+    paint(canvas, ink, 400, 400, 500, 400)
+    assert np.all(comp.compose_board(canvas, ink)[400, 400:500] == 255)
+    comp.mark(400, 400, 500, 400, 8)
+    np.testing.assert_array_equal(comp.compose_board(canvas, ink), full_composite(canvas, ink))
+
+
+def test_erasing_restores_white():
+    comp = BoardCompositor(640, 480)
+    canvas = np.zeros((480, 640, 3), np.uint8)
+    ink = np.zeros((480, 640), np.uint8)
+    paint(canvas, ink, 50, 50, 300, 50)
+    comp.mark(50, 50, 300, 50, 8)
+    comp.compose_board(canvas, ink)
+    paint(canvas, ink, 50, 50, 300, 50, (0, 0, 0), 20)
+    ink[:] = 0
+    comp.mark(50, 50, 300, 50, 20, ink=False)
+    assert np.all(comp.compose_board(canvas, ink) == 255)
+
+
+def test_alpha_board():
+    comp = BoardCompositor(64, 64, alpha=True)
+    canvas = np.zeros((64, 64, 3), np.uint8)
+    ink = np.zeros((64, 64), np.uint8)
+    # Half-covered red, premultiplied
+    canvas[10:20, 10:20] = (0, 0, 128)
+    ink[10:20, 10:20] = 128
+    comp.mark_rect(0, 0, 64, 64)
+    board = comp.compose_board(canvas, ink)
+    assert board[15, 15].tolist() == [127, 127, 255]
+    assert board[30, 30].tolist() == [255, 255, 255]
+
+
+def test_compose_cam_only_adds_over_inked_spans():
+    comp = BoardCompositor(640, 480, tile=32)
+    canvas = np.zeros((480, 640, 3), np.uint8)
+    ink = np.zeros((480, 640), np.uint8)
+    paint(canvas, ink, 100, 100, 200, 100)
+    comp.mark(100, 100, 200, 100, 8)
+    # Stray pixels outside the marked spans are skipped
+    canvas[400, 600] = 255
+    img = np.full((480, 640, 3), 10, np.uint8)
+    comp.compose_cam(img, canvas)
+    expected = cv2.add(np.full((480, 640, 3), 10, np.uint8), canvas)
+    np.testing.assert_array_equal(img[64:128], expected[64:128])
+    assert img[400, 600].tolist() == [10, 10, 10]
+    assert np.flatnonzero(comp.span_x1 > comp.span_x0).tolist() == [2, 3]
+
+
+def test_reset():
+    comp = BoardCompositor(640, 480)
+    comp.board[:] = 0
+    comp.mark(0, 0, 100, 100, 4)
+    comp.reset()
+    assert comp.dirty == []
+    assert np.all(comp.board == 255)
+    assert not np.any(comp.span_x1 > comp.span_x0)
@@ -0,0 +1,140 @@
+import numpy as np
+
+from brushEngine import BrushEngine
+
+H, W = 80, 120
+RED = (0, 0, 255)
+
+
+def board():
+    return np.zeros((H, W, 3), np.uint8), np.zeros((H, W), np.uint8)
+
+
+def dab_centers(engine, x0, y0, x1, y1, r):
+    # Where the engine puts its dabs: spaced along the segment, on the sub-pixel grid
+    step = max(r * engine.spacing, 0.5)
+    n = max(int(np.ceil(np.hypot(x1 - x0, y1 - y0) / step)), 1)
+    t = np.linspace(0.0, 1.0, n + 1)
+    p = engine.phases
+    return np.stack([np.rint((x0 + (x1 - x0) * t) * p) / p, np.rint((y0 + (y1 - y0) * t) * p) / p], axis=1)
+
+
+def coverage(engine, points, r):
+    """Float coverage of a stroke: the union of its anti-aliased dabs, 0..1."""
+    r = np.rint(r * 4) / 4
+    yy, xx = np.mgrid[0:H, 0:W].astype(np.float64)
+    cover = np.zeros((H, W))
+    for (x0, y0), (x1, y1) in zip(points[:-1], points[1:]):
+        for cx, cy in dab_centers(engine, x0, y0, x1, y1, r):
+            np.maximum(cover, np.clip(r + 0.5 - np.hypot(xx - cx, yy - cy), 0.0, 1.0), out=cover)
+    return cover
+
+
+def composite(canvas, ink, cover, color, eraser=False):
+    """The stroke composited once over the board, in float."""
+    canvas = canvas.astype(np.float64) * (1 - cover[..., None])
+    ink = ink.astype(np.float64) * (1 - cover)
+    if not eraser:
+        canvas += cover[..., None] * color
+        ink += cover * 255
+    return canvas, ink
+
+
+def draw(engine, canvas, ink, points, r, color, key=0, eraser=False):
+    for (x0, y0), (x1, y1) in zip(points[:-1], points[1:]):
+        engine.segment(canvas, ink, key, x0, y0, x1, y1, r, r, color, eraser)
+    engine.end_stroke(key)
+
+
+def assert_close(actual, expected, tol=3):
+    diff = np.abs(actual.astype(np.float64) - expected)
+    assert diff.max() <= tol, "off by %.1f at %s" % (diff.max(), np.unravel_index(diff.argmax(), diff.shape))
+
+
+def test_stamp_is_an_antialiased_disc():
+    engine = BrushEngine()
+    stamp = engine.stamp(5.0)
+    assert stamp.shape == (13, 13)
+    assert stamp[6, 6] == 255 and stamp[6, 0] == 0
+    # Half covered at the radius
+    assert abs(int(stamp[6, 11]) - 128) <= 1
+    assert engine.stamp(5.1) is stamp
+
+
+def test_stroke_matches_the_float_reference():
+    engine = BrushEngine()
+    canvas, ink = board()
+    # A sharp turn: the dabs of the two segments overlap at the joint
+    points = [(15.3, 20.7), (70.0, 35.2), (20.5, 45.0), (100.25, 60.0)]
+    draw(engine, canvas, ink, points, 6.0, RED)
+    ref_canvas, ref_ink = composite(*board(), coverage(engine, points, 6.0), RED)
+    assert_close(ink, ref_ink)
+    assert_close(canvas, ref_canvas)
+
+
+def test_joints_do_not_darken_the_edge():
+    engine = BrushEngine()
+    whole, whole_ink = board()
+    pieces, pieces_ink = board()
+    draw(engine, whole, whole_ink, [(10, 40), (110, 40)], 8.0, RED)
+    # The same line in many short segments: many joints, heavily overlapping dabs
+    xs = np.linspace(10, 110, 26)
+    draw(engine, pieces, pieces_ink, [(x, 40) for x in xs], 8.0, RED, key=1)
+    reference = coverage(engine, [(10, 40), (110, 40)], 8.0) * 255
+    # The soft edge keeps its coverage; compositing every segment on its
+    # own would have pushed it towards 255
+    edge = (reference > 20) & (reference < 235)
+    assert edge.sum() > 100
+    assert_close(whole_ink[edge], reference[edge])
+    assert_close(pieces_ink[edge], reference[edge])
+
+
+def test_stroke_over_other_ink_composites_once():
+    engine = BrushEngine()
+    canvas, ink = board()
+    first = [(10, 30), (110, 30)]
+    second = [(60, 5), (60, 75), (65, 10)]
+    draw(engine, canvas, ink, first, 7.0, RED)
+    draw(engine, canvas, ink, second, 5.0, (255, 0, 0))
+    ref_canvas, ref_ink = composite(*board(), coverage(engine, first, 7.0), RED)
+    ref_canvas, ref_ink = composite(ref_canvas, ref_ink, coverage(engine, second, 5.0), (255, 0, 0))
+    assert_close(ink, ref_ink)
+    assert_close(canvas, ref_canvas)
+
+
+def test_new_stroke_paints_over_the_last():
+    engine = BrushEngine()
+    canvas, ink = board()
+    draw(engine, canvas, ink, [(10, 40), (110, 40)], 6.0, RED)
+    once = ink.copy()
+    draw(engine, canvas, ink, [(10, 40), (110, 40)], 6.0, RED)
+    # Two strokes are two layers of paint: the edge gets darker
+    assert (ink >= once).all() and (ink > once).any()
+    cover = coverage(engine, [(10, 40), (110, 40)], 6.0)
+    assert_close(ink, (1 - (1 - cover) ** 2) * 255)
+
+
+def test_eraser_restores_zero_coverage():
+    engine = BrushEngine()
+    canvas, ink = board()
+    draw(engine, canvas, ink, [(20, 40), (100, 40)], 6.0, RED)
+    eraser = [(10, 40), (110, 40)]
+    draw(engine, canvas, ink, eraser, 14.0, (0, 0, 0), eraser=True)
+    ref_canvas, ref_ink = composite(*composite(*board(), coverage(engine, [(20, 40), (100, 40)], 6.0), RED),
+                                    coverage(engine, eraser, 14.0), (0, 0, 0), eraser=True)
+    assert_close(ink, ref_ink)
+    assert_close(canvas, ref_canvas)
+    # The eraser covered the whole stroke: nothing is left
+    assert not ink.any() and not canvas.any()
+
+
+def test_polyline_redraws_the_same_stroke():
+    engine = BrushEngine()
+    live, live_ink = board()
+    points = [(15.3, 20.7), (70.0, 35.2), (20.5, 45.0)]
+    draw(engine, live, live_ink, points, 6.0, RED)
+    redrawn, redrawn_ink = board()
+    engine.polyline(redrawn, redrawn_ink, points, [6.0] * len(points), RED)
+    np.testing.assert_array_equal(redrawn_ink, live_ink)
+    np.testing.assert_array_equal(redrawn, live)
+    assert "redraw" not in engine.strokes
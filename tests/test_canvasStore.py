@@ -0,0 +1,173 @@
+import os
+
+import numpy as np
+import pytest
+
+import canvasStore
+from canvasStore import CanvasStore
+from paintingBoard import PaintingBoard
+from whiteboardLayer import WhiteboardLayer
+
+
+def paint(board, points):
+    # Frame times from the clock the autosave interval is measured on
+    for x, y in points:
+        board.stroke((x, y))
+    board.stroke(None)
+
+
+def reopen_board(path, width=320, height=240):
+    board = PaintingBoard(width, height, smooth=False)
+    board.restore(CanvasStore(path, width, height))
+    return board
+
+
+def test_painting_board_round_trip(tmp_path):
+    path = str(tmp_path / "session")
+    board = PaintingBoard(320, 240, smooth=False)
+    board.restore(CanvasStore(path, 320, 240))
+    paint(board, [(20, 20), (150, 40), (300, 200)])
+    board.pen.color = (255, 0, 0)
+    paint(board, [(10, 230), (200, 120)])
+    board.close()
+
+    restored = reopen_board(path)
+    np.testing.assert_array_equal(restored.canvas, board.canvas)
+    np.testing.assert_array_equal(restored.ink, board.ink)
+    np.testing.assert_array_equal(restored.compose_board(), board.compose_board())
+    assert len(restored.strokes) == 2
+    np.testing.assert_array_equal(restored.strokes.stroke_points(1), board.strokes.stroke_points(1))
+    # The strokes came back too: undo still works on them, as erasing
+    restored.erase_at(150, 40, 5)
+    restored.run_commands()
+    assert restored.strokes.visible == [False, True]
+    restored.close()
+
+
+def test_whiteboard_round_trip(tmp_path):
+    path = str(tmp_path / "session")
+    layer = WhiteboardLayer(320, 240)
+    layer.restore(CanvasStore(path, 320, 240))
+    layer.draw_segment(20, 20, 200, 20, 6, "red")
+    layer.draw_segment(200, 20, 200, 200, 6, "red")
+    layer.end_stroke()
+    layer.draw_segment(100, 0, 100, 60, 20, "white")
+    layer.end_stroke()
+    layer.close()
+
+    restored = WhiteboardLayer(320, 240)
+    restored.restore(CanvasStore(path, 320, 240))
+    np.testing.assert_array_equal(restored.mask, layer.mask)
+    np.testing.assert_array_equal(restored.layer * restored.mask[..., None], layer.layer * layer.mask[..., None])
+    frame = np.full((240, 320, 3), 90, np.uint8)
+    np.testing.assert_array_equal(restored.compose(frame), layer.compose(frame))
+    assert restored.strokes.eraser == [False, True]
+    restored.close()
+
+
+def test_changes_after_the_last_autosave_are_lost_and_nothing_else(tmp_path):
+    path = str(tmp_path / "session")
+    board = PaintingBoard(320, 240, smooth=False)
+    board.restore(CanvasStore(path, 320, 240, interval=0.0))
+    paint(board, [(20, 20), (150, 40)])
+    saved_canvas, saved_ink = board.canvas.copy(), board.ink.copy()
+    # Painting without autosaves, then the process dies: the writer drains
+    # what it was handed but no final save happens
+    board.saver.interval = 1e9
+    paint(board, [(20, 200), (300, 200)])
+    board.saver.close()
+
+    restored = reopen_board(path)
+    np.testing.assert_array_equal(restored.canvas, saved_canvas)
+    np.testing.assert_array_equal(restored.ink, saved_ink)
+    assert len(restored.strokes) == 1
+    restored.close()
+
+
+def test_failed_strokes_write_keeps_the_previous_session(tmp_path, monkeypatch):
+    path = str(tmp_path / "session")
+    board = PaintingBoard(320, 240, smooth=False)
+    board.restore(CanvasStore(path, 320, 240))
+    paint(board, [(20, 20), (150, 40)])
+    board.close()
+    with open(os.path.join(path, "strokes.npz"), "rb") as f:
+        saved = f.read()
+
+    def torn_savez(file, **arrays):
+        # Half a file written, then the disk fills up
+        with open(file, "wb") as f:
+            f.write(b"PK\x03\x04 partial")
+        raise OSError("No space left on device")
+
+    board = reopen_board(path)
+    monkeypatch.setattr(canvasStore.np, "savez", torn_savez)
+    paint(board, [(20, 200), (300, 200)])
+    board.close()
+    monkeypatch.undo()
+
+    with open(os.path.join(path, "strokes.npz"), "rb") as f:
+        assert f.read() == saved
+    restored = reopen_board(path)
+    assert len(restored.strokes) == 1
+    restored.close()
+
+
+def test_damaged_strokes_file_still_loads_the_ink(tmp_path):
+    path = str(tmp_path / "session")
+    board = PaintingBoard(320, 240, smooth=False)
+    board.restore(CanvasStore(path, 320, 240))
+    paint(board, [(20, 20), (150, 40)])
+    board.close()
+    with open(os.path.join(path, "strokes.npz"), "r+b") as f:
+        f.truncate(40)
+
+    store = CanvasStore(path, 320, 240)
+    assert store.open()
+    canvas = np.zeros((240, 320, 3), np.uint8)
+    ink = np.zeros((240, 320), np.uint8)
+    assert store.load(canvas, ink) is None
+    np.testing.assert_array_equal(canvas, board.canvas)
+    np.testing.assert_array_equal(ink, board.ink)
+    store.close()
+
+
+@pytest.mark.parametrize("meta", [None, "{not json", '{"width": 640, "height": 480, "tile": 64}'])
+def test_missing_or_other_session_starts_new(tmp_path, meta):
+    path = str(tmp_path / "session")
+    board = PaintingBoard(320, 240, smooth=False)
+    board.restore(CanvasStore(path, 320, 240))
+    paint(board, [(20, 20), (150, 40)])
+    board.close()
+    if meta is None:
+        os.remove(os.path.join(path, "meta.json"))
+    else:
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            f.write(meta)
+
+    store = CanvasStore(path, 320, 240)
+    assert not store.open()
+    canvas = np.zeros((240, 320, 3), np.uint8)
+    ink = np.zeros((240, 320), np.uint8)
+    assert store.load(canvas, ink) is None
+    assert not canvas.any() and not ink.any()
+    store.close()
+
+
+def test_only_inked_tiles_are_loaded(tmp_path):
+    path = str(tmp_path / "session")
+    store = CanvasStore(path, 256, 256, tile=64)
+    store.open()
+    canvas = np.zeros((256, 256, 3), np.uint8)
+    ink = np.zeros((256, 256), np.uint8)
+    canvas[70:80, 70:80] = 200
+    ink[70:80, 70:80] = 1
+    store.mark_rect(70, 70, 80, 80)
+    store.close(canvas, ink)
+
+    store = CanvasStore(path, 256, 256, tile=64)
+    assert store.open()
+    assert store.inked_rects() == [(64, 64, 128, 128)]
+    loaded = np.zeros_like(canvas)
+    store.load(loaded, np.zeros_like(ink))
+    np.testing.assert_array_equal(loaded, canvas)
+    store.close()
@@ -0,0 +1,94 @@
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+from captureSource import CameraSource, FileSource, FrameSource, SyntheticSource, measure, open_source, parse_size
+
+
+def read_all(source, work=0.0):
+    frames = []
+    while True:
+        item = source.read(timeout=2.0)
+        if item is None:
+            break
+        frames.append(item)
+        time.sleep(work)
+    return frames
+
+
+@pytest.fixture
+def video(tmp_path):
+    path = str(tmp_path / "clip.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 30, (160, 120))
+    for i in range(12):
+        writer.write(np.full((120, 160, 3), i * 20, np.uint8))
+    writer.release()
+    return path
+
+
+def test_incomplete_source_fails_when_created():
+    class NoRun(FrameSource):
+        pass
+
+    with pytest.raises(TypeError):
+        NoRun()
+
+
+def test_file_source_delivers_every_frame(video):
+    source = FileSource(video).start()
+    frames = read_all(source, work=0.005)
+    source.stop()
+    assert len(frames) == 12
+    assert [seq for _, _, seq in frames] == list(range(1, 13))
+    assert source.dropped == 0 and source.ended
+    assert source.info["width"] == 160 and source.info["fps"] == pytest.approx(30)
+    # Frames come in order
+    assert [int(f[0, 0, 0]) for f, _, _ in frames] == pytest.approx([i * 20 for i in range(12)], abs=3)
+
+
+def test_missing_file_ends(tmp_path):
+    source = FileSource(str(tmp_path / "missing.avi")).start()
+    assert source.read(timeout=2.0) is None
+    assert source.ended
+
+
+def test_synthetic_source_counts_frames():
+    source = SyntheticSource(64, 48, fps=200.0, frames=20).start()
+    frames = read_all(source)
+    source.stop()
+    assert frames[0][0].shape == (48, 64, 3)
+    # Whatever was not read in time is counted as dropped, never lost silently
+    assert len(frames) + source.dropped == 20
+    assert frames[-1][2] == 20
+
+
+def test_slow_reader_gets_the_newest_frame():
+    source = SyntheticSource(64, 48, fps=200.0, frames=40).start()
+    frames = read_all(source, work=0.03)
+    source.stop()
+    assert source.dropped > 0
+    assert len(frames) + source.dropped == 40
+    seqs = [seq for _, _, seq in frames]
+    assert seqs == sorted(set(seqs))
+
+
+def test_measure():
+    source = SyntheticSource(64, 48, fps=100.0, frames=30).start()
+    result = measure(source, seconds=5.0)
+    source.stop()
+    assert result["frames"] + result["dropped"] == 30
+    assert 50 < result["fps"] < 150
+    assert 0 <= result["age_p50_ms"] <= result["age_p95_ms"] < 1000
+
+
+def test_open_source():
+    assert isinstance(open_source(0), CameraSource)
+    assert isinstance(open_source("1"), CameraSource)
+    assert isinstance(open_source("clip.mp4"), FileSource)
+    synthetic = open_source("synthetic:320x240@15")
+    assert isinstance(synthetic, SyntheticSource)
+    assert synthetic.info["width"] == 320 and synthetic.info["fps"] == 15
+    assert open_source("synthetic", 100, 50).info["height"] == 50
+    assert parse_size("1280X720") == (1280, 720)
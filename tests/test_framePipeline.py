@@ -0,0 +1,81 @@
+import threading
+import time
+
+from framePipeline import FramePipeline, LatestQueue
+
+
+def test_latest_queue_drops_oldest():
+    q = LatestQueue(2)
+    assert not q.put(1)
+    assert not q.put(2)
+    assert q.put(3)
+    assert q.dropped == 1
+    assert q.depth() == 2
+    assert q.get() == 2
+    assert q.get() == 3
+    assert q.get(timeout=0.01) is None
+
+
+def test_latest_queue_wakes_getter():
+    q = LatestQueue()
+    got = []
+    t = threading.Thread(target=lambda: got.append(q.get(timeout=5)))
+    t.start()
+    time.sleep(0.05)
+    q.put("frame")
+    t.join(1)
+    assert got == ["frame"]
+
+
+def test_latest_queue_close():
+    q = LatestQueue()
+    q.put(1)
+    q.close()
+    # Items put before closing are still handed out, then get() returns at once
+    assert q.get() == 1
+    started = time.perf_counter()
+    assert q.get(timeout=5) is None
+    assert time.perf_counter() - started < 1
+
+
+def test_pipeline_runs_stages_in_order():
+    frames = iter(range(1, 6))
+    seen = []
+
+    def capture():
+        time.sleep(0.01)
+        return next(frames, None)
+
+    def compose(x):
+        seen.append(x)
+        return x * 10
+
+    pipeline = FramePipeline(capture, lambda x: x + 100, compose)
+    pipeline.start()
+    deadline = time.perf_counter() + 5
+    while not pipeline.finished and time.perf_counter() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.1)
+    pipeline.stop()
+    # A slow stage could drop frames; the order never changes
+    assert seen == sorted(seen) and seen[-1] == 105
+    assert pipeline.latest() == 1050
+    assert pipeline.latest() is None
+
+
+def test_infer_time_counts_upstream_work():
+    frames = iter(range(20))
+
+    def capture():
+        time.sleep(0.005)
+        return next(frames, None)
+
+    pipeline = FramePipeline(capture, lambda x: x, lambda x: x, infer_time=lambda x: 0.05)
+    pipeline.start()
+    deadline = time.perf_counter() + 5
+    while not pipeline.finished and time.perf_counter() < deadline:
+        time.sleep(0.01)
+    pipeline.stop()
+    stats = pipeline.report()
+    assert stats["inference"]["avg_ms"] >= 50
+    assert pipeline.format_report().endswith("(bottleneck: inference)")
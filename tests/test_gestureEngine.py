@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from gestureEngine import DRAW, FIST, HOLD, HOVER, NONE, PALM, PINCH, GestureEngine, classify, synthetic_hand
+
+POSES = {
+    DRAW: (0, 1, 0, 0, 0),
+    HOVER: (0, 1, 1, 0, 0),
+    FIST: (0, 0, 0, 0, 0),
+    PALM: (1, 1, 1, 1, 1),
+}
+
+
+@pytest.mark.parametrize("pose", sorted(POSES))
+def test_classify_poses(pose):
+    assert classify(synthetic_hand(POSES[pose])[None]).tolist() == [pose]
+
+
+def test_classify_every_hand_at_once():
+    hands = np.stack([synthetic_hand(POSES[p], center=(200 + 100 * i, 300)) for i, p in enumerate(sorted(POSES))])
+    assert classify(hands).tolist() == sorted(POSES)
+
+
+def test_palm_needs_the_thumb():
+    assert classify(synthetic_hand((0, 1, 1, 1, 1))[None]).tolist() == [NONE]
+
+
+def test_pinch():
+    assert classify(synthetic_hand((1, 1, 1, 1, 1), pinch=True)[None]).tolist() == [PINCH]
+
+
+def test_pinch_hysteresis():
+    hand = synthetic_hand(POSES[HOVER])
+    # Thumb tip 0.3 palms from the index tip: between the on and off thresholds
+    palm = np.linalg.norm(hand[9, :2] - hand[0, :2])
+    hand[4, :2] = hand[8, :2] + (0.3 * palm, 0)
+    assert classify(hand[None], np.array([False])).tolist() == [HOVER]
+    assert classify(hand[None], np.array([True])).tolist() == [PINCH]
+
+
+def test_scale_and_position_do_not_matter():
+    for center, size in (((100, 100), 40), ((500, 400), 300)):
+        hand = synthetic_hand(POSES[HOVER], center=center, size=size)
+        assert classify(hand[None]).tolist() == [HOVER]
+        # Normalized coordinates too
+        assert classify((hand / 640)[None]).tolist() == [HOVER]
+
+
+def test_no_hands():
+    assert classify(np.zeros((0, 21, 3), np.float32)).tolist() == []
+
+
+def test_engine_holds_poses():
+    engine = GestureEngine()
+    palm = synthetic_hand(POSES[PALM])[None]
+    results = [engine.update(palm, ["Right"])[0] for _ in range(HOLD[PALM])]
+    # Clearing only takes over after its hold, and is entered once
+    assert [pose for pose, _ in results[:-1]] == [NONE] * (HOLD[PALM] - 1)
+    assert results[-1] == (PALM, True)
+    assert engine.update(palm, ["Right"]) == [(PALM, False)]
+
+
+def test_engine_forgets_lost_hands():
+    engine = GestureEngine()
+    draw = synthetic_hand(POSES[DRAW])[None]
+    assert engine.update(draw, ["Left"]) == [(DRAW, True)]
+    assert engine.update(np.zeros((0, 21, 3)), []) == []
+    assert engine.state == {}
+    assert engine.update(draw, ["Left"]) == [(DRAW, True)]
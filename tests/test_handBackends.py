@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from handBackends import Backend, ReplayBackend, create_backend, select_backend
+from landmarkLog import LandmarkRecorder
+
+
+class Fixed(Backend):
+    def __init__(self, name):
+        self.name = name
+        self.closed = False
+
+    def process(self, rgb):
+        return None
+
+    def close(self):
+        self.closed = True
+
+
+def test_incomplete_backend_fails_when_created():
+    class NoProcess(Backend):
+        name = "broken"
+
+    with pytest.raises(TypeError):
+        NoProcess()
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        create_backend("nonsense")
+
+
+def test_replay_backend_loops_over_the_log(tmp_path):
+    path = str(tmp_path / "hands.hlog")
+    recorder = LandmarkRecorder(path, 640, 480)
+    recorder.write(np.full((1, 21, 3), (320, 240, 0), np.float32), ["Left"], 0.0)
+    recorder.write(np.zeros((0, 21, 3), np.float32), [], 0.1)
+    recorder.close()
+
+    backend = create_backend("replay:" + path)
+    assert isinstance(backend, ReplayBackend)
+    rgb = np.zeros((480, 640, 3), np.uint8)
+    first = backend.process(rgb)
+    assert len(first.multi_hand_landmarks) == 1
+    assert first.multi_hand_landmarks[0].landmark[0].x == pytest.approx(0.5)
+    assert first.multi_handedness[0].classification[0].label == "Left"
+    assert backend.process(rgb).multi_hand_landmarks is None
+    assert len(backend.process(rgb).multi_hand_landmarks) == 1
+    # Without a log there is never a hand
+    assert create_backend("replay").process(rgb).multi_hand_landmarks is None
+
+
+def test_select_backend_keeps_the_first_that_fits(monkeypatch):
+    made = {}
+
+    def create(name, **options):
+        made[name] = Fixed(name)
+        return made[name]
+
+    costs = {"a": 0.05, "b": 0.02, "c": 0.01}
+    monkeypatch.setattr("handBackends.create_backend", create)
+    monkeypatch.setattr("handBackends.measure", lambda backend, frames, repeat: costs[backend.name])
+    backend, measured = select_backend(0.03, candidates=("a", "b", "c"), verbose=False)
+    assert backend.name == "b"
+    assert measured == {"a": 0.05, "b": 0.02}
+    assert made["a"].closed and not made["b"].closed
+
+    # Nothing fits: the cheapest one, the others closed
+    backend, _ = select_backend(0.001, candidates=("a", "b", "c"), verbose=False)
+    assert backend.name == "c"
+    assert made["a"].closed and made["b"].closed and not made["c"].closed
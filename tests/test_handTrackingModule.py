@@ -0,0 +1,98 @@
+"""Detector-level tests on the replay backend: no model and no camera."""
+import numpy as np
+import pytest
+
+from handTrackingModule import handDetector
+from landmarkLog import LandmarkRecorder
+from perfMetrics import Metrics
+
+
+def hand(x, y, spread=40):
+    pts = np.zeros((21, 3), np.float32)
+    angles = np.linspace(0, 2 * np.pi, 21, endpoint=False)
+    pts[:, 0] = x + spread * np.cos(angles)
+    pts[:, 1] = y + spread * np.sin(angles)
+    pts[:, 2] = -0.01 * np.arange(21)
+    return pts
+
+
+@pytest.fixture
+def log_path(tmp_path):
+    path = str(tmp_path / "hands.hlog")
+    recorder = LandmarkRecorder(path, 640, 480)
+    recorder.write(hand(200, 200)[None], ["Right"], 0.0, 1)
+    recorder.write(np.zeros((0, 21, 3), np.float32), [], 0.033, 2)
+    recorder.write(np.stack([hand(150, 240), hand(450, 240)]), ["Left", "Right"], 0.066, 3)
+    recorder.close()
+    return path
+
+
+def detector(path, **options):
+    return handDetector(backend="replay:" + path, metrics=Metrics(window=8), **options)
+
+
+def test_landmarks_from_the_log(log_path):
+    d = detector(log_path)
+    assert d.backend == "replay"
+    img = np.zeros((480, 640, 3), np.uint8)
+
+    d.findHands(img, draw=False)
+    landmarks, handedness, scores = d.findLandmarks(img)
+    np.testing.assert_allclose(landmarks[..., :2], hand(200, 200)[None, :, :2], atol=1e-3)
+    assert handedness == ["Right"]
+    assert scores.shape == (1,)
+
+    d.findHands(img, draw=False)
+    landmarks, handedness, scores = d.findLandmarks(img)
+    assert landmarks.shape == (0, 21, 3) and handedness == [] and len(scores) == 0
+
+    d.findHands(img, draw=False)
+    landmarks, handedness, _ = d.findLandmarks(img)
+    assert landmarks.shape == (2, 21, 3)
+    assert handedness == ["Left", "Right"]
+
+
+def test_landmarks_follow_the_image_size(log_path):
+    d = detector(log_path)
+    small = np.zeros((240, 320, 3), np.uint8)
+    d.findHands(small, draw=False)
+    # Normalized results: a frame at half size gives landmarks at half the pixels
+    landmarks, _, _ = d.findLandmarks(small)
+    np.testing.assert_allclose(landmarks[0, :, :2], hand(200, 200)[:, :2] / 2, atol=1e-3)
+    normalized, _, _ = d.findLandmarks(small, pixel=False)
+    np.testing.assert_allclose(normalized[0, :, 0], hand(200, 200)[:, 0] / 640, atol=1e-5)
+
+
+def test_max_hands(log_path):
+    d = detector(log_path, maxHands=1)
+    img = np.zeros((480, 640, 3), np.uint8)
+    for _ in range(3):
+        d.findHands(img, draw=False)
+    landmarks, handedness, _ = d.findLandmarks(img)
+    assert landmarks.shape == (1, 21, 3)
+    assert handedness == ["Left"]
+
+
+def test_roi_tracking_crops_around_the_hand(log_path):
+    d = detector(log_path, roiTracking=True)
+    img = np.zeros((480, 640, 3), np.uint8)
+    d.findHands(img, draw=False)
+    assert d.roiMode == "search"
+    box = x0, y0, x1, y1 = d.roiBox
+    assert x0 < 160 and y0 < 160 and x1 > 240 and y1 > 240
+    # The next frame runs on the crop (its own replay backend, so the first
+    # record again) and comes back in full-frame pixels inside the box
+    d.findHands(img, draw=False)
+    assert d.roiMode == "crop"
+    landmarks, _, _ = d.findLandmarks(img)
+    assert np.all(landmarks[..., 0] >= x0) and np.all(landmarks[..., 0] <= x1)
+    assert np.all(landmarks[..., 1] >= y0) and np.all(landmarks[..., 1] <= y1)
+    assert d.roiBox != box
+
+
+def test_without_a_log():
+    d = handDetector(backend="replay", metrics=Metrics(window=8))
+    img = np.zeros((480, 640, 3), np.uint8)
+    d.findHands(img)
+    assert d.findLandmarks(img)[0].shape == (0, 21, 3)
+    assert d.findPosition(img, draw=False) == []
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from landmarkFilter import OneEuroFilter
+
+
+def test_first_sample_passes_through():
+    f = OneEuroFilter()
+    np.testing.assert_allclose(f(np.array([0.5, 0.25]), 0.0), [0.5, 0.25])
+    assert f.predict(1.0).tolist() == [0.5, 0.25]
+
+
+def test_constant_input_stays():
+    f = OneEuroFilter()
+    for i in range(30):
+        out = f(np.full((21, 3), 0.3), i / 30)
+    np.testing.assert_allclose(out, 0.3, rtol=1e-6)
+
+
+def test_jitter_is_smoothed():
+    rng = np.random.default_rng(0)
+    f = OneEuroFilter()
+    samples = 0.5 + rng.normal(0, 0.01, 200)
+    out = np.array([f(np.array([x]), i / 30)[0] for i, x in enumerate(samples)])
+    assert np.std(out[20:]) < 0.5 * np.std(samples[20:])
+    assert np.mean(out[20:]) == pytest.approx(0.5, abs=0.005)
+
+
+def test_fast_motion_lags_less_with_beta():
+    # A steady fast move: the speed term raises the cutoff and cuts the lag
+    times = np.arange(30) / 30
+    lags = []
+    for beta in (0.0, 5.0):
+        f = OneEuroFilter(beta=beta)
+        for t in times:
+            out = f(np.array([2.0 * t]), t)
+        lags.append(2.0 * times[-1] - out[0])
+    assert 0 < lags[1] < lags[0]
+
+
+def test_repeated_time_keeps_value():
+    f = OneEuroFilter()
+    f(np.array([0.0]), 1.0)
+    assert f(np.array([1.0]), 1.0).tolist() == [0.0]
+
+
+def test_shape_change_restarts():
+    f = OneEuroFilter()
+    f(np.zeros((1, 21, 3)), 0.0)
+    out = f(np.ones((2, 21, 3)), 0.1)
+    np.testing.assert_array_equal(out, 1.0)
+
+
+def test_predict_follows_velocity():
+    f = OneEuroFilter()
+    assert f.predict(0.0) is None
+    for i in range(60):
+        f(np.array([i / 60]), i / 60)
+    np.testing.assert_array_equal(f.predict(f.t), f.x)
+    # Moving forward, in proportion to the time ahead
+    ahead = f.predict(f.t + 0.1)[0] - f.x[0]
+    assert ahead > 0
+    assert f.predict(f.t + 0.2)[0] - f.x[0] == pytest.approx(2 * ahead)
+
+
+def test_reset():
+    f = OneEuroFilter()
+    f(np.array([1.0]), 0.0)
+    f.reset()
+    assert f.predict(0.0) is None
+    assert f(np.array([3.0]), 5.0).tolist() == [3.0]
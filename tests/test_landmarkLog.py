@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+from landmarkLog import LandmarkLog, LandmarkRecorder
+
+
+def hands(n, offset=0.0):
+    return (np.arange(n * 63, dtype=np.float32).reshape(n, 21, 3) + offset)
+
+
+@pytest.fixture
+def log_path(tmp_path):
+    path = str(tmp_path / "session.hlog")
+    recorder = LandmarkRecorder(path, 640, 480)
+    recorder.write(hands(1), ["Right"], 10.0, 1)
+    recorder.write(hands(0), [], 10.05, 2)
+    recorder.write(hands(2, 0.5), ["Left", "Right"], 10.1, 3)
+    recorder.close()
+    return path
+
+
+def test_round_trip(log_path):
+    log = LandmarkLog(log_path)
+    assert (log.width, log.height) == (640, 480)
+    assert len(log) == 3
+
+    t, landmarks, handedness = log[0]
+    assert t == 0.0
+    np.testing.assert_array_equal(landmarks, hands(1))
+    assert handedness == ["Right"]
+
+    t, landmarks, handedness = log[1]
+    assert landmarks.shape == (0, 21, 3)
+    assert handedness == []
+
+    t, landmarks, handedness = log[2]
+    assert t == pytest.approx(0.1)
+    np.testing.assert_array_equal(landmarks, hands(2, 0.5))
+    assert handedness == ["Left", "Right"]
+    assert log.duration() == pytest.approx(0.1)
+    assert list(log.records["seq"]) == [1, 2, 3]
+
+
+def test_extra_hands_are_dropped(tmp_path):
+    path = str(tmp_path / "one.hlog")
+    recorder = LandmarkRecorder(path, 320, 240, max_hands=1)
+    recorder.write(hands(2), ["Left", "Right"], 0.0)
+    recorder.close()
+    _, landmarks, handedness = LandmarkLog(path)[0]
+    np.testing.assert_array_equal(landmarks, hands(1))
+    assert handedness == ["Left"]
+
+
+def test_torn_tail_is_left_out(log_path):
+    with open(log_path, "rb") as f:
+        data = f.read()
+    with open(log_path, "wb") as f:
+        # Crash halfway through the last record
+        f.write(data[:-100])
+    log = LandmarkLog(log_path)
+    assert len(log) == 2
+    np.testing.assert_array_equal(log[0][1], hands(1))
+
+
+def test_header_only(tmp_path):
+    path = str(tmp_path / "empty.hlog")
+    LandmarkRecorder(path, 640, 480).close()
+    log = LandmarkLog(path)
+    assert len(log) == 0
+    assert log.duration() == 0.0
+    assert list(log) == []
+
+
+def test_not_a_log(tmp_path):
+    path = tmp_path / "other.bin"
+    path.write_bytes(b"not a landmark log")
+    with pytest.raises(ValueError):
+        LandmarkLog(str(path))
@@ -0,0 +1,69 @@
+from penTracker import PenTracker
+
+
+def tracker(max_pens=4):
+    return PenTracker({"Right": "red", "Left": "blue"}, "black", max_jump=100, max_pens=max_pens)
+
+
+def frame(pens, tips, handedness):
+    assigned, lost = pens.match(tips, handedness)
+    for pen in lost:
+        pen.lift()
+    return assigned, lost
+
+
+def test_hands_keep_their_pens():
+    pens = tracker()
+    (right, left), _ = frame(pens, [(100, 100), (400, 100)], ["Right", "Left"])
+    assert (right.color, left.color) == ("red", "blue")
+    # Listed the other way round and moved a little
+    assigned, lost = frame(pens, [(410, 110), (90, 105)], ["Left", "Right"])
+    assert assigned == [left, right]
+    assert lost == []
+
+
+def test_same_hand_twice_gets_two_pens():
+    pens = tracker()
+    (a, b), _ = frame(pens, [(100, 100), (400, 100)], ["Right", "Right"])
+    assert a is not b
+    assigned, _ = frame(pens, [(395, 100), (105, 100)], ["Right", "Right"])
+    assert assigned == [b, a]
+
+
+def test_lost_hand_comes_back_to_its_pen():
+    pens = tracker()
+    (right, left), _ = frame(pens, [(100, 100), (400, 100)], ["Right", "Left"])
+    right.color = "green"
+    assigned, lost = frame(pens, [(400, 100)], ["Left"])
+    assert assigned == [left] and lost == [right]
+    assert not right.active
+    # Far from where it was, but the idle pen of that hand is taken back
+    assigned, lost = frame(pens, [(400, 100), (300, 400)], ["Left", "Right"])
+    assert assigned == [left, right]
+    assert right.color == "green"
+
+
+def test_full_tracker_never_evicts_a_pen_matched_this_frame():
+    pens = tracker(max_pens=2)
+    (right, left), _ = frame(pens, [(100, 100), (400, 100)], ["Right", "Left"])
+    frame(pens, [], [])
+    assert not right.active and not left.active
+    # The first hand takes back the idle right pen; the second needs a new
+    # pen, which may only replace the idle left one
+    assigned, _ = frame(pens, [(100, 100), (300, 300)], ["Right", "Right"])
+    assert assigned[0] is right
+    assert all(pen.key in pens.pens for pen in assigned)
+    assert left.key not in pens.pens
+    # Both pens are still tracked, so both are reported when their hands go
+    _, lost = frame(pens, [], [])
+    assert sorted(pen.key for pen in lost) == sorted(pen.key for pen in assigned)
+
+
+def test_missing_handedness():
+    pens = tracker()
+    assigned, _ = frame(pens, [(100, 100), (400, 100)], ["Right"])
+    assert len(assigned) == 2 and None not in assigned
+    assert assigned[1].hand is None and assigned[1].color == "black"
+    # Extra labels without a tip are ignored
+    assigned, _ = frame(pens, [(100, 100)], ["Right", "Left"])
+    assert len(assigned) == 1
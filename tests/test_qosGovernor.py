@@ -0,0 +1,79 @@
+import time
+
+from perfMetrics import Metrics
+from qosGovernor import LEVELS, QosGovernor, frame_delay
+
+
+def governor(**options):
+    return QosGovernor(budget=0.05, window=5, headroom=0.6, hold=20, metrics=Metrics(), **options)
+
+
+def feed(qos, cost, frames):
+    return [qos.record(cost) for _ in range(frames)]
+
+
+def test_steps_down_after_a_window_over_budget():
+    qos = governor()
+    assert feed(qos, 0.08, 4) == [0, 0, 0, 0]
+    assert qos.record(0.08) == 1
+    # The new level is judged on its own frames: one step per window
+    assert feed(qos, 0.08, 5) == [1, 1, 1, 1, 2]
+    assert qos.metrics.counters["qos_level_changes"] == 2
+
+
+def test_a_spike_alone_does_not_step_down():
+    qos = governor()
+    feed(qos, 0.02, 10)
+    # One 150 ms frame in a window of 5 keeps the mean under 50 ms
+    qos.record(0.15)
+    assert feed(qos, 0.02, 10) == [0] * 10
+
+
+def test_level_stops_at_the_last():
+    qos = governor()
+    feed(qos, 1.0, 5 * (len(LEVELS) + 2))
+    assert qos.level == len(LEVELS) - 1
+
+
+def test_steps_up_after_holding_under_the_headroom():
+    qos = governor()
+    feed(qos, 0.08, 10)
+    assert qos.level == 2
+    # Under the budget but above 60 % of it: stays put (hysteresis)
+    assert feed(qos, 0.04, 60) == [2] * 60
+    # Well under: one level back once the mean of the last hold frames drops
+    # under 30 ms (7 frames of 10 ms among 40 ms ones)...
+    levels = feed(qos, 0.01, 27)
+    assert levels[:6] == [2] * 6 and levels[6] == 1
+    # ...and the next after a whole hold at the new level
+    assert levels[7:26] == [1] * 19 and levels[26] == 0
+
+
+def test_costs_are_cleared_on_a_change():
+    qos = governor()
+    feed(qos, 0.08, 5)
+    assert qos.level == 1 and len(qos.costs) == 0
+    # Frames from before the change do not count towards stepping back up
+    assert feed(qos, 0.01, 19) == [1] * 19
+    assert qos.record(0.01) == 0
+
+
+def test_levels_keep_the_savings_of_the_ones_before():
+    qos = governor()
+    expected = [
+        (True, 1.0, 1, 1),
+        (False, 1.0, 1, 1),
+        (False, 0.5, 1, 1),
+        (False, 0.5, 2, 1),
+        (False, 0.5, 2, 2),
+    ]
+    for level, settings in enumerate(expected):
+        qos.level = level
+        assert (qos.draw_landmarks, qos.inference_scale, qos.display_shrink, qos.infer_every) == settings
+
+
+def test_frame_delay():
+    started = time.perf_counter()
+    assert 1 <= frame_delay(started, 0.010) <= 10
+    # A frame that took longer than the period waits the minimum
+    assert frame_delay(started - 1.0, 0.010) == 1
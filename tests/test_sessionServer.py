@@ -0,0 +1,108 @@
+import queue
+import threading
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+import handTrackingModule
+from sessionServer import SessionServer, _worker, parse_source
+
+FRAMES = 12
+
+
+class FakeDetector:
+    """Stands in for handDetector: one right hand at the frame number it was shown."""
+
+    made = []
+
+    def __init__(self, **options):
+        self.seen = []
+        self.stageTimes = {"inference": 0.001}
+        FakeDetector.made.append(self)
+
+    def findHands(self, img, draw=False):
+        self.seen.append(int(round(img.mean() / 10)))
+
+    def findLandmarks(self, img):
+        hand = np.zeros((1, 21, 3), np.float32)
+        hand[0, :, :2] = 10 + 4 * self.seen[-1]
+        return hand, ["Right"], None
+
+
+@pytest.fixture
+def fake_detector(monkeypatch):
+    FakeDetector.made = []
+    monkeypatch.setattr(handTrackingModule, "handDetector", FakeDetector)
+    return FakeDetector
+
+
+def make_video(path, values):
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 30, (64, 48))
+    for v in values:
+        writer.write(np.full((48, 64, 3), v, np.uint8))
+    writer.release()
+    return path
+
+
+def in_threads(server):
+    # The workers run as threads in this process, with the fake tracker
+    server.procs = [threading.Thread(target=_worker, args=(task_q, server.result_q, server.detector_options),
+                                     daemon=True) for task_q in server.task_qs]
+    return server
+
+
+def test_parse_source():
+    assert parse_source("0") == 0
+    assert parse_source("clip.mp4") == "clip.mp4"
+
+
+def test_worker_keeps_a_tracker_per_session(fake_detector):
+    from multiprocessing import shared_memory
+
+    shm = shared_memory.SharedMemory(create=True, size=48 * 64 * 3)
+    try:
+        img = np.ndarray((48, 64, 3), np.uint8, buffer=shm.buf)
+        tasks, results = queue.Queue(), queue.Queue()
+        worker = threading.Thread(target=_worker, args=(tasks, results, {}))
+        worker.start()
+        for session_id, value in ((0, 10), (1, 20), (0, 30)):
+            img[:] = value
+            tasks.put((session_id, shm.name, img.shape, value, 0.0))
+            # The block is one slot: wait for the frame to come back
+            result = results.get(timeout=5.0)
+            assert result[:4] == (session_id, shm.name, value, 0.0)
+            assert result[6] == 0.001
+        tasks.put(None)
+        worker.join(5.0)
+        # The spare tracker went to the first session, a new one to the second
+        assert [d.seen for d in fake_detector.made] == [[1, 3], [2]]
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def test_sessions_paint_every_frame_in_order(fake_detector, tmp_path):
+    first = make_video(str(tmp_path / "a.avi"), [i * 10 for i in range(FRAMES)])
+    second = make_video(str(tmp_path / "b.avi"), [(FRAMES - i) * 10 for i in range(FRAMES)])
+    server = in_threads(SessionServer([first, second], workers=2, mode="board"))
+    server.start()
+    deadline = time.perf_counter() + 20.0
+    while not server.done():
+        assert time.perf_counter() < deadline, "sessions did not finish"
+        time.sleep(0.01)
+    report = server.report()
+    server.stop()
+
+    # Each session was pinned to one tracker that saw all of its frames in order
+    seen = sorted(d.seen for d in fake_detector.made if d.seen)
+    assert seen == sorted([list(range(FRAMES)), list(range(FRAMES, 0, -1))])
+    for sid, session in enumerate(server.sessions):
+        assert session.frame_no == FRAMES and session.applied == FRAMES - 1
+        assert report[sid]["dropped"] == 0 and report[sid]["stale"] == 0
+        assert report[sid]["queue_depth"] == 0
+        # The hand moved along the diagonal: the session's own stroke is on its board
+        assert len(session.board.strokes) == 1
+        assert session.latest.shape == (48, 64, 3)
+    assert "session 1" in server.format_report()
@@ -0,0 +1,220 @@
+import asyncio
+import json
+import socket
+import threading
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+from streamServer import MAX_WS_PAYLOAD, StreamServer, _Client
+
+
+@pytest.fixture
+def stream():
+    # Port 0: any free port
+    server = StreamServer(0, max_fps=0).start()
+    yield server
+    server.stop()
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        assert time.perf_counter() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def read_exactly(sock, n):
+    data = b""
+    while len(data) < n:
+        chunk = sock.recv(n - len(data))
+        if not chunk:
+            raise ConnectionError("closed")
+        data += chunk
+    return data
+
+
+def read_headers(sock):
+    data = b""
+    while not data.endswith(b"\r\n\r\n"):
+        data += read_exactly(sock, 1)
+    return data
+
+
+def ws_connect(stream):
+    sock = socket.create_connection(("127.0.0.1", stream.port), timeout=5.0)
+    sock.sendall(b"GET /ws HTTP/1.1\r\nHost: localhost\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                 b"Sec-WebSocket-Key: dGhlIHNhbXBsZSBub25jZQ==\r\nSec-WebSocket-Version: 13\r\n\r\n")
+    response = read_headers(sock)
+    assert response.startswith(b"HTTP/1.1 101")
+    # The accept key from RFC 6455's example
+    assert b"Sec-WebSocket-Accept: s3pPLMBiTxaQ9kYGzzhZRbK+xOo=" in response
+    wait_until(lambda: stream.ws_clients)
+    return sock
+
+
+def ws_send(sock, opcode, payload, mask=b"\x37\xfa\x21\x3d"):
+    """A masked client frame."""
+    n = len(payload)
+    if n < 126:
+        header = bytes((0x80 | opcode, 0x80 | n))
+    else:
+        header = bytes((0x80 | opcode, 0x80 | 126)) + n.to_bytes(2, "big")
+    masked = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+    sock.sendall(header + mask + masked)
+
+
+def ws_read(sock):
+    head = read_exactly(sock, 2)
+    n = head[1] & 0x7F
+    if n == 126:
+        n = int.from_bytes(read_exactly(sock, 2), "big")
+    elif n == 127:
+        n = int.from_bytes(read_exactly(sock, 8), "big")
+    return head[0] & 0x0F, read_exactly(sock, n)
+
+
+def test_ping_is_unmasked_and_answered(stream):
+    sock = ws_connect(stream)
+    ws_send(sock, 0x9, b"are you there, board?")
+    assert ws_read(sock) == (0xA, b"are you there, board?")
+    ws_send(sock, 0x8, b"")
+    assert ws_read(sock) == (0x8, b"")
+    wait_until(lambda: not stream.ws_clients)
+    sock.close()
+
+
+def test_oversize_frame_closes_with_1009(stream):
+    sock = ws_connect(stream)
+    # Only the header: the payload is never read
+    sock.sendall(bytes((0x81, 0x80 | 126)) + (MAX_WS_PAYLOAD + 1000).to_bytes(2, "big"))
+    opcode, payload = ws_read(sock)
+    assert opcode == 0x8 and int.from_bytes(payload, "big") == 1009
+    assert sock.recv(1) == b""
+    wait_until(lambda: not stream.ws_clients)
+    sock.close()
+
+
+def test_strokes_reach_delta_viewers(stream):
+    sock = ws_connect(stream)
+    stream.publish_strokes([(10, 20, 30, 40, (0, 0, 255), 4, False)])
+    opcode, payload = ws_read(sock)
+    assert opcode == 0x1
+    assert json.loads(payload) == {"type": "strokes", "segments": [[10, 20, 30, 40, "#ff0000", 4, False]]}
+    sock.close()
+
+
+def test_reset_waits_for_a_board_keyframe(stream):
+    sock = ws_connect(stream)
+    board = np.full((48, 64, 3), 255, np.uint8)
+    cv2.line(board, (0, 24), (63, 24), (0, 0, 255), 5)
+    assert not stream.publish_board(board)
+
+    stream.publish_strokes(None)
+    wait_until(lambda: stream.board_wanted)
+    # Deltas drawn before the keyframe are in it; they are not sent
+    stream.publish_strokes([(0, 0, 1, 1, (0, 0, 0), 1, False)])
+    # Camera frames are not keyframes
+    stream.publish(np.zeros((48, 64, 3), np.uint8))
+    assert stream.publish_board(board)
+    assert json.loads(ws_read(sock)[1]) == {"type": "reset"}
+    assert not stream.board_wanted
+
+    # The viewer then fetches the board view
+    fetched = []
+
+    def fetch():
+        http = socket.create_connection(("127.0.0.1", stream.port), timeout=5.0)
+        http.sendall(b"GET /board.jpg?1 HTTP/1.1\r\nHost: localhost\r\n\r\n")
+        headers = read_headers(http)
+        length = int(headers.split(b"Content-Length: ")[1].split(b"\r\n")[0])
+        fetched.append(read_exactly(http, length))
+        http.close()
+
+    thread = threading.Thread(target=fetch)
+    thread.start()
+    wait_until(lambda: stream.board_wanted)
+    stream.publish_board(board)
+    thread.join(5.0)
+    img = cv2.imdecode(np.frombuffer(fetched[0], np.uint8), cv2.IMREAD_COLOR)
+    assert img.shape == board.shape
+    np.testing.assert_allclose(img[24, 32], (0, 0, 255), atol=40)
+    np.testing.assert_allclose(img[5, 32], (255, 255, 255), atol=40)
+    sock.close()
+
+
+def test_mjpeg_viewer_gets_frames(stream):
+    sock = socket.create_connection(("127.0.0.1", stream.port), timeout=5.0)
+    sock.sendall(b"GET /stream.mjpg HTTP/1.1\r\nHost: localhost\r\n\r\n")
+    assert b"multipart/x-mixed-replace" in read_headers(sock)
+    wait_until(lambda: stream.mjpeg_clients)
+    assert stream.publish(np.full((48, 64, 3), 128, np.uint8))
+    part = read_headers(sock)
+    length = int(part.split(b"Content-Length: ")[1].split(b"\r\n")[0])
+    img = cv2.imdecode(np.frombuffer(read_exactly(sock, length), np.uint8), cv2.IMREAD_COLOR)
+    assert img.shape == (48, 64, 3)
+    sock.close()
+
+
+class FakeTransport:
+    def __init__(self):
+        self.buffered = 0
+
+    def get_write_buffer_size(self):
+        return self.buffered
+
+
+class FakeWriter:
+    def __init__(self):
+        self.transport = FakeTransport()
+        self.frames = 0
+        self.closed = False
+
+    def writelines(self, parts):
+        self.frames += 1
+
+    def write(self, data):
+        self.frames += 1
+
+    def close(self):
+        self.closed = True
+
+
+def test_slow_client_skips_frames():
+    stream = StreamServer(0, write_timeout=0.5)
+    stream.frame_event = asyncio.Event()
+    fast, slow = _Client(FakeWriter()), _Client(FakeWriter())
+    stream.mjpeg_clients = [fast, slow]
+
+    slow.writer.transport.buffered = 1000
+    for _ in range(3):
+        stream._send_frame(b"jpeg")
+    assert fast.writer.frames == 3 and fast.skipped == 0
+    assert slow.writer.frames == 0 and slow.skipped == 3
+    # Once its socket has drained it gets the newest frame, not the backlog
+    slow.writer.transport.buffered = 0
+    stream._send_frame(b"jpeg")
+    assert slow.writer.frames == 1 and slow.skipped == 3
+    assert stream.report()["skipped"] == 3
+
+    # Stuck past the write timeout: dropped
+    slow.writer.transport.buffered = 1000
+    slow.since -= 1.0
+    stream._send_frame(b"jpeg")
+    assert stream.mjpeg_clients == [fast] and slow.writer.closed
+
+
+def test_behind_delta_viewer_is_sent_a_reset():
+    stream = StreamServer(0)
+    viewer = _Client(FakeWriter())
+    stream.ws_clients = [viewer]
+    viewer.writer.transport.buffered = 1000
+    stream._send_strokes(b"delta")
+    assert viewer.resync and viewer.writer.frames == 0
+    viewer.writer.transport.buffered = 0
+    stream._send_strokes(b"delta")
+    # It missed a delta: it reloads the board instead
+    assert not viewer.resync and viewer.writer.frames == 1
+    assert stream.board_wanted
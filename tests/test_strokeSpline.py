@@ -0,0 +1,114 @@
+import numpy as np
+import pytest
+
+from strokeSpline import StrokeSpline, centripetal, figure_eight, interpolate, pairs, point_counts
+
+
+def barry_goldman(p0, p1, p2, p3, s, alpha=0.5):
+    """Reference point on the centripetal Catmull-Rom piece p1 -> p2 at fraction s."""
+    p = [np.asarray(v, np.float64) for v in (p0, p1, p2, p3)]
+    knots = [0.0]
+    for a, b in zip(p[:-1], p[1:]):
+        knots.append(knots[-1] + max(np.linalg.norm(b - a) ** alpha, 1e-6))
+    t0, t1, t2, t3 = knots
+    t = t1 + s * (t2 - t1)
+    a1 = (t1 - t) / (t1 - t0) * p[0] + (t - t0) / (t1 - t0) * p[1]
+    a2 = (t2 - t) / (t2 - t1) * p[1] + (t - t1) / (t2 - t1) * p[2]
+    a3 = (t3 - t) / (t3 - t2) * p[2] + (t - t2) / (t3 - t2) * p[3]
+    b1 = (t2 - t) / (t2 - t0) * a1 + (t - t0) / (t2 - t0) * a2
+    b2 = (t3 - t) / (t3 - t1) * a2 + (t - t1) / (t3 - t1) * a3
+    return (t2 - t) / (t2 - t1) * b1 + (t - t1) / (t2 - t1) * b2
+
+
+def test_centripetal_matches_pyramid():
+    rng = np.random.default_rng(1)
+    pts = rng.uniform(0, 500, (4, 3, 2))
+    counts = [5, 1, 8]
+    curve = centripetal(*pts, counts)
+    assert curve.shape == (sum(counts), 2)
+    i = 0
+    for piece, n in enumerate(counts):
+        for k in range(1, n + 1):
+            expected = barry_goldman(*pts[:, piece], k / n)
+            np.testing.assert_allclose(curve[i], expected, atol=1e-9)
+            i += 1
+
+
+def test_centripetal_ends_on_samples():
+    p = np.array([[0, 0], [10, 0], [20, 10], [20, 30]], np.float64)
+    curve = centripetal(p[0:1], p[1:2], p[2:3], p[3:4], [6])
+    np.testing.assert_allclose(curve[-1], p[2])
+
+
+def test_repeated_samples_do_not_blow_up():
+    p = np.array([[5.0, 5.0]])
+    curve = centripetal(p, p, p + 10, p + 10, [4])
+    assert np.all(np.isfinite(curve))
+    np.testing.assert_allclose(curve[-1], [15, 15])
+
+
+def test_point_counts():
+    counts = point_counts(np.zeros((3, 2)), np.array([[0, 0], [10, 0], [1000, 0]]), 4, 32)
+    assert counts.tolist() == [1, 3, 32]
+
+
+def test_interpolate_passes_through_samples():
+    samples = np.array([[0, 0], [40, 10], [80, 0], [120, 30]], np.float64)
+    curve = interpolate(samples, spacing=4)
+    np.testing.assert_allclose(curve[0], samples[0])
+    np.testing.assert_allclose(curve[-1], samples[-1])
+    for point in samples:
+        assert np.min(np.hypot(*(curve - point).T)) < 1e-9
+    # Two samples are already a line
+    assert interpolate(samples[:2]).tolist() == samples[:2].tolist()
+
+
+def test_pairs():
+    assert pairs(np.array([[0, 0], [1, 2], [3, 4]])) == [(0, 0, 1, 2), (1, 2, 3, 4)]
+
+
+def test_stroke_joins_up_and_reaches_last_sample():
+    times = np.arange(0, 1.2, 1 / 12)
+    samples = np.rint(figure_eight(times))
+    spline = StrokeSpline()
+    pieces = [spline.add(x, y, t) for (x, y), t in zip(samples.tolist(), times.tolist())]
+    # The curve runs one sample behind: nothing until the third sample
+    assert not len(pieces[0]) and not len(pieces[1]) and len(pieces[2])
+    pieces.append(spline.finish())
+    pieces = [p for p in pieces if len(p)]
+    for before, after in zip(pieces[:-1], pieces[1:]):
+        assert before[-1].tolist() == after[0].tolist()
+    assert pieces[0][0].tolist() == samples[0].tolist()
+    assert pieces[-1][-1].tolist() == samples[-1].tolist()
+    # finish() starts over
+    assert not len(spline.finish())
+
+
+def test_points_about_spacing_apart():
+    spline = StrokeSpline(spacing=4)
+    out = [spline.add(x, 0.0) for x in (0.0, 40.0, 80.0, 120.0)]
+    line = out[0]
+    for piece in out[1:] + [spline.finish()]:
+        line = StrokeSpline._join(line, piece)
+    steps = np.hypot(*np.diff(line, axis=0).T)
+    assert steps.max() <= 5
+    assert np.all(steps > 0)
+    assert line[-1].tolist() == [120, 0]
+
+
+def test_gap_in_time_is_not_curved():
+    spline = StrokeSpline(max_gap=0.25)
+    for x, t in ((0, 0.0), (20, 0.05), (40, 0.1)):
+        spline.add(x, 0, t)
+    # The hand was lost for a second: the stroke up to here is finished first
+    out = spline.add(200, 100, 1.1)
+    assert out[-1].tolist() == [40, 0]
+    assert len(spline.samples) == 2
+
+
+@pytest.mark.parametrize("n", [0, 1])
+def test_finish_without_a_piece(n):
+    spline = StrokeSpline()
+    for i in range(n):
+        spline.add(i * 10, 0)
+    assert not len(spline.finish())
@@ -0,0 +1,127 @@
+import numpy as np
+
+from strokeStore import StrokeStore
+
+
+def draw(store, points, color=(0, 0, 255), width=6, eraser=False):
+    sid = store.begin(*points[0], color, width, eraser)
+    for x, y in points[1:]:
+        store.add_point(sid, x, y)
+    store.finish(sid)
+    return sid
+
+
+def test_points_of_open_and_finished_strokes():
+    store = StrokeStore(640, 480)
+    sid = store.begin(10, 10, (0, 0, 255), 4)
+    store.add_point(sid, 20, 15)
+    assert store.stroke_points(sid).tolist() == [[10, 10], [20, 15]]
+    store.finish(sid)
+    assert store.stroke_points(sid).tolist() == [[10, 10], [20, 15]]
+    assert store.stroke_sizes(sid).tolist() == [4, 4]
+    assert len(store) == 1
+
+
+def test_undo_redo_add():
+    store = StrokeStore(640, 480)
+    a = draw(store, [(10, 10), (100, 10)])
+    b = draw(store, [(10, 50), (100, 50)])
+    assert store.undo() == [b]
+    assert store.visible == [True, False]
+    assert store.redo() == [b]
+    assert store.visible == [True, True]
+    assert store.undo() == [b]
+    assert store.undo() == [a]
+    assert store.undo() == []
+    assert store.visible == [False, False]
+
+
+def test_new_stroke_clears_redo():
+    store = StrokeStore(640, 480)
+    draw(store, [(10, 10), (100, 10)])
+    store.undo()
+    draw(store, [(10, 50), (100, 50)])
+    assert store.redo() == []
+
+
+def test_undo_finishes_open_stroke():
+    store = StrokeStore(640, 480)
+    sid = store.begin(10, 10, (0, 0, 255), 4)
+    store.add_point(sid, 50, 10)
+    assert store.undo() == [sid]
+    assert sid not in store.open
+    assert store.stroke_points(sid).tolist() == [[10, 10], [50, 10]]
+
+
+def test_erase_is_undoable():
+    store = StrokeStore(640, 480)
+    a = draw(store, [(10, 10), (100, 10)])
+    b = draw(store, [(10, 200), (100, 200)])
+    assert store.erase_at(50, 12, 5) == [a]
+    assert store.visible == [False, True]
+    # Nothing left there to erase
+    assert store.erase_at(50, 12, 5) == []
+    assert store.undo() == [a]
+    assert store.visible == [True, True]
+    assert store.redo() == [a]
+    assert store.visible == [False, True]
+    assert b not in store.hit_test(50, 12, 5)
+
+
+def test_clear_is_undoable():
+    store = StrokeStore(640, 480)
+    draw(store, [(10, 10), (100, 10)])
+    draw(store, [(10, 200), (100, 200)])
+    assert store.clear() == [0, 1]
+    assert store.clear() == []
+    assert store.undo() == [0, 1]
+    assert store.visible == [True, True]
+
+
+def test_hit_test_reaches_stroke_width():
+    store = StrokeStore(640, 480)
+    sid = draw(store, [(100, 100), (300, 100)], width=10)
+    assert store.hit_test(200, 100) == [sid]
+    # Half the width away from the center line still touches it
+    assert store.hit_test(200, 104) == [sid]
+    assert store.hit_test(200, 110) == []
+    assert store.hit_test(200, 110, radius=6) == [sid]
+    # Past the end of the segment
+    assert store.hit_test(320, 100) == []
+
+
+def test_hit_test_skips_erasers_and_hidden():
+    store = StrokeStore(640, 480)
+    ink = draw(store, [(100, 100), (300, 100)])
+    draw(store, [(100, 100), (300, 100)], eraser=True)
+    assert store.hit_test(200, 100) == [ink]
+    store.erase_at(200, 100, 2)
+    assert store.hit_test(200, 100) == []
+
+
+def test_hit_test_across_grid_cells():
+    store = StrokeStore(1280, 720, cell=64)
+    sid = draw(store, [(10, 10), (1000, 600)])
+    x, y = 505, 10 + (505 - 10) * 590 / 990
+    assert store.hit_test(x, y, 1) == [sid]
+    # In the stroke's bounding box but far from the line
+    assert store.hit_test(950, 30, 5) == []
+
+
+def test_state_round_trip():
+    store = StrokeStore(640, 480)
+    draw(store, [(10, 10), (100, 10), (100, 80)], color=(255, 0, 0), width=3)
+    draw(store, [(200, 200), (300, 250)])
+    store.erase_at(250, 225, 2)
+    open_sid = store.begin(5, 400, (0, 255, 0), 8)
+    store.add_point(open_sid, 60, 400)
+
+    restored = StrokeStore.from_state(store.state())
+    assert len(restored) == 3
+    assert restored.visible == [True, False, True]
+    assert restored.color == [(255, 0, 0), (0, 0, 255), (0, 255, 0)]
+    for sid in range(3):
+        np.testing.assert_array_equal(restored.stroke_points(sid), store.stroke_points(sid))
+    assert restored.hit_test(50, 10) == [0]
+    assert restored.hit_test(30, 400) == [2]
+    assert restored.undo() == []
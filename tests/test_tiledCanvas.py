@@ -0,0 +1,190 @@
+import cv2
+import numpy as np
+import pytest
+
+from tiledCanvas import InfiniteBoard, InfiniteWhiteboard, TiledCanvas, Viewport
+
+
+def line(x0, y0, x1, y1):
+    return np.array(((x0, y0), (x1, y1)), np.int32)
+
+
+def dense(tiles):
+    """The whole board as one canvas and ink mask."""
+    canvas = np.zeros((tiles.height, tiles.width, 3), np.uint8)
+    ink = np.zeros((tiles.height, tiles.width), np.uint8)
+    t = tiles.tile
+    for (tx, ty), (tile_canvas, tile_ink) in tiles.tiles.items():
+        canvas[ty * t:(ty + 1) * t, tx * t:(tx + 1) * t] = tile_canvas
+        ink[ty * t:(ty + 1) * t, tx * t:(tx + 1) * t] = tile_ink
+    return canvas, ink
+
+
+def reference(width, height, strokes):
+    """Dense canvas and ink drawn with plain cv2.line: (line, color, thickness, eraser)."""
+    canvas = np.zeros((height, width, 3), np.uint8)
+    ink = np.zeros((height, width), np.uint8)
+    for (p0, p1), color, thickness, eraser in strokes:
+        cv2.line(canvas, tuple(p0), tuple(p1), color, thickness)
+        cv2.line(ink, tuple(p0), tuple(p1), 0 if eraser else 1, thickness)
+    return canvas, ink
+
+
+def test_lines_across_tile_borders_have_no_seams():
+    tiles = TiledCanvas(256, 256, tile=64)
+    strokes = [(line(10, 10, 250, 200), (0, 0, 255), 9, False),
+               (line(64, 0, 64, 255), (255, 0, 0), 4, False),
+               (line(200, 30, 20, 240), (0, 255, 0), 15, False)]
+    for stroke in strokes:
+        tiles.draw_lines([stroke[0]], *stroke[1:])
+    canvas, ink = dense(tiles)
+    ref_canvas, ref_ink = reference(256, 256, strokes)
+    np.testing.assert_array_equal(ink, ref_ink)
+    np.testing.assert_array_equal(canvas[ink > 0], ref_canvas[ref_ink > 0])
+
+
+def test_only_inked_tiles_exist():
+    tiles = TiledCanvas(1024, 1024, tile=64)
+    tiles.draw_lines([line(100, 100, 120, 100)], (0, 0, 255), 4)
+    assert sorted(tiles.tiles) == [(1, 1)]
+    assert tiles.nbytes() == 64 * 64 * 4
+    # Lines off the board allocate nothing
+    tiles.draw_lines([line(-50, -50, -10, -10)], (0, 0, 255), 4)
+    assert sorted(tiles.tiles) == [(1, 1)]
+
+
+def test_erasing_across_borders_frees_empty_tiles():
+    tiles = TiledCanvas(256, 256, tile=64)
+    tiles.draw_lines([line(40, 100, 150, 100)], (0, 0, 255), 6)
+    tiles.draw_lines([line(150, 200, 160, 200)], (0, 0, 255), 6)
+    assert sorted(tiles.tiles) == [(0, 1), (1, 1), (2, 1), (2, 3)]
+    # Erase the middle of the first line: the tile it covered completely goes
+    tiles.draw_lines([line(60, 100, 132, 100)], (0, 0, 0), 20, eraser=True)
+    assert sorted(tiles.tiles) == [(0, 1), (2, 1), (2, 3)]
+    _, ink = dense(tiles)
+    assert ink[100, 45] == 1 and ink[100, 100] == 0 and ink[100, 145] == 1
+    # The eraser never creates tiles
+    tiles.draw_lines([line(10, 10, 30, 10)], (0, 0, 0), 20, eraser=True)
+    assert (0, 0) not in tiles.tiles
+
+
+def test_blit_replaces_a_region():
+    tiles = TiledCanvas(256, 256, tile=64)
+    tiles.draw_lines([line(10, 10, 250, 10)], (0, 0, 255), 6)
+    canvas = np.zeros((40, 100, 3), np.uint8)
+    ink = np.zeros((40, 100), np.uint8)
+    canvas[20:30, 50:60] = (255, 0, 0)
+    ink[20:30, 50:60] = 1
+    tiles.blit((100, 100, 200, 140), canvas, ink)
+    board_canvas, board_ink = dense(tiles)
+    assert board_ink[125, 155] == 1 and board_canvas[125, 155].tolist() == [255, 0, 0]
+    # Blitting an empty region over the first line frees what it emptied
+    tiles.blit((0, 0, 256, 64), np.zeros((64, 256, 3), np.uint8), np.zeros((64, 256), np.uint8))
+    assert all(ty != 0 for _, ty in tiles.tiles)
+
+
+@pytest.mark.parametrize("origin, zoom", [((0, 0), 1.0), ((30, 50), 1.0), ((40, 20), 2.0),
+                                          ((16, 8), 0.5), ((0, 0), 0.25), ((70, 90), 4.0)])
+def test_render_matches_a_dense_warp(origin, zoom):
+    tiles = TiledCanvas(512, 512, tile=64)
+    strokes = [(line(10, 10, 500, 400), (0, 0, 255), 9, False),
+               (line(300, 20, 40, 480), (255, 128, 0), 5, False),
+               (line(128, 0, 128, 511), (0, 200, 0), 3, False)]
+    for stroke in strokes:
+        tiles.draw_lines([stroke[0]], *stroke[1:])
+    board_canvas, board_ink = dense(tiles)
+
+    canvas = np.full((120, 160, 3), 7, np.uint8)
+    ink = np.full((120, 160), 7, np.uint8)
+    tiles.render(origin, zoom, canvas, ink)
+    m = np.float32([[zoom, 0, -origin[0] * zoom], [0, zoom, -origin[1] * zoom]])
+    ref_canvas = cv2.warpAffine(board_canvas, m, (160, 120), flags=cv2.INTER_NEAREST)
+    ref_ink = cv2.warpAffine(board_ink, m, (160, 120), flags=cv2.INTER_NEAREST)
+    np.testing.assert_array_equal(ink, ref_ink)
+    np.testing.assert_array_equal(canvas, ref_canvas)
+
+
+def test_viewport_zoom_keeps_the_point_under_the_cursor():
+    view = Viewport(640, 480, 4096, 4096)
+    assert view.to_board(0, 0) == (1728, 1808)
+    before = view.to_board(100, 50)
+    view.zoom_at(2.0, 100, 50)
+    assert view.zoom == 2.0
+    assert view.to_board(100, 50) == before
+    view.zoom_at(100.0)
+    assert view.zoom == view.max_zoom
+    # Panning stops at the board edge
+    view.pan(1e6, 1e6)
+    assert (view.x, view.y) == (0.0, 0.0)
+
+
+def painted(board, points):
+    for x, y in points:
+        board.stroke((x, y), t=None)
+    board.stroke(None)
+
+
+def test_infinite_board_undo_rerasterizes_the_tiles():
+    board = InfiniteBoard(320, 240, smooth=False, board_size=(2048, 2048), tile=64)
+    painted(board, [(20, 20), (300, 20)])
+    first = {key: (c.copy(), i.copy()) for key, (c, i) in board.tiles.tiles.items()}
+    painted(board, [(20, 100), (300, 200)])
+    view = board.compose_board().copy()
+    board.undo()
+    board.run_commands()
+    assert sorted(board.tiles.tiles) == sorted(first)
+    for key, (c, i) in first.items():
+        np.testing.assert_array_equal(board.tiles.tiles[key][1], i)
+    board.redo()
+    board.run_commands()
+    np.testing.assert_array_equal(board.compose_board(), view)
+    board.undo()
+    board.undo()
+    board.run_commands()
+    assert board.tiles.tiles == {}
+    assert np.all(board.compose_board() == 255)
+
+
+def test_infinite_board_pan_and_zoom():
+    board = InfiniteBoard(320, 240, smooth=False, board_size=(2048, 2048), tile=64)
+    painted(board, [(100, 100), (200, 100)])
+    x, y = board.view.to_board(150, 100)
+    assert board.compose_board()[100, 150].tolist() == [0, 0, 255]
+    board.pan(-50, 0)
+    board.run_commands()
+    assert board.compose_board()[100, 100].tolist() == [0, 0, 255]
+    assert board.compose_board()[100, 175].tolist() == [255, 255, 255]
+    # The stroke stays where it is on the board
+    assert board.strokes.hit_test(x, y) == [0]
+    board.zoom(2.0, 100, 100)
+    board.run_commands()
+    out = board.compose_board()
+    assert out[100, 100].tolist() == [0, 0, 255] and out[100, 180].tolist() == [0, 0, 255]
+
+
+def test_infinite_board_clear_drops_the_tiles():
+    board = InfiniteBoard(320, 240, smooth=False, board_size=(2048, 2048), tile=64)
+    painted(board, [(20, 20), (300, 200)])
+    board.clear()
+    board.run_commands()
+    assert board.tiles.tiles == {}
+    board.undo()
+    board.run_commands()
+    assert board.tiles.tiles
+    assert board.compose_board()[20, 20].tolist() == [0, 0, 255]
+
+
+def test_infinite_whiteboard():
+    board = InfiniteWhiteboard(320, 240, board_size=(2048, 2048), tile=64)
+    board.draw_segment(20, 20, 200, 20, 6, "red")
+    board.end_stroke()
+    frame = np.full((240, 320, 3), 90, np.uint8)
+    assert board.compose(frame)[20, 100].tolist() == [0, 0, 255]
+    board.pan(0, 40)
+    assert board.compose(frame)[60, 100].tolist() == [0, 0, 255]
+    board.undo()
+    out = board.compose(frame)
+    assert out[60, 100].tolist() == [90, 90, 90]
+    assert board.tiles.tiles == {}
+    board.clear()
+    assert board.strokes.open == {}
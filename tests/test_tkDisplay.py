@@ -0,0 +1,103 @@
+import cv2
+import numpy as np
+import pytest
+
+from tkDisplay import DisplayFrame, TkDisplay
+
+
+def display(size=(160, 120), buffers=3):
+    # With a fixed size no widget is needed until something is pasted
+    shown = TkDisplay(None, size, buffers)
+    shown.pasted = []
+    shown._paste = lambda image: shown.pasted.append(np.asarray(image).copy())
+    return shown
+
+
+def frame(width, height, seed=0):
+    return np.random.default_rng(seed).integers(0, 256, (height, width, 3), np.uint8)
+
+
+@pytest.mark.parametrize("source", [(160, 120), (64, 48), (640, 480)])
+def test_convert_resizes_to_rgba(source):
+    shown = display()
+    img = frame(*source)
+    rgba = shown.convert(img)
+    assert isinstance(rgba, DisplayFrame) and rgba.shape == (120, 160, 4)
+    assert (rgba[..., 3] == 255).all()
+    expected = cv2.cvtColor(cv2.resize(img, (160, 120)), cv2.COLOR_BGR2RGB)
+    # Upscaling converts before resizing, so allow for rounding
+    np.testing.assert_allclose(rgba[..., :3], expected, atol=1)
+
+
+def test_shrink_converts_at_a_smaller_size():
+    shown = display()
+    shown.shrink = 2
+    assert shown.convert(frame(160, 120)).shape == (60, 80, 4)
+
+
+def test_claim_skips_the_pasted_and_newest_buffers():
+    shown = display()
+    shown.convert(frame(160, 120))
+    for pasting in (0, 1, 2):
+        shown.pasting = pasting
+        for _ in range(10):
+            newest = shown.handed_out
+            buf = shown._claim()
+            assert buf.index not in (pasting, newest)
+            assert buf.generation == shown.generation
+
+
+def test_convert_while_pasting_uses_another_buffer():
+    shown = display()
+    first = shown.convert(frame(160, 120, 1))
+    claimed = []
+
+    def paste(image):
+        # The compose worker keeps converting while the Tk thread pastes
+        claimed.extend(shown.convert(frame(160, 120, 2)).index for _ in range(5))
+        shown.pasted.append(np.asarray(image).copy())
+
+    shown._paste = paste
+    shown.show(first)
+    assert first.index not in claimed
+    assert shown.pasting is None
+    np.testing.assert_array_equal(shown.pasted[0], first)
+
+
+def test_show_pastes_the_buffer():
+    shown = display()
+    rgba = shown.convert(frame(160, 120))
+    shown.show(rgba)
+    assert len(shown.pasted) == 1
+    np.testing.assert_array_equal(shown.pasted[0], rgba)
+
+
+def test_show_drops_a_reused_buffer():
+    shown = display(buffers=3)
+    stale = shown.convert(frame(160, 120, 1))
+    newer = [shown.convert(frame(160, 120, i)) for i in range(2, 5)]
+    # The third conversion after it reused its buffer for a newer frame
+    assert newer[-1].index == stale.index
+    shown.show(stale)
+    assert shown.pasted == []
+    shown.show(newer[-1])
+    assert len(shown.pasted) == 1
+
+
+def test_show_drops_a_buffer_from_before_a_resize():
+    shown = display()
+    old = shown.convert(frame(160, 120))
+    shown.size = (80, 60)
+    new = shown.convert(frame(160, 120))
+    assert new.shape == (60, 80, 4)
+    shown.show(old)
+    assert shown.pasted == []
+    shown.show(new)
+    assert len(shown.pasted) == 1
+
+
+def test_show_ignores_plain_arrays():
+    shown = display()
+    shown.convert(frame(160, 120))
+    shown.show(np.zeros((120, 160, 4), np.uint8))
+    assert shown.pasted == []
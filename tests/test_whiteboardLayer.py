@@ -0,0 +1,94 @@
+import numpy as np
+
+from whiteboardLayer import WhiteboardLayer
+
+
+def camera(value=90):
+    return np.full((240, 320, 3), value, np.uint8)
+
+
+def snapshot(layer):
+    # The layer's pixels only count where the mask shows them
+    return layer.mask.copy(), layer.layer * layer.mask[..., None]
+
+
+def assert_same(a, b):
+    np.testing.assert_array_equal(a[0], b[0])
+    np.testing.assert_array_equal(a[1], b[1])
+
+
+def test_strokes_over_the_camera():
+    board = WhiteboardLayer(320, 240)
+    board.draw_segment(20, 20, 200, 20, 6, "red")
+    out = board.compose(camera())
+    assert out[20, 100].tolist() == [0, 0, 255]
+    assert out[100, 100].tolist() == [90, 90, 90]
+    # The camera frame is resized to the layer
+    out = board.compose(np.full((480, 640, 3), 30, np.uint8))
+    assert out.shape == (240, 320, 3) and out[100, 100].tolist() == [30, 30, 30]
+
+
+def test_eraser_uncovers_the_camera():
+    board = WhiteboardLayer(320, 240)
+    board.draw_segment(20, 20, 200, 20, 6, "red")
+    board.end_stroke()
+    board.draw_segment(100, 0, 100, 60, 20, "white")
+    out = board.compose(camera())
+    assert out[20, 100].tolist() == [90, 90, 90]
+    assert out[20, 40].tolist() == [0, 0, 255]
+    assert len(board.strokes) == 2 and board.strokes.eraser == [False, True]
+
+
+def test_color_change_starts_a_stroke():
+    board = WhiteboardLayer(320, 240)
+    board.draw_segment(20, 20, 50, 20, 4, "red")
+    board.draw_segment(50, 20, 80, 20, 4, "red")
+    board.draw_segment(80, 20, 110, 20, 4, "blue")
+    board.end_stroke()
+    assert len(board.strokes) == 2
+    assert board.strokes.stroke_points(0).tolist() == [[20, 20], [50, 20], [80, 20]]
+
+
+def test_undo_redo():
+    board = WhiteboardLayer(320, 240)
+    empty = snapshot(board)
+    board.draw_segment(20, 20, 200, 20, 6, "red")
+    board.draw_segment(200, 20, 200, 150, 6, "red")
+    board.compose(camera())
+    drawn = snapshot(board)
+    board.undo()
+    board.compose(camera())
+    assert_same(snapshot(board), empty)
+    board.redo()
+    board.compose(camera())
+    assert_same(snapshot(board), drawn)
+
+
+def test_clear_finishes_open_strokes():
+    board = WhiteboardLayer(320, 240)
+    board.draw_segment(20, 20, 200, 20, 6, "red", pen=0)
+    board.draw_segment(20, 100, 200, 100, 6, "blue", pen=1)
+    board.clear()
+    assert board.strokes.open == {}
+    assert board.strokes.visible == [False, False]
+    assert not board.mask.any()
+    # A pen drawing on after the clear starts a new stroke
+    board.draw_segment(200, 100, 250, 100, 6, "blue", pen=1)
+    board.end_stroke()
+    assert len(board.strokes) == 3 and board.strokes.open == {}
+
+
+def test_undo_clear():
+    board = WhiteboardLayer(320, 240)
+    board.draw_segment(20, 20, 200, 20, 6, "red")
+    board.end_stroke()
+    board.draw_segment(20, 100, 200, 100, 6, "blue", pen=1)
+    board.compose(camera())
+    drawn = snapshot(board)
+    board.clear()
+    board.undo()
+    board.compose(camera())
+    assert_same(snapshot(board), drawn)
+    board.redo()
+    board.compose(camera())
+    assert not board.mask.any()
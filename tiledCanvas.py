@@ -0,0 +1,366 @@
+import cv2
+import numpy as np
+
+from paintingBoard import PaintingBoard
+from strokeStore import StrokeStore
+from whiteboardLayer import WhiteboardLayer
+
+# Board size in pixels for the large boards; only inked tiles are allocated
+BOARD_SIZE = (16384, 16384)
+
+
+class TiledCanvas:
+    """Sparse raster canvas made of fixed-size tiles.
+
+    A tile (color + ink mask) is allocated the first time something is drawn
+    on it and released when erasing leaves it empty, so memory follows the
+    inked area, not the board size. render() only touches the tiles that
+    intersect the viewport.
+    """
+
+    def __init__(self, width, height, tile=256):
+        self.width = width
+        self.height = height
+        self.tile = tile
+        self.tiles = {}  # (tx, ty) -> (color (t, t, 3), ink (t, t))
+
+    def nbytes(self):
+        return len(self.tiles) * self.tile * self.tile * 4
+
+    def _tile_range(self, x0, y0, x1, y1):
+        t = self.tile
+        tx0, tx1 = max(int(x0) // t, 0), min(int(x1) // t + 1, (self.width + t - 1) // t)
+        ty0, ty1 = max(int(y0) // t, 0), min(int(y1) // t + 1, (self.height + t - 1) // t)
+        return tx0, ty0, tx1, ty1
+
+    def _get(self, key, create):
+        tile = self.tiles.get(key)
+        if tile is None and create:
+            t = self.tile
+            tile = self.tiles[key] = (np.zeros((t, t, 3), np.uint8), np.zeros((t, t), np.uint8))
+        return tile
+
+    def draw_lines(self, lines, color, thickness, eraser=False):
+        """Draw (2, 2) int32 point pairs in board coordinates.
+
+        Each line is rasterized whole into a small scratch mask and then
+        copied into the tiles it covers; drawing it clipped per tile would
+        leave seams, since OpenCV rasterizes a clipped thick line differently.
+        """
+        t = self.tile
+        r = thickness // 2 + 2
+        for line in lines:
+            (x0, y0), (x1, y1) = line
+            mx0, my0 = min(x0, x1) - r, min(y0, y1) - r
+            mask = np.zeros((max(y0, y1) + r + 1 - my0, max(x0, x1) + r + 1 - mx0), np.uint8)
+            cv2.line(mask, (x0 - mx0, y0 - my0), (x1 - mx0, y1 - my0), 1, thickness)
+            mh, mw = mask.shape
+            tx0, ty0, tx1, ty1 = self._tile_range(mx0, my0, mx0 + mw - 1, my0 + mh - 1)
+            for ty in range(ty0, ty1):
+                for tx in range(tx0, tx1):
+                    # Overlap of the scratch with this tile, in board coordinates
+                    bx0, by0 = max(mx0, tx * t), max(my0, ty * t)
+                    bx1, by1 = min(mx0 + mw, (tx + 1) * t), min(my0 + mh, (ty + 1) * t)
+                    covered = mask[by0 - my0:by1 - my0, bx0 - mx0:bx1 - mx0].view(bool)
+                    if not covered.any():
+                        continue
+                    # The eraser never needs a new tile
+                    tile = self._get((tx, ty), create=not eraser)
+                    if tile is None:
+                        continue
+                    canvas, ink = tile
+                    region = (slice(by0 - ty * t, by1 - ty * t), slice(bx0 - tx * t, bx1 - tx * t))
+                    canvas[region][covered] = color
+                    ink[region][covered] = 0 if eraser else 1
+                    if eraser and not ink.any():
+                        del self.tiles[(tx, ty)]
+
+    def blit(self, rect, canvas, ink):
+        """Replace the board region rect = (x0, y0, x1, y1) with canvas/ink of its size."""
+        t = self.tile
+        x0, y0, x1, y1 = rect
+        tx0, ty0, tx1, ty1 = self._tile_range(x0, y0, x1 - 1, y1 - 1)
+        for ty in range(ty0, ty1):
+            for tx in range(tx0, tx1):
+                # Overlap of the rect with this tile, in board coordinates
+                bx0, by0 = max(x0, tx * t), max(y0, ty * t)
+                bx1, by1 = min(x1, (tx + 1) * t), min(y1, (ty + 1) * t)
+                src_ink = ink[by0 - y0:by1 - y0, bx0 - x0:bx1 - x0]
+                tile = self._get((tx, ty), create=bool(src_ink.any()))
+                if tile is None:
+                    continue
+                dst_canvas, dst_ink = tile
+                dst_canvas[by0 - ty * t:by1 - ty * t, bx0 - tx * t:bx1 - tx * t] = \
+                    canvas[by0 - y0:by1 - y0, bx0 - x0:bx1 - x0]
+                dst_ink[by0 - ty * t:by1 - ty * t, bx0 - tx * t:bx1 - tx * t] = src_ink
+                if not dst_ink.any():
+                    del self.tiles[(tx, ty)]
+
+    def render(self, origin, zoom, canvas, ink):
+        """Draw the viewport whose top-left board point is origin into canvas/ink.
+
+        canvas and ink are viewport-sized buffers; zoom is screen pixels per
+        board pixel.
+        """
+        canvas[:] = 0
+        ink[:] = 0
+        h, w = ink.shape
+        t = self.tile
+        ox, oy = origin
+        tx0, ty0, tx1, ty1 = self._tile_range(ox, oy, ox + w / zoom, oy + h / zoom)
+        if (tx1 - tx0) * (ty1 - ty0) <= len(self.tiles):
+            keys = [(tx, ty) for ty in range(ty0, ty1) for tx in range(tx0, tx1) if (tx, ty) in self.tiles]
+        else:
+            keys = [k for k in self.tiles if tx0 <= k[0] < tx1 and ty0 <= k[1] < ty1]
+
+        flags = cv2.INTER_NEAREST
+        for tx, ty in keys:
+            tile_canvas, tile_ink = self.tiles[(tx, ty)]
+            # Screen position of the tile's top-left corner
+            sx, sy = (tx * t - ox) * zoom, (ty * t - oy) * zoom
+            dx0, dy0 = max(int(np.floor(sx)), 0), max(int(np.floor(sy)), 0)
+            dx1, dy1 = min(int(np.ceil(sx + t * zoom)), w), min(int(np.ceil(sy + t * zoom)), h)
+            if dx0 >= dx1 or dy0 >= dy1:
+                continue
+            if zoom == 1 and sx == int(sx) and sy == int(sy):
+                # 1:1 view, plain copy
+                sx0, sy0 = dx0 - int(sx), dy0 - int(sy)
+                canvas[dy0:dy1, dx0:dx1] = tile_canvas[sy0:sy0 + dy1 - dy0, sx0:sx0 + dx1 - dx0]
+                ink[dy0:dy1, dx0:dx1] = tile_ink[sy0:sy0 + dy1 - dy0, sx0:sx0 + dx1 - dx0]
+                continue
+            # One pixel of margin: a screen pixel that maps exactly onto a tile
+            # border rounds into the next tile, which has to be able to write it
+            dx0, dy0 = max(dx0 - 1, 0), max(dy0 - 1, 0)
+            dx1, dy1 = min(dx1 + 1, w), min(dy1 + 1, h)
+            m = np.float32([[zoom, 0, sx - dx0], [0, zoom, sy - dy0]])
+            size = (dx1 - dx0, dy1 - dy0)
+            # Transparent border: pixels outside this tile keep the neighbour's values
+            cv2.warpAffine(tile_canvas, m, size, dst=canvas[dy0:dy1, dx0:dx1], flags=flags,
+                           borderMode=cv2.BORDER_TRANSPARENT)
+            cv2.warpAffine(tile_ink, m, size, dst=ink[dy0:dy1, dx0:dx1], flags=flags,
+                           borderMode=cv2.BORDER_TRANSPARENT)
+
+    def clear(self):
+        self.tiles.clear()
+
+
+class Viewport:
+    """Which part of a large board is on screen: top-left board point and zoom."""
+
+    def __init__(self, width, height, board_width, board_height, min_zoom=0.125, max_zoom=4.0):
+        self.width = width
+        self.height = height
+        self.board_width = board_width
+        self.board_height = board_height
+        self.min_zoom = min_zoom
+        self.max_zoom = max_zoom
+        self.zoom = 1.0
+        # Start in the middle of the board
+        self.x = (board_width - width) / 2.0
+        self.y = (board_height - height) / 2.0
+
+    def to_board(self, x, y):
+        return int(round(self.x + x / self.zoom)), int(round(self.y + y / self.zoom))
+
+    def pan(self, dx, dy):
+        """Move the view content by (dx, dy) screen pixels."""
+        self.x -= dx / self.zoom
+        self.y -= dy / self.zoom
+        self._clamp()
+
+    def zoom_at(self, factor, x=None, y=None):
+        """Zoom by factor, keeping the board point under screen (x, y) in place."""
+        x = self.width / 2.0 if x is None else x
+        y = self.height / 2.0 if y is None else y
+        bx, by = self.x + x / self.zoom, self.y + y / self.zoom
+        self.zoom = float(np.clip(self.zoom * factor, self.min_zoom, self.max_zoom))
+        self.x, self.y = bx - x / self.zoom, by - y / self.zoom
+        self._clamp()
+
+    def _clamp(self):
+        self.x = float(np.clip(self.x, 0, max(self.board_width - self.width / self.zoom, 0)))
+        self.y = float(np.clip(self.y, 0, max(self.board_height - self.height / self.zoom, 0)))
+
+
+class InfiniteBoard(PaintingBoard):
+    """PaintingBoard on a large sparse board seen through a pan/zoom viewport.
+
+    Pens keep working in viewport (camera frame) pixels; strokes are stored
+    and drawn in board coordinates. self.canvas / self.ink hold the rendered
+    viewport, refreshed only after something changed.
+    """
+
+    def __init__(self, width=640, height=480, smooth=True, board_size=BOARD_SIZE, tile=256, spline=False):
+        super().__init__(width, height, smooth, spline=spline)
+        self.tiles = TiledCanvas(board_size[0], board_size[1], tile)
+        self.strokes = StrokeStore(*board_size)
+        self.view = Viewport(width, height, *board_size)
+        self.board_view = np.full((height, width, 3), 255, np.uint8)
+        self.view_dirty = True
+        self.drag_from = None
+
+    def pan(self, dx, dy):
+        # Applied before the next stroke, like undo/redo
+        self.commands.append(("pan", dx, dy))
+
+    def zoom(self, factor, x=None, y=None):
+        self.commands.append(("zoom", factor, x, y))
+
+    def drag(self, point):
+        """Pan by following a hand (pan gesture); None ends the drag.
+
+        Call from the thread that runs stroke().
+        """
+        self.run_commands()
+        if point is None:
+            self.drag_from = None
+            return
+        # Finish the strokes before the view moves under them
+        self.finish_splines()
+        if self.drag_from is not None:
+            self.view.pan(point[0] - self.drag_from[0], point[1] - self.drag_from[1])
+            self.view_dirty = True
+        self.drag_from = point
+        # Lift the pens so the next stroke does not connect across the move
+        self.end_stroke()
+        for pen in self.all_pens():
+            pen.lift()
+
+    def erase_at(self, x, y, radius=25):
+        # Screen point to board point at the time of the request
+        bx, by = self.view.to_board(x, y)
+        self.commands.append(("erase", bx, by, radius / self.view.zoom))
+
+    def _run_command(self, command):
+        if command == "clear":
+            # The strokes may span the whole board; drop the tiles instead of
+            # re-rasterizing their bounds
+            self.end_stroke()
+            self.strokes.clear()
+            self.tiles.clear()
+        elif command[0] == "pan":
+            self.view.pan(command[1], command[2])
+        elif command[0] == "zoom":
+            self.view.zoom_at(*command[1:])
+        else:
+            super()._run_command(command)
+            return
+        self.end_stroke()
+        for pen in self.all_pens():
+            pen.lift()
+        self.view_dirty = True
+        self.publish(None)
+
+    def draw_segments(self, segments, img=None):
+        batches = {}
+        screen = {}
+        for pen, x0, y0, x1, y1 in segments:
+            color, thickness = self.brush(pen)
+            # Strokes keep their on-screen width at any zoom
+            width = max(int(round(thickness / self.view.zoom)), 1)
+            (bx0, by0), (bx1, by1) = self.view.to_board(x0, y0), self.view.to_board(x1, y1)
+            batches.setdefault((color, width, pen.is_eraser), []).append(
+                np.array(((bx0, by0), (bx1, by1)), np.int32))
+            screen.setdefault((color, thickness), []).append(np.array(((x0, y0), (x1, y1)), np.int32))
+            self.record(pen, bx0, by0, bx1, by1, color, width)
+        # Viewers see the viewport, in screen coordinates
+        self.publish([(x0, y0, x1, y1) + self.brush(pen) + (pen.is_eraser,)
+                      for pen, x0, y0, x1, y1 in segments])
+
+        for (color, width, eraser), lines in batches.items():
+            self.tiles.draw_lines(lines, color, width, eraser)
+        if img is not None:
+            # Draw on the live feed as well
+            for (color, thickness), lines in screen.items():
+                cv2.polylines(img, lines, False, color, thickness)
+        self.view_dirty = True
+
+    def redraw(self, rect=None):
+        if rect is None:
+            rect = self.strokes.bounds([sid for sid, v in enumerate(self.strokes.visible) if v])
+            self.tiles.clear()
+            if rect is None:
+                self.view_dirty = True
+                return
+        x0, y0, x1, y1 = rect
+        canvas = np.zeros((y1 - y0, x1 - x0, 3), np.uint8)
+        ink = np.zeros((y1 - y0, x1 - x0), np.uint8)
+        self.strokes.rasterize(canvas, ink, rect, origin=(x0, y0))
+        self.tiles.blit(rect, canvas, ink)
+        self.view_dirty = True
+
+    def render(self):
+        if self.view_dirty:
+            self.tiles.render((self.view.x, self.view.y), self.view.zoom, self.canvas, self.ink)
+            self.board_view[:] = 255
+            cv2.copyTo(self.canvas, self.ink, self.board_view)
+            self.view_dirty = False
+
+    def compose_board(self):
+        # The viewport on a white background; reused until something changes
+        self.render()
+        return self.board_view
+
+    def compose_cam(self, img):
+        self.render()
+        return cv2.add(img, self.canvas, dst=img)
+
+
+class InfiniteWhiteboard(WhiteboardLayer):
+    """WhiteboardLayer on a large sparse board with a pan/zoom viewport.
+
+    self.layer / self.mask hold the rendered viewport.
+    """
+
+    def __init__(self, width, height, board_size=BOARD_SIZE, tile=256):
+        super().__init__(width, height)
+        self.tiles = TiledCanvas(board_size[0], board_size[1], tile)
+        self.strokes = StrokeStore(*board_size)
+        self.view = Viewport(width, height, *board_size)
+        self.view_dirty = True
+
+    def draw_segment(self, x0, y0, x1, y1, thickness, color, pen=0):
+        (bx0, by0), (bx1, by1) = self.view.to_board(x0, y0), self.view.to_board(x1, y1)
+        width = max(int(round(thickness / self.view.zoom)), 1)
+        super().draw_segment(bx0, by0, bx1, by1, width, color, pen)
+
+    def paint_line(self, x0, y0, x1, y1, thickness, bgr, eraser):
+        self.tiles.draw_lines([np.array(((x0, y0), (x1, y1)), np.int32)], bgr, thickness, eraser)
+        self.view_dirty = True
+
+    def pan(self, dx, dy):
+        self.commands.append(("pan", dx, dy))
+
+    def zoom(self, factor, x=None, y=None):
+        self.commands.append(("zoom", factor, x, y))
+
+    def _run_command(self, command):
+        if command in ("undo", "redo"):
+            super()._run_command(command)
+            return
+        self.end_stroke()
+        if command[0] == "pan":
+            self.view.pan(command[1], command[2])
+        else:
+            self.view.zoom_at(*command[1:])
+        self.view_dirty = True
+
+    def redraw(self, rect):
+        x0, y0, x1, y1 = rect
+        layer = np.zeros((y1 - y0, x1 - x0, 3), np.uint8)
+        mask = np.zeros((y1 - y0, x1 - x0), np.uint8)
+        self.strokes.rasterize(layer, mask, rect, origin=(x0, y0))
+        self.tiles.blit(rect, layer, mask)
+        self.view_dirty = True
+
+    def compose(self, frame):
+        self.run_commands()
+        if self.view_dirty:
+            self.tiles.render((self.view.x, self.view.y), self.view.zoom, self.layer, self.mask)
+            self.view_dirty = False
+        return super().compose(frame)
+
+    def clear(self):
+        super().clear()
+        self.tiles.clear()
+        self.view_dirty = True
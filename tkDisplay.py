@@ -0,0 +1,242 @@
+"""Shows BGR frames in a Tk Label or Canvas without rebuilding the image.
+
+The naive path allocates a resized copy, an RGB copy, a PIL image and a
+new PhotoImage for every frame. TkDisplay keeps one PhotoImage and a few
+RGBA buffers of the widget size, each wrapped once by a PIL image that
+shares its memory. A frame is resized and converted straight into the
+next buffer and pushed into the existing PhotoImage with paste(), the
+block copy PIL does through Tk_PhotoPutBlock. Buffers and the image are
+only rebuilt when the widget size changes (<Configure>).
+
+convert() and show() may run on different threads. Every buffer handed
+out carries a generation number. convert() never reuses the buffer that
+show() is pasting, and show() skips a buffer that convert() has reused
+since (a newer frame is then on its way), so a frame is never torn.
+
+With shrink = 2 frames are converted at half the widget size and Tk
+zooms the image up (photo copy -zoom): a quarter of the pixels go
+through PIL, for a blockier picture when the machine is behind.
+
+    display = TkDisplay(label)
+    buf = display.convert(frame)  # any thread
+    display.show(buf)             # Tk thread
+
+Benchmark the old and new path (needs a display):
+    python tkDisplay.py --size 1920x1080
+"""
+import argparse
+import threading
+import time
+
+import cv2
+import numpy as np
+from PIL import Image, ImageTk
+from tkinter import PhotoImage
+
+
+class DisplayFrame(np.ndarray):
+    """An RGBA buffer as handed out by TkDisplay.convert(): index and generation."""
+
+    index = None
+    generation = None
+
+
+class TkDisplay:
+    def __init__(self, widget, size=None, buffers=3):
+        """size fixes the displayed size; by default it follows the widget."""
+        self.widget = widget
+        self.size = size or (max(widget.winfo_width(), 1), max(widget.winfo_height(), 1))
+        if size is None:
+            widget.bind("<Configure>", self._on_configure, add="+")
+        # One buffer may be being pasted and one waiting in the pipeline while
+        # the compose worker fills the next
+        self.count = buffers
+        self.buffers = []  # [rgba, PIL image, generation]
+        self.next = 0
+        self.generation = 0
+        self.handed_out = None  # index of the newest buffer from convert()
+        self.pasting = None  # index of the buffer show() is copying from
+        self.lock = threading.Lock()
+        self.source = None  # RGBA copy of a small frame before upscaling
+        self.resized = None  # BGR copy of a large frame after downscaling
+        self.photo = None
+        self.zoomed = None  # full-size Tk image the photo is zoomed into
+        self.shrink = 1
+        self.item = None
+
+    def _on_configure(self, event):
+        self.size = (max(event.width, 1), max(event.height, 1))
+
+    def _allocate(self, width, height):
+        buffers = []
+        for _ in range(self.count):
+            rgba = np.empty((height, width, 4), np.uint8)
+            # Shares rgba's memory, so the image follows every write into it
+            image = Image.frombuffer("RGBA", (width, height), rgba, "raw", "RGBA", 0, 1)
+            buffers.append([rgba, image, 0])
+        # show() may still be pasting one of the old buffers; they are
+        # simply dropped, not reused
+        self.buffers = buffers
+        self.next = 0
+        self.handed_out = None
+        self.pasting = None
+
+    def _claim(self):
+        """Next buffer that is neither being pasted nor the newest handed out."""
+        with self.lock:
+            for _ in range(self.count):
+                i = self.next
+                self.next = (self.next + 1) % self.count
+                if i != self.pasting and i != self.handed_out:
+                    break
+            self.generation += 1
+            entry = self.buffers[i]
+            entry[2] = self.generation
+            self.handed_out = i
+        frame = entry[0].view(DisplayFrame)
+        frame.index, frame.generation = i, entry[2]
+        return frame
+
+    def convert(self, img):
+        """Resize a BGR frame to the display size into the next RGBA buffer and return it.
+
+        May run on a worker thread. Drawing on the result is fine, but the
+        alpha channel must stay 255.
+        """
+        width, height = self.size[0] // self.shrink, self.size[1] // self.shrink
+        if not self.buffers or self.buffers[0][0].shape[:2] != (height, width):
+            with self.lock:
+                self._allocate(width, height)
+        rgba = self._claim()
+
+        h, w = img.shape[:2]
+        if (w, h) == (width, height):
+            cv2.cvtColor(img, cv2.COLOR_BGR2RGBA, dst=rgba)
+        elif w * h < width * height:
+            # Upscaling: convert the smaller frame, then resize 4 channels
+            if self.source is None or self.source.shape[:2] != (h, w):
+                self.source = np.empty((h, w, 4), np.uint8)
+            cv2.cvtColor(img, cv2.COLOR_BGR2RGBA, dst=self.source)
+            cv2.resize(self.source, (width, height), dst=rgba)
+        else:
+            if self.resized is None or self.resized.shape[:2] != (height, width):
+                self.resized = np.empty((height, width, 3), np.uint8)
+            cv2.resize(img, (width, height), dst=self.resized)
+            cv2.cvtColor(self.resized, cv2.COLOR_BGR2RGBA, dst=rgba)
+        return rgba
+
+    def show(self, rgba):
+        """Put a buffer from convert() on screen (Tk thread)."""
+        with self.lock:
+            i = getattr(rgba, "index", None)
+            if i is None or i >= len(self.buffers):
+                return
+            buf, image, generation = self.buffers[i]
+            if rgba.base is not buf or rgba.generation != generation:
+                # Left over from before a resize, or already reused for a newer frame
+                return
+            self.pasting = i
+        try:
+            self._paste(image)
+        finally:
+            with self.lock:
+                if self.pasting == i:
+                    self.pasting = None
+
+    def _paste(self, image):
+        zoom = max(1, self.size[0] // image.size[0])
+        if self.photo is None or (self.photo.width(), self.photo.height()) != image.size:
+            self.photo = ImageTk.PhotoImage("RGBA", image.size)
+            self.zoomed = None
+            if zoom > 1:
+                self.zoomed = PhotoImage(master=self.widget, width=image.size[0] * zoom,
+                                         height=image.size[1] * zoom)
+            self._attach(self.zoomed or self.photo)
+        self.photo.paste(image)
+        if self.zoomed is not None:
+            self.zoomed.tk.call(self.zoomed, "copy", self.photo, "-zoom", zoom, zoom)
+
+    def _attach(self, photo):
+        if hasattr(self.widget, "create_image"):
+            if self.item is None:
+                self.item = self.widget.create_image(0, 0, image=photo, anchor="nw")
+                # Keep Tk-drawn lines above the frame
+                self.widget.tag_lower(self.item)
+            else:
+                self.widget.itemconfig(self.item, image=photo)
+        else:
+            self.widget.config(image=photo)
+        # Keep a reference so Tk does not lose the image
+        self.widget.imgtk = photo
+
+
+def benchmark(size=(1920, 1080), source=(640, 480), frames=200):
+    """Milliseconds per frame for the per-frame PhotoImage path and for TkDisplay."""
+    from tkinter import Label, Tk
+
+    frame = np.random.randint(0, 256, (source[1], source[0], 3), np.uint8)
+    results = {}
+    try:
+        root = Tk()
+    except Exception as e:
+        print("no Tk display (%s); timing the conversion only" % e)
+        root = None
+
+    def run(step):
+        step()
+        start = time.perf_counter()
+        for _ in range(frames):
+            step()
+        return (time.perf_counter() - start) / frames * 1000.0
+
+    if root is None:
+        def old():
+            Image.fromarray(cv2.cvtColor(cv2.resize(frame, size), cv2.COLOR_BGR2RGB))
+
+        # With a fixed size the widget is only needed by show()
+        display = TkDisplay(None, size)
+        results["per-frame convert"] = run(old)
+        results["TkDisplay.convert"] = run(lambda: display.convert(frame))
+        display.shrink = 2
+        results["TkDisplay.convert/2"] = run(lambda: display.convert(frame))
+        return results
+
+    root.geometry("%dx%d" % size)
+    label = Label(root)
+    label.pack(fill="both", expand=True)
+    root.update()
+
+    def old():
+        img = cv2.resize(frame, size)
+        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+        imgtk = ImageTk.PhotoImage(image=Image.fromarray(img))
+        label.imgtk = imgtk
+        label.config(image=imgtk)
+        root.update_idletasks()
+
+    display = TkDisplay(label, size)
+
+    def new():
+        display.show(display.convert(frame))
+        root.update_idletasks()
+
+    results["per-frame PhotoImage"] = run(old)
+    results["TkDisplay"] = run(new)
+    display.shrink = 2
+    results["TkDisplay shrink 2"] = run(new)
+    root.destroy()
+    return results
+
+
+if __name__ == "__main__":
+    def parse_size(text):
+        w, h = text.lower().split("x")
+        return int(w), int(h)
+
+    parser = argparse.ArgumentParser(description="Benchmark the Tk display path")
+    parser.add_argument("--size", type=parse_size, default=(1920, 1080), help="displayed size, WxH")
+    parser.add_argument("--source", type=parse_size, default=(640, 480), help="frame size, WxH")
+    parser.add_argument("--frames", type=int, default=200)
+    args = parser.parse_args()
+    for name, ms in benchmark(args.size, args.source, args.frames).items():
+        print("%-22s %7.2f ms/frame" % (name, ms))
@@ -0,0 +1,128 @@
+from collections import deque
+
+import cv2
+import numpy as np
+
+from strokeStore import StrokeStore
+
+# Tk color names used by CanvasApp, as BGR
+TK_COLORS = {
+    "black": (0, 0, 0),
+    "red": (0, 0, 255),
+    "green": (0, 128, 0),
+    "blue": (255, 0, 0),
+}
+
+
+class WhiteboardLayer:
+    """Raster stroke layer for the "Papan Tulis" whiteboard.
+
+    Strokes are burned into a NumPy layer plus a coverage mask instead of
+    becoming Tk canvas items, so the cost of a frame does not depend on how
+    long the session has been running.
+    """
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.layer = np.zeros((height, width, 3), np.uint8)
+        self.mask = np.zeros((height, width), np.uint8)
+        # Reused buffer for the resized camera background
+        self.background = np.zeros((height, width, 3), np.uint8)
+
+        # Vector record of the strokes, for undo/redo
+        self.strokes = StrokeStore(width, height)
+        self.stroke_ids = {}  # pen key -> open stroke id
+        self.commands = deque()
+        # Optional CanvasStore the layer autosaves to (see restore())
+        self.saver = None
+
+    def draw_segment(self, x0, y0, x1, y1, thickness, color, pen=0):
+        eraser = color == "white"
+        bgr = (0, 0, 0) if eraser else TK_COLORS.get(color, (0, 0, 0))
+        self.paint_line(x0, y0, x1, y1, thickness, bgr, eraser)
+
+        store = self.strokes
+        sid = self.stroke_ids.get(pen)
+        if sid is not None and (store.eraser[sid] != eraser or store.color[sid] != bgr):
+            self.end_stroke(pen)
+            sid = None
+        if sid is None:
+            sid = self.stroke_ids[pen] = store.begin(x0, y0, bgr, thickness, eraser)
+        store.add_point(sid, x1, y1)
+
+    def paint_line(self, x0, y0, x1, y1, thickness, bgr, eraser):
+        if eraser:
+            # Eraser uncovers the camera background again
+            cv2.line(self.mask, (x0, y0), (x1, y1), 0, thickness)
+        else:
+            cv2.line(self.layer, (x0, y0), (x1, y1), bgr, thickness)
+            cv2.line(self.mask, (x0, y0), (x1, y1), 1, thickness)
+        if self.saver is not None:
+            self.saver.mark(x0, y0, x1, y1, thickness)
+
+    def end_stroke(self, pen=None):
+        keys = list(self.stroke_ids) if pen is None else [pen]
+        for key in keys:
+            sid = self.stroke_ids.pop(key, None)
+            if sid is not None:
+                self.strokes.finish(sid)
+
+    def undo(self):
+        # Applied on the next compose(), which may run on a worker thread
+        self.commands.append("undo")
+
+    def redo(self):
+        self.commands.append("redo")
+
+    def run_commands(self):
+        while self.commands:
+            self._run_command(self.commands.popleft())
+
+    def _run_command(self, command):
+        self.end_stroke()
+        sids = self.strokes.undo() if command == "undo" else self.strokes.redo()
+        rect = self.strokes.bounds(sids)
+        if rect is not None:
+            self.redraw(rect)
+
+    def redraw(self, rect):
+        self.strokes.rasterize(self.layer, self.mask, rect)
+        if self.saver is not None:
+            self.saver.mark_rect(*rect)
+
+    def compose(self, frame):
+        """Camera frame with the strokes on top, as a BGR image of the layer size.
+
+        The returned buffer is reused on the next call.
+        """
+        self.run_commands()
+        if self.saver is not None:
+            self.saver.maybe_save(self.layer, self.mask, self.strokes)
+
+        cv2.resize(frame, (self.width, self.height), dst=self.background)
+        np.copyto(self.background, self.layer, where=self.mask.view(bool)[..., None])
+        return self.background
+
+    def clear(self):
+        # Pens still drawing finish their strokes first, so the clear hides them too
+        self.end_stroke()
+        self.mask[:] = 0
+        self.strokes.clear()
+        self.stroke_ids.clear()
+        if self.saver is not None:
+            self.saver.reset()
+
+    def restore(self, saver):
+        """Load the session saved in a CanvasStore and keep autosaving to it."""
+        self.saver = saver
+        if saver.open():
+            strokes = saver.load(self.layer, self.mask)
+            if strokes is not None:
+                self.strokes = strokes
+
+    def close(self):
+        # Final save; the drawing stays on disk for the next session
+        if self.saver is not None:
+            self.saver.close(self.layer, self.mask, self.strokes)
+            self.saver = None